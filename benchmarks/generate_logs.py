@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import os
+import csv
+import random
+import argparse
+
+answerOptionString = 'Never;Rarely;Sometimes;Often;Always'
+scoreOptionString  = '0;1;2;3;4'
+reverseScoreString = '4;3;2;1;0'
+nonAsciiCharacters = 'éèëüöäçñßøåæ€ŁŻ漢字'
+asciiCharacters    = 'abcdefghijklmnopqrstuvwxyz '
+
+
+def randomText(rng, length, nonAsciiRatio):
+    """
+    Random question text with roughly nonAsciiRatio non-ascii characters
+    """
+    characterList = []
+    for index in range(length):
+        if rng.random() < nonAsciiRatio:
+            characterList.append(rng.choice(nonAsciiCharacters))
+        else:
+            characterList.append(rng.choice(asciiCharacters))
+    return ''.join(characterList)
+
+def generateLogs(folder, nrSubjects=100, nrItems=40, nrCategories=4, nrExtraColumns=20,
+                 nonAsciiRatio=0.05, delimiter=',', quoting=csv.QUOTE_MINIMAL, nrFolders=1, seed=0):
+    """
+    Write synthetic OpenSesame style log files. Every folder gets the same
+    questionnaire, every subject a different set of responses. The output
+    only depends on the arguments, so runs can be compared.
+
+    Returns a list with the paths of the written files.
+    """
+    rng = random.Random(seed)
+
+    categoryNameList = ['Scale' + str(index + 1) for index in range(nrCategories)]
+    extraColumnList  = ['extra_column_' + str(index + 1) for index in range(nrExtraColumns)]
+    header = (['subject_nr', 'id', 'response', 'category', 'answer_options', 'answer_options_scores',
+               'question_text'] + extraColumnList)
+
+    itemList = []
+    for index in range(nrItems):
+        categoryList = [categoryNameList[index % nrCategories]]
+        if nrCategories > 1 and rng.random() < 0.2:
+            categoryList.append(categoryNameList[(index + 1) % nrCategories])
+        scoreString = reverseScoreString if rng.random() < 0.25 else scoreOptionString
+        questionText = randomText(rng, 60, nonAsciiRatio)
+        itemList.append((str(index + 1), ';'.join(categoryList), scoreString, questionText))
+
+    answerList = answerOptionString.split(';')
+
+    pathList = []
+    for folderIndex in range(nrFolders):
+        if nrFolders > 1:
+            dataFolder = os.path.join(folder, 'questionnaire_' + str(folderIndex + 1))
+        else:
+            dataFolder = folder
+        os.makedirs(dataFolder, exist_ok=True)
+
+        for subject in range(1, nrSubjects + 1):
+            path = os.path.join(dataFolder, 'subject-' + str(subject) + '.csv')
+            with open(path, 'wt', newline='', encoding='utf-8') as fp:
+                writer = csv.writer(fp, delimiter=delimiter, quoting=quoting)
+                writer.writerow(header)
+                for (identity, categoryString, scoreString, questionText) in itemList:
+                    extraValueList = [str(rng.randint(0, 100000)) for column in extraColumnList]
+                    writer.writerow([str(subject), identity, rng.choice(answerList), categoryString,
+                                     answerOptionString, scoreString, questionText] + extraValueList)
+            pathList.append(path)
+
+    return pathList
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic OpenSesame questionnaire log files.")
+    parser.add_argument('folder', help="output folder")
+    parser.add_argument('--subjects', type=int, default=100)
+    parser.add_argument('--items', type=int, default=40)
+    parser.add_argument('--categories', type=int, default=4)
+    parser.add_argument('--extra-columns', type=int, default=20)
+    parser.add_argument('--non-ascii-ratio', type=float, default=0.05)
+    parser.add_argument('--delimiter', default=',')
+    parser.add_argument('--quote-all', action='store_true', help="quote every field")
+    parser.add_argument('--folders', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    quoting = csv.QUOTE_ALL if args.quote_all else csv.QUOTE_MINIMAL
+    pathList = generateLogs(args.folder, args.subjects, args.items, args.categories, args.extra_columns,
+                            args.non_ascii_ratio, args.delimiter.replace('\\t', '\t'), quoting, args.folders,
+                            args.seed)
+    print('Written ' + str(len(pathList)) + ' files to ' + args.folder)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import contextlib
+from collections import OrderedDict
+
+benchmarkFolder = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(benchmarkFolder))
+
+import numpy as np
+
+from libopensesametoolbox.questionnaireprocessor import QuestionnaireProcessor, readCsv, readCsvMapped
+from libopensesametoolbox.writers import writeCsv
+from libopensesametoolbox.questionnairecreator import QuestionnaireCreator
+from libopensesametoolbox.clean_data import cleanUpStringList, removeJunk, lowercaseList, usanitize
+from libopensesametoolbox.io_tools import getResourceLoc
+
+from generate_logs import generateLogs, randomText
+
+sizeDict = {
+    'quick':   {'subjects': 50,  'items': 40,  'categories': 4,  'extraColumns': 20, 'folders': 2, 'repeat': 3},
+    'default': {'subjects': 500, 'items': 60,  'categories': 6,  'extraColumns': 40, 'folders': 4, 'repeat': 5},
+    'large':   {'subjects': 3000, 'items': 200, 'categories': 12, 'extraColumns': 80, 'folders': 4, 'repeat': 3},
+    }
+
+
+def timeIt(function, repeat):
+    """
+    Run function repeat times and return the timings in seconds
+    """
+    timingList = []
+    for index in range(repeat):
+        start = time.perf_counter()
+        function()
+        timingList.append(time.perf_counter() - start)
+    return timingList
+
+def gitRevision():
+    """
+    Return the current git commit of the toolbox, if available
+    """
+    try:
+        output = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=benchmarkFolder,
+                                         stderr=subprocess.DEVNULL)
+        return output.decode('ascii').strip()
+    except Exception:
+        return None
+
+def runBenchmarks(workFolder, size, nonAsciiRatio, delimiter, seed):
+    """
+    Generate the synthetic data set and time the toolbox components on it
+    """
+    dataFolder   = os.path.join(workFolder, 'data')
+    resultFolder = os.path.join(workFolder, 'results')
+    os.makedirs(resultFolder)
+
+    pathList = generateLogs(dataFolder, size['subjects'], size['items'], size['categories'],
+                            size['extraColumns'], nonAsciiRatio, delimiter, nrFolders=size['folders'],
+                            seed=seed)
+    repeat = size['repeat']
+    firstFolderPathList = [path for path in pathList if os.path.dirname(path) == os.path.dirname(pathList[0])]
+
+    benchmarkDict = OrderedDict()
+
+    benchmarkDict['readCsv'] = lambda: [readCsv(path, None) for path in firstFolderPathList]
+
+    columnList = ['response', 'id', 'category', 'answer_options', 'answer_options_scores']
+    benchmarkDict['readCsvMapped'] = lambda: [readCsvMapped(path, None, columnList) for path in firstFolderPathList]
+
+    dataDict = readCsv(pathList[0], None)
+    def cleanData():
+        for index in range(len(firstFolderPathList)):
+            removeJunk(dataDict['response'])
+            removeJunk(dataDict['id'])
+            cleanUpStringList(dataDict['category'], ';')
+            cleanUpStringList(dataDict['answer_options_scores'], ';')
+            cleanUpStringList(dataDict['answer_options'], ';')
+            lowercaseList(dataDict['response'])
+    benchmarkDict['clean_data'] = cleanData
+
+    def processQuestionnaires():
+        with contextlib.redirect_stdout(io.StringIO()):
+            QuestionnaireProcessor(dataFolder, resultFolder, 'response', 'id', 'category', 'answer_options',
+                                   'answer_options_scores', None, None, None, None, False, True, ui=None)
+    benchmarkDict['QuestionnaireProcessor'] = processQuestionnaires
+
+    rng = np.random.RandomState(seed)
+    fileNameList = [os.path.basename(path) for path in firstFolderPathList]
+    categoryList = ['Scale' + str(index + 1) for index in range(size['categories'])]
+    idList = [str(index + 1) for index in range(size['items'])]
+    scoreTypeList = ['Sum', 'Mean']
+    subjectCategoryDict = {}
+    subjectResponseDict = {}
+    for fileName in fileNameList:
+        subjectCategoryDict[fileName] = dict((category, {'Sum': str(rng.rand() * 100), 'Mean': str(rng.rand())})
+                                             for category in categoryList)
+        subjectResponseDict[fileName] = dict((identity, str(rng.randint(5))) for identity in idList)
+    writePath = os.path.join(resultFolder, 'benchmark_write.tsv')
+    benchmarkDict['writeCsv'] = lambda: writeCsv(writePath, subjectCategoryDict, subjectResponseDict, fileNameList,
+                                                 categoryList, idList, scoreTypeList, '\t')
+
+    textRng = random.Random(seed)
+    questionList = [randomText(textRng, 80, nonAsciiRatio) for identity in idList]
+    creatorCategoryList = [categoryList[index % len(categoryList)] for index in range(len(idList))]
+    creatorScoreList = ['0;1;2;3;4'] * len(idList)
+    mcFile = getResourceLoc('opensesame.script.mc')
+    creatorPath = os.path.join(resultFolder, 'benchmark.opensesame')
+    def renderQuestionnaire():
+        QuestionnaireCreator(mcFile, creatorPath, 'benchmark', '1024', '768', 'white', 'black', 'legacy',
+                             'Instruction', 'Please answer', 'Benchmark', 'sequential', questionList, idList,
+                             'Never;Rarely;Sometimes;Often;Always', creatorCategoryList, creatorScoreList, 'mc')
+    benchmarkDict['QuestionnaireCreator'] = renderQuestionnaire
+
+    sanitizeString = '\n'.join(questionList) * 20
+    benchmarkDict['usanitize'] = lambda: usanitize(sanitizeString)
+
+    resultDict = OrderedDict()
+    for name, function in benchmarkDict.items():
+        timingList = timeIt(function, repeat)
+        resultDict[name] = {'best': min(timingList),
+                            'median': statistics.median(timingList),
+                            'repeat': repeat}
+        print('{0:<24}{1:>12.4f} s (best of {2})'.format(name, min(timingList), repeat))
+
+    return resultDict
+
+def compareResults(resultDict, previousPath):
+    """
+    Print the ratio of the current to the previous best timings
+    """
+    with open(previousPath, 'rt', encoding='utf-8') as fp:
+        previous = json.load(fp)
+
+    print('\nCompared to ' + previousPath + ' (' + str(previous.get('commit')) + ')')
+    for name in resultDict:
+        if name in previous['results']:
+            ratio = resultDict[name]['best'] / previous['results'][name]['best']
+            print('{0:<24}{1:>12.2f} x'.format(name, ratio))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the OpenSesame Toolbox on synthetic log files.")
+    parser.add_argument('--size', choices=sorted(sizeDict), default='default')
+    parser.add_argument('--non-ascii-ratio', type=float, default=0.05)
+    parser.add_argument('--delimiter', default=',')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="file to save the results to, defaults to benchmarks/results/")
+    parser.add_argument('--compare', help="previous result file to compare with")
+    parser.add_argument('--keep', action='store_true', help="keep the generated data")
+    args = parser.parse_args()
+
+    size = sizeDict[args.size]
+    delimiter = args.delimiter.replace('\\t', '\t')
+
+    workFolder = tempfile.mkdtemp(prefix='opensesame-toolbox-benchmark-')
+    try:
+        resultDict = runBenchmarks(workFolder, size, args.non_ascii_ratio, delimiter, args.seed)
+    finally:
+        if args.keep:
+            print('Data kept in ' + workFolder)
+        else:
+            shutil.rmtree(workFolder, ignore_errors=True)
+
+    report = OrderedDict()
+    report['date'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    report['commit'] = gitRevision()
+    report['python'] = platform.python_version()
+    report['numpy'] = np.__version__
+    report['platform'] = platform.platform()
+    report['size'] = args.size
+    report['parameters'] = dict(size, nonAsciiRatio=args.non_ascii_ratio, delimiter=delimiter, seed=args.seed)
+    report['results'] = resultDict
+
+    if args.output:
+        outputPath = args.output
+    else:
+        outputFolder = os.path.join(benchmarkFolder, 'results')
+        os.makedirs(outputFolder, exist_ok=True)
+        outputPath = os.path.join(outputFolder, time.strftime('%Y%m%d-%H%M%S') + '-' + args.size + '.json')
+
+    with open(outputPath, 'wt', encoding='utf-8') as fp:
+        json.dump(report, fp, indent=1)
+    print('\nSaved results to ' + outputPath)
+
+    if args.compare:
+        compareResults(resultDict, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+
+## name -> function(scoreArray, countArray) returning a value per category
+aggregationDict = OrderedDict()
+
+
+def registerAggregation(name, function):
+    """
+    Add a statistic that can be selected in the scoreTypeList of the config
+    file. The function gets a categories x items float array, padded with
+    NaN, where missing item scores are NaN as well, and the number of item
+    scores per category; it returns an array with a value per category.
+    """
+    aggregationDict[name] = function
+
+def unknownAggregations(scoreTypeList):
+    """
+    The statistics in scoreTypeList that are not registered
+    """
+    return [scoreType for scoreType in scoreTypeList if scoreType not in aggregationDict]
+
+def categoryScoreArray(categoryIndexList, scoreList, nrCategories):
+    """
+    Arrange the scores of all (category, item) pairs of a file in a
+    categories x items array, in the order of the pairs and padded with NaN
+
+    Args:
+        categoryIndexList: the category (index) of every pair
+        scoreList: the score of every pair, NaN when missing
+    """
+    categoryIndexArray = np.asarray(categoryIndexList, dtype=np.intp)
+    scores = np.asarray(scoreList, dtype='d')
+
+    sizeArray = np.bincount(categoryIndexArray, minlength=nrCategories)
+    order = np.argsort(categoryIndexArray, kind='stable')
+    startArray = np.concatenate(([0], np.cumsum(sizeArray)[:-1]))
+    sortedCategoryArray = categoryIndexArray[order]
+    positionArray = np.arange(len(order)) - startArray[sortedCategoryArray]
+
+    scoreArray = np.full((nrCategories, sizeArray.max() if len(sizeArray) else 0), np.nan)
+    scoreArray[sortedCategoryArray, positionArray] = scores[order]
+
+    return [scoreArray, sizeArray]
+
+def aggregate(scoreArray, sizeArray, scoreTypeList):
+    """
+    Compute the statistics in scoreTypeList for every category at once.
+
+    Returns:
+        a dict with an array of values per category for every statistic
+    """
+    resultDict = {}
+    with warnings.catch_warnings():
+        ## statistics of a category without valid scores are NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for scoreType in scoreTypeList:
+            resultDict[scoreType] = aggregationDict[scoreType](scoreArray, sizeArray)
+    return resultDict
+
+def _validCount(scoreArray, sizeArray):
+    return np.count_nonzero(~np.isnan(scoreArray), axis=1)
+
+def _missingCount(scoreArray, sizeArray):
+    return sizeArray - _validCount(scoreArray, sizeArray)
+
+def _sum(scoreArray, sizeArray):
+    result = np.nansum(scoreArray, axis=1)
+    ## like np.sum of no scores, but NaN when all scores are missing
+    result[(_validCount(scoreArray, sizeArray) == 0) & (sizeArray > 0)] = np.nan
+    return result
+
+registerAggregation('Sum', _sum)
+registerAggregation('Mean', lambda scoreArray, sizeArray: np.nanmean(scoreArray, axis=1))
+registerAggregation('SD', lambda scoreArray, sizeArray: np.nanstd(scoreArray, axis=1, ddof=1))
+registerAggregation('Median', lambda scoreArray, sizeArray: np.nanmedian(scoreArray, axis=1))
+registerAggregation('Min', lambda scoreArray, sizeArray: np.nanmin(scoreArray, axis=1))
+registerAggregation('Max', lambda scoreArray, sizeArray: np.nanmax(scoreArray, axis=1))
+registerAggregation('Count', _validCount)
+registerAggregation('Missing', _missingCount)
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import time
+import logging
+import tarfile
+import zipfile
+import collections
+import concurrent.futures
+
+## names added by archivers that are not part of the archived folder
+ignoredNameList = ['__MACOSX']
+
+ArchiveMember = collections.namedtuple('ArchiveMember', ['name', 'parts', 'size', 'mtime'])
+
+
+def archiveExtension(fileName, archiveExtList):
+    """
+    The archive extension the file name ends with, None when it is not an
+    archive. Longer extensions are tried first, so .tar.gz is not taken
+    for .gz.
+    """
+    lowerName = fileName.lower()
+    for extension in sorted(archiveExtList, key=len, reverse=True):
+        if lowerName.endswith('.' + extension.lower()):
+            return extension
+    return None
+
+def archiveStem(fileName, archiveExtList):
+    """
+    The file name without its archive extension: the name of the folder the
+    archive holds
+    """
+    extension = archiveExtension(fileName, archiveExtList)
+    if extension is None:
+        return fileName
+    return fileName[:-len(extension) - 1]
+
+def listArchive(archivePath):
+    """
+    List the files in a zip or tar archive.
+
+    The path of every member is split in its folder names and file name.
+    Hidden files and folders are left out. When all members are in a single
+    top folder that folder is dropped, so an archive of a folder and an
+    archive of the contents of that folder list the same files.
+
+    Returns:
+        a list of ArchiveMember tuples
+    """
+
+    memberList = []
+
+    if zipfile.is_zipfile(archivePath):
+        with zipfile.ZipFile(archivePath) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                mtime = time.mktime(info.date_time + (0, 0, -1))
+                memberList.append(ArchiveMember(info.filename, _splitMemberName(info.filename),
+                                                info.file_size, mtime))
+    else:
+        with tarfile.open(archivePath, 'r:*') as archive:
+            for info in archive.getmembers():
+                if not info.isfile():
+                    continue
+                memberList.append(ArchiveMember(info.name, _splitMemberName(info.name),
+                                                info.size, float(info.mtime)))
+
+    memberList = [member for member in memberList
+                  if member.parts and not any(part.startswith('.') or part in ignoredNameList
+                                              for part in member.parts)]
+
+    topFolderSet = set(member.parts[0] for member in memberList)
+    if len(topFolderSet) == 1 and all(len(member.parts) > 1 for member in memberList):
+        memberList = [member._replace(parts=member.parts[1:]) for member in memberList]
+
+    return memberList
+
+def _splitMemberName(name):
+    """
+    Split a member name in its parts, leaving out empty and '.' parts
+    """
+    return tuple(part for part in name.replace('\\', '/').split('/') if part not in ('', '.'))
+
+def readArchiveMembers(archivePath, memberNameList):
+    """
+    Read the given members of an archive in a single pass. A compressed tar
+    archive is read as a stream instead of seeking back for every member.
+
+    Returns:
+        a dict with the data (bytes) of every member
+    """
+    return dict(iterArchiveMembers(archivePath, memberNameList))
+
+def iterArchiveMembers(archivePath, memberNameList):
+    """
+    Read the given members of an archive in a single pass, one at a time,
+    so only the data of one member is kept in memory.
+
+    Yields:
+        the name and data (bytes) of every member
+    """
+
+    wantedSet = set(memberNameList)
+
+    if zipfile.is_zipfile(archivePath):
+        with zipfile.ZipFile(archivePath) as archive:
+            for name in memberNameList:
+                yield (name, archive.read(name))
+    else:
+        foundSet = set()
+        with tarfile.open(archivePath, 'r|*') as archive:
+            for info in archive:
+                if info.name in wantedSet:
+                    yield (info.name, archive.extractfile(info).read())
+                    foundSet.add(info.name)
+                    if len(foundSet) == len(wantedSet):
+                        break
+
+
+class ArchivePrefetcher(object):
+    """
+    Reads archives on a pool of worker threads ahead of the archive being
+    processed. Decompression releases the GIL, so several archives are
+    read in parallel while the files of the current one are scored.
+
+    The read-ahead is limited by the size of the data: archives are read
+    ahead as long as the members in memory and being read stay within
+    maxBytes, so a few large archives do not fill the memory. The archive
+    being processed is always read. The data of a member is dropped once
+    it is taken.
+    """
+    def __init__(self, archiveMemberDict, archiveSizeDict, workers, maxBytes):
+        """
+        archiveMemberDict maps every archive path, in processing order, to
+        the list of members to read from it, archiveSizeDict to the total
+        (uncompressed) size of these members.
+        """
+        self.archiveList = list(archiveMemberDict)
+        self.archiveMemberDict = archiveMemberDict
+        self.archiveSizeDict = archiveSizeDict
+        self.maxBytes = maxBytes
+        self.futureDict = {}
+        ## archive -> bytes of its members that are read (or being read) and not taken yet
+        self.bytesDict = {}
+        self.position = 0
+        self.executor = None
+
+        if self.archiveList:
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+
+    def read(self, archivePath):
+        """
+        The member data of an archive, waiting for it when it is still being
+        read. Raises the error of the worker when the archive cannot be read.
+        """
+        if archivePath not in self.futureDict:
+            self._submit(archivePath)
+        self.position = max(self.position, self.archiveList.index(archivePath) + 1)
+        self._readAhead()
+
+        return self.futureDict[archivePath].result()
+
+    def take(self, archivePath, memberName):
+        """
+        The data of a member of an archive, see read. The data is not kept.
+        """
+        data = self.read(archivePath).pop(memberName)
+        self.bytesDict[archivePath] = max(0, self.bytesDict.get(archivePath, 0) - len(data))
+        self._readAhead()
+        return data
+
+    def release(self, archivePath):
+        """
+        Forget the data of an archive that has been processed
+        """
+        future = self.futureDict.pop(archivePath, None)
+        self.bytesDict.pop(archivePath, None)
+        if future is not None:
+            future.cancel()
+        self._readAhead()
+
+    def close(self):
+        """
+        Stop the worker threads, archives not yet being read are skipped
+        """
+        if self.executor is not None:
+            for future in self.futureDict.values():
+                future.cancel()
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        self.futureDict = {}
+        self.bytesDict = {}
+
+    def _readAhead(self):
+        while self.executor is not None and self.position < len(self.archiveList):
+            archivePath = self.archiveList[self.position]
+            if archivePath not in self.futureDict:
+                if sum(self.bytesDict.values()) + self.archiveSizeDict.get(archivePath, 0) > self.maxBytes:
+                    break
+                self._submit(archivePath)
+            self.position += 1
+
+    def _submit(self, archivePath):
+        if archivePath in self.futureDict:
+            return
+        logging.debug("Reading archive: %s", archivePath)
+        self.bytesDict[archivePath] = self.archiveSizeDict.get(archivePath, 0)
+        self.futureDict[archivePath] = self.executor.submit(readArchiveMembers, archivePath,
+                                                            self.archiveMemberDict[archivePath])
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import io
+import os
+import gzip
+import queue
+import hashlib
+import logging
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+## extension per codec
+codecExtDict = {'gzip': 'gz', 'zstd': 'zst'}
+
+chunkSize = 1024 * 1024
+
+
+def compressionOf(path):
+    """
+    The codec of a compressed file, by its extension, None for other files
+    """
+    lowerPath = path.lower()
+    for codec in codecExtDict:
+        if lowerPath.endswith('.' + codecExtDict[codec]):
+            return codec
+    return None
+
+def stripCompressionExt(fileName):
+    """
+    The file name without the extension of the compression
+    """
+    codec = compressionOf(fileName)
+    if codec is None:
+        return fileName
+    return fileName[:-len(codecExtDict[codec]) - 1]
+
+def selectCodec(codec):
+    """
+    Resolve 'auto' to zstd when the zstandard package is installed and to
+    gzip otherwise
+    """
+    if codec == 'auto':
+        return 'zstd' if zstandard is not None else 'gzip'
+    if codec == 'zstd' and zstandard is None:
+        raise ValueError("zstd compression needs the zstandard package")
+    if codec not in codecExtDict:
+        raise ValueError("Unknown compression: " + codec)
+    return codec
+
+def openCompressed(path, codec=None):
+    """
+    Open a compressed file for reading the decompressed data
+    """
+    if codec is None:
+        codec = compressionOf(path)
+
+    if codec == 'gzip':
+        return gzip.open(path, 'rb')
+    elif codec == 'zstd':
+        if zstandard is None:
+            raise OSError("Cannot read " + path + ", zstd needs the zstandard package")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    else:
+        raise ValueError("Unknown compression: " + str(codec))
+
+def decompressData(data, codec):
+    """
+    Decompress the data of a compressed file read in memory, e.g. from an
+    archive
+    """
+    if codec == 'gzip':
+        return gzip.decompress(data)
+    elif codec == 'zstd':
+        if zstandard is None:
+            raise OSError("Cannot read zstd data, it needs the zstandard package")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    else:
+        raise ValueError("Unknown compression: " + str(codec))
+
+def readDecompressed(path):
+    """
+    Read and decompress a whole file
+    """
+    with openCompressed(path) as fp:
+        return fp.read()
+
+def compressFile(path, codec='auto', removeSource=True):
+    """
+    Compress a file next to the original. The compressed file is written
+    under a temporary name and decompressed again to check its checksum
+    against the checksum of the original before it is renamed; only then
+    the original is removed.
+
+    Returns:
+        the path of the compressed file
+    Raises:
+        OSError when the file cannot be compressed or the checksums differ
+    """
+
+    codec = selectCodec(codec)
+    compressedPath = path + '.' + codecExtDict[codec]
+    temporaryPath = compressedPath + '.tmp'
+
+    sourceHash = hashlib.sha256()
+
+    try:
+        with open(path, 'rb') as source:
+            if codec == 'gzip':
+                target = gzip.open(temporaryPath, 'wb')
+            else:
+                target = zstandard.ZstdCompressor().stream_writer(open(temporaryPath, 'wb'))
+            with target:
+                for chunk in iter(lambda: source.read(chunkSize), b''):
+                    sourceHash.update(chunk)
+                    target.write(chunk)
+
+        compressedHash = hashlib.sha256()
+        with openCompressed(temporaryPath, codec) as fp:
+            for chunk in iter(lambda: fp.read(chunkSize), b''):
+                compressedHash.update(chunk)
+
+        if compressedHash.digest() != sourceHash.digest():
+            raise OSError("Checksum of " + compressedPath + " does not match " + path)
+
+        os.replace(temporaryPath, compressedPath)
+    except BaseException:
+        if os.path.exists(temporaryPath):
+            os.remove(temporaryPath)
+        raise
+
+    logging.debug("Compressed %s, sha256 %s", compressedPath, sourceHash.hexdigest())
+
+    if removeSource:
+        os.remove(path)
+
+    return compressedPath
+
+
+class DecompressingReader(io.RawIOBase):
+    """
+    Binary file object with the decompressed data of a file. A worker
+    thread decompresses the file in chunks ahead of the reader, so
+    decompression overlaps with parsing.
+    """
+    def __init__(self, path, queueSize=4):
+        super(DecompressingReader, self).__init__()
+        self.path = path
+        self.chunkQueue = queue.Queue(queueSize)
+        self.stopEvent = threading.Event()
+        self.buffer = memoryview(b'')
+        self.finished = False
+        self.thread = threading.Thread(target=self._decompress, daemon=True)
+        self.thread.start()
+
+    def _decompress(self):
+        try:
+            with openCompressed(self.path) as fp:
+                while not self.stopEvent.is_set():
+                    chunk = fp.read(chunkSize)
+                    self._put(chunk)
+                    if not chunk:
+                        break
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        while not self.stopEvent.is_set():
+            try:
+                self.chunkQueue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self):
+        return True
+
+    def peekStart(self, size):
+        """
+        The first bytes of the data, without consuming them. Only valid
+        before the first read.
+        """
+        data = bytes(self.buffer)
+        while len(data) < size and not self.finished:
+            item = self.chunkQueue.get()
+            if isinstance(item, Exception):
+                self.finished = True
+                raise item
+            if not item:
+                self.finished = True
+            data += item
+        self.buffer = memoryview(data)
+        return data[:size]
+
+    def readinto(self, buffer):
+        while not self.buffer and not self.finished:
+            item = self.chunkQueue.get()
+            if isinstance(item, Exception):
+                self.finished = True
+                raise item
+            if not item:
+                self.finished = True
+            self.buffer = memoryview(item)
+
+        size = min(len(buffer), len(self.buffer))
+        buffer[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self.stopEvent.set()
+            self.thread.join()
+        super(DecompressingReader, self).close()
@@ -19,11 +19,13 @@ Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public Lic
 
 import os
 import sys
+import time
 import subprocess
 from configobj import ConfigObj
 
 from libopensesametoolbox.io_tools import getResourceLoc
 from libopensesametoolbox.clean_data import stringToBool
+from libopensesametoolbox.instrumentation import createInstrumentation
 
 config = ConfigObj(getResourceLoc('opensesame-toolbox.conf'))
 
@@ -33,9 +35,19 @@ debug       = stringToBool(conf_experimentmanager_ui['debug'])
 
 def ExperimentManager(pythonCommand, command, expFolder, logDestinationFileList,
                       subjectNr, languageString, experimentList, fullscreen,
-                      customResolution,resolutionHorizontal, resolutionVertical):
+                      customResolution,resolutionHorizontal, resolutionVertical, instrumentation=None,
+                      postRun=None, integrity=None):
         """
         Initialize Experiment Manager UI
+
+        When a PostRunPipeline is given, the log file of every finished
+        experiment is handed to it, its steps run in the background while the
+        next experiment starts.
+
+        When an IntegrityRecorder is given, the size, SHA-256, start and end
+        time and exit status of every log file are recorded in the integrity
+        manifest of its folder, also in the background. The post-run steps of
+        a log start when it has been recorded.
         """
 
         conf_experimentmanager = config['experimentmanager']
@@ -49,6 +61,9 @@ def ExperimentManager(pythonCommand, command, expFolder, logDestinationFileList,
 
         noErrors = True
 
+        if instrumentation is None:
+            instrumentation = createInstrumentation('Experiment_Manager')
+
         for index in range(len(experimentList)):
 
             fileName      = os.path.join(expFolder,languageString,experimentList[index])
@@ -84,7 +99,26 @@ def ExperimentManager(pythonCommand, command, expFolder, logDestinationFileList,
 
 
             try:
-                subprocess.call(args)
+                startClock = time.time()
+                startTime = time.perf_counter()
+                process = subprocess.Popen(args)
+                startupTime = time.perf_counter() - startTime
+                returnCode = process.wait()
+                runTime = time.perf_counter() - startTime - startupTime
+                endClock = time.time()
+
+                instrumentation.addTime('startup', startupTime)
+                instrumentation.addTime('run', runTime)
+                instrumentation.addEvent(experiment=experimentList[index], startup=startupTime,
+                                         run=runTime, exitStatus=returnCode)
+
+                recorded = None
+                if integrity is not None:
+                    recorded = integrity.submit(logDestinationFileList[index], startClock, endClock, returnCode,
+                                                experiment=experimentList[index], subject=subjectNr)
+
+                if postRun is not None and os.path.isfile(logDestinationFileList[index]):
+                    postRun.submit(logDestinationFileList[index], recorded)
                 #output = subprocess.check_output(args)
                 #output = subprocess.check_output(' '.join(args), stderr=subprocess.STDOUT, shell=True)
                 #print('Got stdout: ', output)
@@ -92,6 +126,11 @@ def ExperimentManager(pythonCommand, command, expFolder, logDestinationFileList,
             except:
                 noErrors=False
 
+        if logDestinationFileList:
+            reportFolder = os.path.commonpath([os.path.dirname(path) for path in logDestinationFileList])
+            reportPath = instrumentation.writeReport(reportFolder)
+            if reportPath:
+                print('Saved performance report: ' + reportPath)
 
         sys.stdout.write('\nTotal process done!\n')
         return noErrors
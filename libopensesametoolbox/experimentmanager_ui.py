@@ -24,6 +24,7 @@ import errno
 import tempfile
 import tarfile
 import logging
+import functools
 
 from configobj import ConfigObj
 from PyQt5 import QtCore, QtGui, QtWidgets, uic
@@ -34,6 +35,11 @@ from libopensesametoolbox.experimentmanager import ExperimentManager
 from libopensesametoolbox.questionnairecreator_ui import QuestionnaireCreatorUI
 from libopensesametoolbox.io_tools import OutLog, getResourceLoc, findOpensesamerun
 from libopensesametoolbox.clean_data import stringToBool
+from libopensesametoolbox.compression import codecExtDict
+from libopensesametoolbox.postrun import createPostRunPipeline
+from libopensesametoolbox.integrity import createIntegrityRecorder
+from libopensesametoolbox.scheduler import RosterScheduler
+from libopensesametoolbox.library import LibraryWorker, patternRename, renamePlan, removePlan, copyPlan, importPlan
 
 
 version = "2.8"
@@ -170,6 +176,15 @@ class ExperimentManagerUI(QtWidgets.QMainWindow):
         self.defaultResolutionVerticalInteger   = int(self.conf_experimentmanager_ui['defaultResolutionVerticalInteger'])
         self.extensionList                      = list(self.conf_experimentmanager_ui['extensionList'])
 
+        # background steps on finished log files
+        self.postRun = createPostRunPipeline()
+        self.integrity = createIntegrityRecorder()
+
+        # background rename, remove, copy and import of experiments
+        self.libraryThread   = None
+        self.libraryWorker   = None
+        self.libraryProgress = None
+
 
     def _initUI(self):
         """
@@ -299,62 +314,18 @@ class ExperimentManagerUI(QtWidgets.QMainWindow):
         Starts the sanity checks and if passed then the execution of experiments.
         """
 
-        if not self.sourceFolder:
-            errorMessage = "Please select a source folder containing the experiment files."
-            print(errorMessage, file=sys.stderr)
-            self.showErrorMessage(errorMessage)
+        if not self.checkRunSettings():
             return
-        elif not self.destinationFolder :
-            errorMessage = "Please select a log folder."
-            print(errorMessage, file=sys.stderr)
-            self.showErrorMessage(errorMessage)
         elif not self.subjectLineEdit.text().strip().isdigit():
             errorMessage = "Please enter an integer as subject number."
             print(errorMessage, file=sys.stderr)
             self.showErrorMessage(errorMessage)
             return
-        elif not self.srcCheckBox.isChecked() and not self.opensesamerunCommandAuto and not self.opensesamerunCommandManual:
-            error_message = "Please specify the path to the opensesamerun executable."
-            print(error_message, file=sys.stderr)
-            self.showErrorMessage(error_message)
-            return
-        elif self.srcCheckBox.isChecked() and not self.opensesamerunCommandManual:
-            error_message = "Please specify the path to the opensesamerun source file."
-            print(error_message, file=sys.stderr)
-            self.showErrorMessage(error_message)
-            return
-        elif self.srcCheckBox.isChecked() and not self.pythonCommandManual:
-            error_message = "Please specify the path to the python 2 executable."
-            print(error_message, file=sys.stderr)
-            self.showErrorMessage(error_message)
-            return
 
         else:
 
             selectedSubjectNr = self.subjectLineEdit.displayText().strip()
 
-            if self.srcCheckBox.isChecked():
-                self.opensesamerunCommand = self.opensesamerunCommandManual
-                self.pythonCommand  = self.pythonCommandManual
-            else:
-                if self.opensesamerunCommandAuto:
-                    self.opensesamerunCommand = self.opensesamerunCommandAuto
-                    self.pythonCommand = ''
-                else:
-                    self.opensesamerunCommand = self.opensesamerunCommandManual
-                    self.pythonCommand  = ''
-
-            fullscreen = self.fullscreenCheckBox.isChecked()
-            customResolution = self.customResolutionCheckBox.isChecked()
-
-            if customResolution:
-                resolutionHorizontal = str(self.resolutionHorizontalSpinBox.value())
-                resolutionVertical   = str(self.resolutionVerticalSpinBox.value())
-            else:
-                resolutionHorizontal = None
-                resolutionVertical   = None
-
-
             [selectedExperimentList, selectedLanguage] = self.getSelectedExperimentData()
 
             if not selectedExperimentList:
@@ -365,59 +336,165 @@ class ExperimentManagerUI(QtWidgets.QMainWindow):
             else:
                 pass
 
-            logFileExists = None
-            logDestinationFilePathList = []
-            for experiment in selectedExperimentList:
-                strippedExperiment = experiment
-                logDestinationFolder = os.path.join(self.destinationFolder, selectedLanguage, strippedExperiment)
-                logDestinationFile = 'subject-' + selectedSubjectNr + '.csv'
-                logDestinationFilePath = os.path.join(logDestinationFolder, logDestinationFile)
-                logDestinationFilePathList.append(logDestinationFilePath)
+            self.runExperiments(selectedSubjectNr, selectedLanguage, selectedExperimentList)
 
-                try:
-                    os.makedirs(logDestinationFolder)
-                except OSError as exc: # Python >2.5
-                    if exc.errno == errno.EEXIST and os.path.isdir(logDestinationFolder):
-                        pass
-                    else: raise
+    def checkRunSettings(self):
+        """
+        Check the folders and commands needed to run experiments, showing an
+        error message when one is missing
+        """
 
-                if  os.path.isfile(logDestinationFilePath):
-                    logFileExists = True
-                else:
-                    pass
+        if not self.sourceFolder:
+            errorMessage = "Please select a source folder containing the experiment files."
+        elif not self.destinationFolder :
+            errorMessage = "Please select a log folder."
+        elif not self.srcCheckBox.isChecked() and not self.opensesamerunCommandAuto and not self.opensesamerunCommandManual:
+            errorMessage = "Please specify the path to the opensesamerun executable."
+        elif self.srcCheckBox.isChecked() and not self.opensesamerunCommandManual:
+            errorMessage = "Please specify the path to the opensesamerun source file."
+        elif self.srcCheckBox.isChecked() and not self.pythonCommandManual:
+            errorMessage = "Please specify the path to the python 2 executable."
+        else:
+            return True
 
-            if logFileExists:
-                overwriteCheck = self.confirmOverwriteEvent()
-                if not overwriteCheck:
-                    return
-                else:
+        print(errorMessage, file=sys.stderr)
+        self.showErrorMessage(errorMessage)
+        return False
+
+    def runExperiments(self, selectedSubjectNr, selectedLanguage, selectedExperimentList, session=''):
+        """
+        Run the experiments for a subject, the logs of a session other than
+        the default one get the session in their name. Returns True when the
+        experiments were run.
+        """
+
+        if self.srcCheckBox.isChecked():
+            self.opensesamerunCommand = self.opensesamerunCommandManual
+            self.pythonCommand  = self.pythonCommandManual
+        else:
+            if self.opensesamerunCommandAuto:
+                self.opensesamerunCommand = self.opensesamerunCommandAuto
+                self.pythonCommand = ''
+            else:
+                self.opensesamerunCommand = self.opensesamerunCommandManual
+                self.pythonCommand  = ''
+
+        fullscreen = self.fullscreenCheckBox.isChecked()
+        customResolution = self.customResolutionCheckBox.isChecked()
+
+        if customResolution:
+            resolutionHorizontal = str(self.resolutionHorizontalSpinBox.value())
+            resolutionVertical   = str(self.resolutionVerticalSpinBox.value())
+        else:
+            resolutionHorizontal = None
+            resolutionVertical   = None
+
+        logFileExists = None
+        logDestinationFilePathList = []
+        for experiment in selectedExperimentList:
+            strippedExperiment = experiment
+            logDestinationFolder = os.path.join(self.destinationFolder, selectedLanguage, strippedExperiment)
+            if session:
+                logDestinationFile = 'subject-' + selectedSubjectNr + '-session-' + session + '.csv'
+            else:
+                logDestinationFile = 'subject-' + selectedSubjectNr + '.csv'
+            logDestinationFilePath = os.path.join(logDestinationFolder, logDestinationFile)
+            logDestinationFilePathList.append(logDestinationFilePath)
+
+            try:
+                os.makedirs(logDestinationFolder)
+            except OSError as exc: # Python >2.5
+                if exc.errno == errno.EEXIST and os.path.isdir(logDestinationFolder):
                     pass
-            elif not logFileExists:
-                overwriteCheck = True
+                else: raise
+
+            compressedPathList = [logDestinationFilePath + '.' + extension for extension in codecExtDict.values()]
+            if  os.path.isfile(logDestinationFilePath) or any(map(os.path.isfile, compressedPathList)):
+                logFileExists = True
             else:
-                overwriteCheck = False
-                return
+                pass
 
-            if overwriteCheck:
-                print("Starting Experiment...")
-                finishedExperiment = ExperimentManager(self.pythonCommand, self.opensesamerunCommand,
-                                                       self.sourceFolder, logDestinationFilePathList,
-                                                       selectedSubjectNr, selectedLanguage, selectedExperimentList,
-                                                       fullscreen, customResolution,resolutionHorizontal, resolutionVertical)
+        if logFileExists:
+            overwriteCheck = self.confirmOverwriteEvent()
+            if not overwriteCheck:
+                return False
+            else:
+                pass
+        else:
+            overwriteCheck = True
+
+        if overwriteCheck:
+            print("Starting Experiment...")
+            finishedExperiment = ExperimentManager(self.pythonCommand, self.opensesamerunCommand,
+                                                   self.sourceFolder, logDestinationFilePathList,
+                                                   selectedSubjectNr, selectedLanguage, selectedExperimentList,
+                                                   fullscreen, customResolution,resolutionHorizontal, resolutionVertical,
+                                                   postRun=self.postRun, integrity=self.integrity)
+
+            if finishedExperiment:
+                print("Output saved to " + self.destinationFolder)
+                print("Ready.")
+                return True
+            else:
+                errorMessage = "Error: Could not start the experiments! Did you select the correct opensesamerun and Python File?"
+                print(errorMessage, file=sys.stderr)
+                self.showErrorMessage(errorMessage)
+                return False
 
-                if finishedExperiment:
-                    print("Output saved to " + self.destinationFolder)
-                    print("Ready.")
-                    return
+    def runRosterJobs(self, rosterPath, station=None, maxJobs=1):
+        """
+        Run the next job(s) of a roster with the current settings: the
+        subject, language and experiments come from the roster, see the
+        scheduler module. With maxJobs 0 all remaining jobs are run.
+        """
+
+        if not self.checkRunSettings():
+            return
+
+        try:
+            scheduler = RosterScheduler(rosterPath, station)
+        except ValueError as e:
+            errorMessage = "Error: " + str(e)
+            print(errorMessage, file=sys.stderr)
+            self.showErrorMessage(errorMessage)
+            return
+
+        jobCount = 0
+        while not maxJobs or jobCount < maxJobs:
+            job = scheduler.nextJob()
+            if job is None:
+                print("No jobs left in roster " + rosterPath)
+                break
+
+            ## the experiments can be given with or without their extension
+            experimentFileList = self.experimentFileListDict.get(job.language, [])
+            experimentList = []
+            missingList = []
+            for experiment in job.experiments:
+                matchList = [fileName for fileName in [experiment] + [experiment + extension for extension in self.extensionList]
+                             if fileName in experimentFileList]
+                if matchList:
+                    experimentList.append(matchList[0])
                 else:
-                    errorMessage = "Error: Could not start the experiments! Did you select the correct opensesamerun and Python File?"
-                    print(errorMessage, file=sys.stderr)
-                    self.showErrorMessage(errorMessage)
-                    return
-            else:
-                errorMessageList = []
-                self.showErrorMessage(''.join(errorMessageList))
-                return
+                    missingList.append(experiment)
+
+            if missingList:
+                errorMessage = ("Error: Experiment(s) " + ', '.join(missingList) + " of roster job " + job.jobId +
+                                " not found in language folder " + job.language)
+                print(errorMessage, file=sys.stderr)
+                self.showErrorMessage(errorMessage)
+                scheduler.finishJob(job, False)
+                break
+
+            print("Roster job " + job.jobId + ": subject " + job.subject + ", " + ', '.join(experimentList))
+            finishedJob = self.runExperiments(job.subject, job.language, experimentList, job.session)
+            scheduler.finishJob(job, finishedJob)
+            if not finishedJob:
+                break
+
+            jobCount += 1
+            [doneCount, totalCount] = scheduler.progress()
+            print("Roster progress: " + str(doneCount) + " of " + str(totalCount) + " jobs done")
 
 
     def listItemRightClicked(self, QPos):
@@ -425,112 +502,262 @@ class ExperimentManagerUI(QtWidgets.QMainWindow):
         Add right click context menu to the ListWidget
         """
         self.listMenu= QtWidgets.QMenu()
-        renameItem = self.listMenu.addAction("Rename Questionnaire on disk")
-        removeItem = self.listMenu.addAction("Delete Questionnaire from disk")
-
-        if self.experimentListWidget.count() == 0:
+        renameItem = self.listMenu.addAction("Rename Questionnaire(s) on disk")
+        removeItem = self.listMenu.addAction("Delete Questionnaire(s) from disk")
+        copyItem = self.listMenu.addAction("Copy Questionnaire(s) to language")
+        self.listMenu.addSeparator()
+        importFolderItem = self.listMenu.addAction("Import Questionnaires from folder")
+        importArchiveItem = self.listMenu.addAction("Import Questionnaires from archive")
+
+        if not self.experimentListWidget.selectedItems():
             renameItem.setDisabled(True)
             removeItem.setDisabled(True)
+            copyItem.setDisabled(True)
+
+        if self.languageComboBox.currentText() == '':
+            importFolderItem.setDisabled(True)
+            importArchiveItem.setDisabled(True)
+
+        if self.libraryThread is not None:
+            for action in self.listMenu.actions():
+                action.setDisabled(True)
 
         renameItem.triggered.connect(self.renameItemClicked)
         removeItem.triggered.connect(self.removeItemClicked)
+        copyItem.triggered.connect(self.copyItemClicked)
+        importFolderItem.triggered.connect(self.importFolderClicked)
+        importArchiveItem.triggered.connect(self.importArchiveClicked)
 
         parentPosition = self.experimentListWidget.mapToGlobal(QtCore.QPoint(0, 0))
         self.listMenu.move(parentPosition + QPos)
 
         self.listMenu.show()
 
+    def selectedItemNames(self):
+        """
+        The names of the selected items, in the order of the ListWidget
+        """
+        return [self.experimentListWidget.item(index).text() for index in range(self.experimentListWidget.count())
+                if self.experimentListWidget.item(index).isSelected()]
+
     def renameItemClicked(self):
         """
-        Create right click rename method
+        Create right click rename method, a single item gets a new name and
+        several items are renamed by pattern
         """
-        if self.experimentListWidget.count() == 0:
+        nameList = self.selectedItemNames()
+        if not nameList:
             return
 
-        currentWidget       = self.experimentListWidget.currentItem()
-        currentItemName     = self.experimentListWidget.currentItem().text()
-        currentItemLanguage = self.languageComboBox.currentText()
+        language = self.languageComboBox.currentText()
 
-        fileExistsCheck = True
-        go = True
-        noChange = False
+        try:
+            if len(nameList) == 1:
+                [destItemName, go] = self.renameEvent(nameList[0])
+                if not go:
+                    return
+                targetDict = {nameList[0]: destItemName.strip()}
+            else:
+                title = "Rename " + str(len(nameList)) + " questionnaires"
+                [pattern, go] = QtWidgets.QInputDialog.getText(self, title,
+                    "Pattern (regular expression, the names are without extension):", QtWidgets.QLineEdit.Normal, '')
+                if not go or not pattern:
+                    return
+                [replacement, go] = QtWidgets.QInputDialog.getText(self, title,
+                    "Replace by (\\1 for the first group):", QtWidgets.QLineEdit.Normal, '')
+                if not go:
+                    return
+                targetDict = patternRename(nameList, pattern, replacement, self.extensionList)
 
-        while fileExistsCheck and go and not noChange:
+            operationList = renamePlan(language, targetDict, self.experimentFileListDict[language])
+        except ValueError as e:
+            print(str(e), file=sys.stderr)
+            self.showErrorMessage(str(e))
+            return
 
-            destItemValueTuple = self.renameEvent(currentItemName)
-            go = destItemValueTuple[1]
-            destItemName = destItemValueTuple[0]
+        if operationList:
+            self.startLibraryOperation("Renaming questionnaires...", lambda: [operationList, []])
 
-            srcFilePath  = os.path.join(self.sourceFolder, currentItemLanguage, currentItemName)
-            destFilePath = os.path.join(self.sourceFolder, currentItemLanguage, destItemName)
+    def removeItemClicked(self):
+        """
+        Create right click remove item method
+        """
+        nameList = self.selectedItemNames()
+        if not nameList:
+            return
 
-            if srcFilePath ==  destFilePath:
-                noChange = True
+        language = self.languageComboBox.currentText()
 
-            fileExistsCheck = os.path.exists(destFilePath)
+        if self.confirmDeleteEvent(len(nameList)):
+            operationList = removePlan(language, nameList)
+            self.startLibraryOperation("Deleting questionnaires...", lambda: [operationList, []])
 
-            if fileExistsCheck and not noChange and go:
-                errorMessage = "A questionnaire with that filename already exists, please select another name"
-                self.showErrorMessage(errorMessage)
+    def copyItemClicked(self):
+        """
+        Copy the selected items to another (or a new) language
+        """
+        nameList = self.selectedItemNames()
+        if not nameList:
+            return
 
-        if go and not fileExistsCheck:
+        language = self.languageComboBox.currentText()
+        otherLanguageList = [lang for lang in self.langList if lang != language]
 
-            try:
-                self.renameQuestionnaire(srcFilePath, destFilePath)
-            except Exception:
-                errorMessage = 'Access denied, cannot rename experiment, do you have the correct permissions?'
-                self.showErrorMessage(errorMessage)
-                return
+        [targetLanguage, go] = QtWidgets.QInputDialog.getItem(self, "Copy questionnaires",
+            "Language (a new name creates the language):", otherLanguageList, 0, True)
+        targetLanguage = targetLanguage.strip()
+        if not go or not targetLanguage or targetLanguage == language:
+            return
+        if os.sep in targetLanguage or '/' in targetLanguage:
+            self.showErrorMessage("Invalid language " + targetLanguage)
+            return
 
-            currentWidget.setText(destItemName)
+        targetNameList = list(self.experimentFileListDict.get(targetLanguage, []))
+        plan = functools.partial(copyPlan, language, nameList, targetLanguage, targetNameList)
+        self.startLibraryOperation("Copying questionnaires...", plan)
 
-            expindex = self.experimentFileListDict[currentItemLanguage].index(currentItemName)
-            self.experimentFileListDict[currentItemLanguage][expindex] = destItemName
+    def importFolderClicked(self):
+        """
+        Import the experiments of a folder and its subfolders into the current language
+        """
+        selectedFolder = QtWidgets.QFileDialog.getExistingDirectory(self, "Select Directory", directory=self.homeFolder)
+        if selectedFolder:
+            self.startImport(selectedFolder)
 
-            nameindex = self.widgetItemNameListDict[currentItemLanguage].index(currentItemName)
-            self.widgetItemNameListDict[currentItemLanguage][nameindex] = destItemName
+    def importArchiveClicked(self):
+        """
+        Import the experiments of a zip or tar archive into the current language
+        """
+        archiveExtList = config['questionnaireprocessor']['archiveExtList']
+        extFilter = "Archives (" + ' '.join('*.' + extension for extension in archiveExtList) + ")"
+        selectedArchive = QtWidgets.QFileDialog.getOpenFileName(self, "Open File..", self.homeFolder, extFilter)
+        if selectedArchive[0]:
+            self.startImport(selectedArchive[0])
 
-    def removeItemClicked(self):
+    def startImport(self, sourcePath):
         """
-        Create right click remove item method
+        Import the experiments of a folder or archive into the current language
         """
-        if self.experimentListWidget.count() == 0:
+        language = self.languageComboBox.currentText()
+        if not self.isWritable(os.path.join(self.sourceFolder, language)):
+            errorMessage = 'Access denied, cannot write in questionnaire folder, please change questionnaire folder.'
+            self.showErrorMessage(errorMessage)
             return
 
-        currentWidget = self.experimentListWidget.currentItem()
-        currentItemName = currentWidget.text()
-        currentItemLanguage = self.languageComboBox.currentText()
+        existingNameList = list(self.experimentFileListDict[language])
+        plan = functools.partial(importPlan, sourcePath, language, existingNameList, self.extensionList)
+        self.startLibraryOperation("Importing questionnaires...", plan)
+
+    def startLibraryOperation(self, label, plan):
+        """
+        Run library operations on a worker thread with a progress dialog, the
+        dicts and widgets are updated once when it has finished
+        """
+        self.libraryThread = QtCore.QThread(self)
+        self.libraryWorker = LibraryWorker(self.sourceFolder, plan)
+        self.libraryWorker.moveToThread(self.libraryThread)
 
-        if self.confirmDeleteEvent():
+        self.libraryProgress = QtWidgets.QProgressDialog(label, "Cancel", 0, 0, self)
+        self.libraryProgress.setWindowModality(QtCore.Qt.WindowModal)
+        self.libraryProgress.setMinimumDuration(500)
+        self.libraryProgress.canceled.connect(self.libraryWorker.cancel, QtCore.Qt.DirectConnection)
 
-            try:
-                self.removeQuestionnaire(currentItemName, currentItemLanguage)
-            except Exception:
-                errorMessage = 'Access denied, cannot delete experiment, do you have the correct permissions?'
-                self.showErrorMessage(errorMessage)
-                return
+        self.libraryThread.started.connect(self.libraryWorker.run)
+        self.libraryWorker.finished.connect(self.libraryThread.quit, QtCore.Qt.DirectConnection)
+        self.libraryWorker.progress.connect(self.libraryOperationProgress)
+        self.libraryWorker.finished.connect(self.libraryOperationFinished)
 
-            widgetIndex = self.experimentListWidget.row(currentWidget)
-            self.experimentListWidget.takeItem(widgetIndex)
+        self.libraryThread.start()
 
-            self.experimentFileListDict[currentItemLanguage].remove(currentItemName)
-            self.widgetItemObjectListDict[currentItemLanguage].remove(currentWidget)
-            self.widgetItemNameListDict[currentItemLanguage].remove(currentItemName)
+    def libraryOperationProgress(self, doneCount, totalCount):
+        """
+        Show the progress of the library operations
+        """
+        if self.libraryProgress is not None:
+            self.libraryProgress.setMaximum(totalCount)
+            self.libraryProgress.setValue(doneCount)
 
-    def renameQuestionnaire(self,srcFilePath,destFilePath):
+    def libraryOperationFinished(self, doneList, skippedList, errorList):
         """
-        Rename item on disk
+        Apply the library operations that were done to the dicts and widgets
+        in a single update
         """
-        if  os.path.isfile(srcFilePath) and not os.path.exists(destFilePath):
-            os.rename(srcFilePath, destFilePath)
+        self.libraryThread.wait()
+        self.libraryThread = None
+        self.libraryWorker = None
+        if self.libraryProgress is not None:
+            self.libraryProgress.close()
+            self.libraryProgress = None
+
+        self.applyLibraryChanges(doneList)
 
-    def removeQuestionnaire(self,fileName,lang):
+        print(str(len(doneList)) + " questionnaire(s) done, " + str(len(skippedList)) + " skipped (already present)")
+        if errorList:
+            for errorMessage in errorList:
+                print(errorMessage, file=sys.stderr)
+            self.showErrorMessage("Not all questionnaires could be processed, do you have the correct permissions?\n" +
+                                  '\n'.join(errorList[:10]))
+
+    def applyLibraryChanges(self, doneList):
         """
-        Remove item from disk
+        Update the dicts and widgets with renamed, removed and added
+        experiments, one pass per language
         """
-        filePath = os.path.join(self.sourceFolder, lang, fileName)
-        if  os.path.isfile(filePath):
-            os.remove(filePath)
+        try: self.languageComboBox.currentIndexChanged.disconnect(self.updateListWidget)
+        except Exception: pass
+
+        ## the current order of the ListWidget is kept in the dicts
+        self.emptyListWidget()
+
+        renameDict = {}
+        removeDict = {}
+        addDict = {}
+        for operation in doneList:
+            if operation.kind == 'rename':
+                renameDict.setdefault(operation.language, {})[operation.name] = operation.target
+            elif operation.kind == 'remove':
+                removeDict.setdefault(operation.language, set()).add(operation.name)
+            elif operation.kind == 'copy':
+                addDict.setdefault(operation.target, []).append(operation.name)
+            elif operation.kind == 'import':
+                addDict.setdefault(operation.language, []).append(operation.name)
+
+        for lang in set(renameDict) | set(removeDict) | set(addDict):
+            if lang not in self.langList:
+                self.langList.append(lang)
+                self.experimentFileListDict[lang] = []
+                self.widgetItemNameListDict[lang] = []
+                self.widgetItemObjectListDict[lang] = []
+
+            nameDict = renameDict.get(lang, {})
+            removeSet = removeDict.get(lang, set())
+
+            self.experimentFileListDict[lang] = [nameDict.get(name, name) for name in self.experimentFileListDict[lang]
+                                                 if name not in removeSet]
+
+            widgetItemNameList = []
+            widgetItemObjectList = []
+            for [name, listWidgetItem] in zip(self.widgetItemNameListDict[lang], self.widgetItemObjectListDict[lang]):
+                if name in removeSet:
+                    continue
+                if name in nameDict:
+                    name = nameDict[name]
+                    listWidgetItem.setText(name)
+                widgetItemNameList.append(name)
+                widgetItemObjectList.append(listWidgetItem)
+
+            for name in addDict.get(lang, []):
+                self.experimentFileListDict[lang].append(name)
+                widgetItemNameList.append(name)
+                widgetItemObjectList.append(self.createListWidgetItem(name))
+
+            self.widgetItemNameListDict[lang] = widgetItemNameList
+            self.widgetItemObjectListDict[lang] = widgetItemObjectList
+
+        self.updateComboBoxItems()
+        self.fillListWidget()
+
+        self.languageComboBox.currentIndexChanged.connect(self.updateListWidget)
 
     def isWritable(self, path):
         """
@@ -625,7 +852,11 @@ class ExperimentManagerUI(QtWidgets.QMainWindow):
         """
         if os.path.isfile(settingsFilePath):
             self.settingsRestore = QtCore.QSettings(settingsFilePath, QtCore.QSettings.IniFormat)
-            self.refreshWidgets()
+
+            ## the experiment folder is scanned once: restoreSettings scans a new folder itself
+            sourceFolder = self.settingsRestore.value('sourceFolder')
+            if not sourceFolder or not os.path.isdir(sourceFolder) or sourceFolder == self.sourceFolder:
+                self.refreshWidgets()
             self.restoreSettings()
         else:
             errorMessage = "File not found, nothing to restore."
@@ -735,12 +966,14 @@ class ExperimentManagerUI(QtWidgets.QMainWindow):
                     expFileList.extend(glob.glob(languageDir + self.fs + '*' + extension))
 
                 expFileList = sorted(expFileList)
+                expFileSet = set(self.experimentFileListDict[item])
 
                 for expFilePath in expFileList:
                     expFile = os.path.basename(expFilePath)
                     if os.path.isfile(expFilePath):
-                        if expFile not in self.experimentFileListDict[item]:
+                        if expFile not in expFileSet:
                             self.experimentFileListDict[item].append(expFile)
+                            expFileSet.add(expFile)
                         else:
                             pass
                     else:
@@ -803,9 +1036,10 @@ class ExperimentManagerUI(QtWidgets.QMainWindow):
             else:
                 pass
 
+            widgetItemNameSet = set(self.widgetItemNameListDict[lang])
             for index in range(len(expnameList)):
                 widgetItemName = expnameList[index]
-                if widgetItemName not in self.widgetItemNameListDict[lang]:
+                if widgetItemName not in widgetItemNameSet:
                     listWidgetItem = self.createListWidgetItem(widgetItemName)
                     self.widgetItemNameListDict[lang].append(widgetItemName)
                     self.widgetItemObjectListDict[lang].append(listWidgetItem)
@@ -854,6 +1088,7 @@ class ExperimentManagerUI(QtWidgets.QMainWindow):
 
             widgetList = list(self.widgetItemObjectListDict[lang])
             widgetNameList = list(self.widgetItemNameListDict[lang])
+            widgetIndexDict = dict((id(listWidgetItem), index) for index, listWidgetItem in enumerate(widgetList))
 
 
             self.widgetItemNameListDict[lang] = []
@@ -861,7 +1096,7 @@ class ExperimentManagerUI(QtWidgets.QMainWindow):
 
             for index in range(nrListWidgetItems):
                 listWidgetItem = self.experimentListWidget.takeItem(0)
-                widgetIndex = widgetList.index(listWidgetItem)
+                widgetIndex = widgetIndexDict[id(listWidgetItem)]
 
                 self.widgetItemNameListDict[lang].append(widgetNameList[widgetIndex])
                 self.widgetItemObjectListDict[lang].append(listWidgetItem)
@@ -980,9 +1215,10 @@ class ExperimentManagerUI(QtWidgets.QMainWindow):
         sourceFolder = self.settingsRestore.value('sourceFolder')
         if sourceFolder:
             if os.path.isdir(sourceFolder):
-                self.sourceFolder = sourceFolder
                 self.inputFolderLocation.setText(os.path.normpath(sourceFolder))
-                self._initWidgets()
+                if sourceFolder != self.sourceFolder:
+                    self.sourceFolder = sourceFolder
+                    self._initWidgets()
             else:
                 errorMessageList.append('- Experiment folder not found! Using current experiment folder\n')
         else:
@@ -1039,21 +1275,36 @@ class ExperimentManagerUI(QtWidgets.QMainWindow):
 
         selectedExperimentList = self.settingsRestore.value('selectedExperimentList')
         if selectedExperimentList:
+            ## QSettings returns a single experiment as a string
+            if isinstance(selectedExperimentList, str):
+                selectedExperimentList = [selectedExperimentList]
+
+            ## take all items out (from the end, that does not shift the others) and index them by name
             nWidgets = self.experimentListWidget.count()
-            for index in range(nWidgets):
-                self.experimentListWidget.item(index).setCheckState(QtCore.Qt.Unchecked)
+            listWidgetItemList = [self.experimentListWidget.takeItem(index) for index in reversed(range(nWidgets))]
+            listWidgetItemList.reverse()
+
+            listWidgetItemDict = {}
+            for listWidgetItem in listWidgetItemList:
+                listWidgetItem.setCheckState(QtCore.Qt.Unchecked)
+                listWidgetItemDict.setdefault(listWidgetItem.text(), listWidgetItem)
 
-            counter = 0
+            ## the selected experiments first, in their saved order, then the others as they were
+            orderedItemList = []
             for selectedExperiment in selectedExperimentList:
-                try:
-                    [listWidgetItem] = self.experimentListWidget.findItems(selectedExperiment,QtCore.Qt.MatchExactly)
-                    currentIndex = self.experimentListWidget.row(listWidgetItem)
-                    targetWidget = self.experimentListWidget.takeItem(currentIndex)
-                    targetWidget.setCheckState(QtCore.Qt.Checked)
-                    self.experimentListWidget.insertItem(counter,targetWidget)
-                    counter += 1
-                except Exception:
+                listWidgetItem = listWidgetItemDict.pop(selectedExperiment, None)
+                if listWidgetItem is None:
                     errorMessageExperimentList.append('- ' + selectedExperiment + ' not found in data, not restoring this item.\n')
+                else:
+                    listWidgetItem.setCheckState(QtCore.Qt.Checked)
+                    orderedItemList.append(listWidgetItem)
+
+            orderedItemSet = set(map(id, orderedItemList))
+            orderedItemList += [listWidgetItem for listWidgetItem in listWidgetItemList
+                                if id(listWidgetItem) not in orderedItemSet]
+
+            for row in range(len(orderedItemList)):
+                self.experimentListWidget.insertItem(row, orderedItemList[row])
         else:
             errorMessageList.append('- No experiments present in restore file! Cannot restore experiments.\n')
             self.showErrorMessage(''.join(errorMessageList))
@@ -1078,11 +1329,14 @@ class ExperimentManagerUI(QtWidgets.QMainWindow):
         qr.moveCenter(cp)
         self.move(qr.topLeft())
 
-    def confirmDeleteEvent(self):
+    def confirmDeleteEvent(self, nrItems=1):
         """
         Confirm box deleting item from disk
         """
-        message = "Are you sure to delete this questionnaire from disk?"
+        if nrItems == 1:
+            message = "Are you sure to delete this questionnaire from disk?"
+        else:
+            message = "Are you sure to delete these " + str(nrItems) + " questionnaires from disk?"
 
         reply = self.confirmEvent(message)
         return reply
@@ -1168,6 +1422,13 @@ class ExperimentManagerUI(QtWidgets.QMainWindow):
         reply = self.confirmEvent(message)
 
         if reply:
+            if self.libraryThread is not None:
+                self.libraryWorker.cancel()
+                self.libraryThread.wait()
+            if self.integrity is not None:
+                self.integrity.close()
+            if self.postRun is not None:
+                self.postRun.close()
             event.accept()
         else:
             event.ignore()
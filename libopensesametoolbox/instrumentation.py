@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import contextlib
+from collections import OrderedDict
+
+from configobj import ConfigObj
+
+from libopensesametoolbox.io_tools import getResourceLoc
+from libopensesametoolbox.clean_data import stringToBool
+from libopensesametoolbox.publish import atomicOpen
+
+config = ConfigObj(getResourceLoc('opensesame-toolbox.conf'))
+
+_forceEnabled = False
+
+
+def enableInstrumentation():
+    """
+    Switch instrumentation on regardless of the config file (used by the CLI)
+    """
+    global _forceEnabled
+    _forceEnabled = True
+
+def createInstrumentation(name):
+    """
+    Create an Instrumentation object, enabled when requested in the config
+    file or on the command line
+    """
+    conf_instrumentation = config['instrumentation']
+    enabled = _forceEnabled or stringToBool(conf_instrumentation['enabled'])
+    return Instrumentation(name, enabled)
+
+def peakRss():
+    """
+    Peak resident set size of this process in bytes, None if unknown
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return maxRss
+    else:
+        return maxRss * 1024
+
+
+class Instrumentation(object):
+    """
+    Collects per-phase timings, bytes read and per-item events of a run
+    """
+    def __init__(self, name, enabled=True):
+
+        self.name = name
+        self.enabled = enabled
+        self.startTime = time.time()
+        self.phaseTimeDict = OrderedDict()
+        self.phaseCountDict = OrderedDict()
+        self.bytesRead = 0
+        self.eventList = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Time the enclosed block and add it to the named phase
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addTime(name, time.perf_counter() - start)
+
+    def addTime(self, name, seconds):
+        """
+        Add a duration to the named phase
+        """
+        if not self.enabled:
+            return
+
+        self.phaseTimeDict[name] = self.phaseTimeDict.get(name, 0.0) + seconds
+        self.phaseCountDict[name] = self.phaseCountDict.get(name, 0) + 1
+
+    def addBytes(self, nrBytes):
+        """
+        Add to the number of bytes read
+        """
+        if self.enabled:
+            self.bytesRead += nrBytes
+
+    def addEvent(self, **event):
+        """
+        Record a single measurement, e.g. the run time of one experiment
+        """
+        if self.enabled:
+            self.eventList.append(event)
+
+    def report(self):
+        """
+        Return the collected measurements as a dict
+        """
+        phaseList = []
+        for name in self.phaseTimeDict:
+            phaseList.append({'phase': name,
+                              'seconds': self.phaseTimeDict[name],
+                              'calls': self.phaseCountDict[name]})
+
+        return {'name': self.name,
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.startTime)),
+                'wallSeconds': time.time() - self.startTime,
+                'bytesRead': self.bytesRead,
+                'peakRssBytes': peakRss(),
+                'phases': phaseList,
+                'events': self.eventList}
+
+    def writeReport(self, folder):
+        """
+        Write the report as JSON and TSV to the folder and to the debug log.
+        Returns the path of the JSON report or None when disabled.
+        """
+        if not self.enabled:
+            return None
+
+        conf_instrumentation = config['instrumentation']
+        reportName = self.name + '_' + conf_instrumentation['reportName']
+
+        report = self.report()
+        logging.debug("Performance report: %s", json.dumps(report))
+
+        jsonPath = os.path.join(folder, reportName + '.json')
+        tsvPath  = os.path.join(folder, reportName + '.tsv')
+
+        with atomicOpen(jsonPath, 'wt', encoding='utf-8') as fp:
+            json.dump(report, fp, indent=1)
+
+        with atomicOpen(tsvPath, 'wt', newline='', encoding='utf-8') as fp:
+            writer = csv.writer(fp, delimiter='\t')
+            writer.writerow(['Phase', 'Seconds', 'Calls'])
+            for phase in report['phases']:
+                writer.writerow([phase['phase'], repr(phase['seconds']), phase['calls']])
+            writer.writerow(['total', repr(report['wallSeconds']), 1])
+            writer.writerow(['bytes_read', report['bytesRead'], ''])
+            writer.writerow(['peak_rss_bytes', report['peakRssBytes'], ''])
+
+            if report['events']:
+                eventKeyList = []
+                for event in report['events']:
+                    for key in event:
+                        if key not in eventKeyList:
+                            eventKeyList.append(key)
+                writer.writerow([])
+                writer.writerow(eventKeyList)
+                for event in report['events']:
+                    writer.writerow([event.get(key, '') for key in eventKeyList])
+
+        return jsonPath
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import concurrent.futures
+
+from configobj import ConfigObj
+
+from libopensesametoolbox.io_tools import getResourceLoc
+from libopensesametoolbox.clean_data import stringToBool
+
+config = ConfigObj(getResourceLoc('opensesame-toolbox.conf'))
+
+chunkSize = 1024 * 1024
+
+## records of the experiments run by this process are appended by several threads
+manifestLock = threading.Lock()
+
+
+def manifestPath(folder):
+    """
+    The path of the integrity manifest of a log folder
+    """
+    return os.path.join(folder, config['default_io']['integrityName'])
+
+def sha256File(path):
+    """
+    The SHA-256 of a file, read in chunks so large files are not kept in memory
+    """
+    fileHash = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(chunkSize), b''):
+            fileHash.update(chunk)
+    return fileHash.hexdigest()
+
+def recordFile(path, **info):
+    """
+    Hash a file and append its record (file name, size, modification time
+    and SHA-256, plus the given info) to the manifest of its folder. A file
+    that does not exist is recorded without size and hash.
+
+    Returns:
+        the record
+    """
+    record = {'file': os.path.basename(path), 'size': None, 'mtime': None, 'sha256': None}
+    try:
+        stat = os.stat(path)
+        record['sha256'] = sha256File(path)
+    except FileNotFoundError:
+        pass
+    else:
+        ## the size and time before hashing, a file changed while hashing is reported as modified
+        record['size'] = stat.st_size
+        record['mtime'] = stat.st_mtime
+    record.update(info)
+
+    line = json.dumps(record, sort_keys=True) + '\n'
+    with manifestLock:
+        with open(manifestPath(os.path.dirname(path)), 'at', encoding='utf-8') as fp:
+            fp.write(line)
+            fp.flush()
+            os.fsync(fp.fileno())
+    return record
+
+def loadManifest(folder):
+    """
+    The records of the manifest of a folder by file name, the last record of
+    a file wins. A line that cannot be read (e.g. cut off by a crash) is
+    skipped.
+    """
+    recordDict = {}
+    try:
+        with open(manifestPath(folder), 'rt', encoding='utf-8') as fp:
+            for line in fp:
+                try:
+                    record = json.loads(line)
+                    recordDict[record['file']] = record
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except FileNotFoundError:
+        pass
+    return recordDict
+
+def verifyFile(path, size, mtime, record):
+    """
+    Check a file against its manifest record. When the size and
+    modification time are those of the record the file is not hashed again.
+
+    Returns:
+        None when the file is intact, otherwise truncated or modified
+    """
+    if record.get('sha256') is None or record.get('size') is None:
+        return None
+    if size < record['size']:
+        return 'truncated'
+    if size != record['size']:
+        return 'modified'
+    if mtime == record.get('mtime'):
+        return None
+    if sha256File(path) != record['sha256']:
+        return 'modified'
+    return None
+
+def createIntegrityRecorder():
+    """
+    Create the recorder when integrityManifest is enabled in the config
+    file, None otherwise
+    """
+    conf_experimentmanager = config['experimentmanager']
+    if not stringToBool(conf_experimentmanager['integrityManifest']):
+        return None
+    return IntegrityRecorder(int(conf_experimentmanager['hashWorkers']))
+
+
+class IntegrityRecorder(object):
+    """
+    Hashes the log files of finished experiments on a pool of worker
+    threads and records them in the manifest of their folder, so hashing a
+    large log does not delay the next experiment.
+    """
+    def __init__(self, workers):
+
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self.futureList = []
+
+    def submit(self, logFilePath, startTime, endTime, exitStatus, **info):
+        """
+        Queue a log file with the start and end time (seconds since the
+        epoch) and exit status of its experiment.
+
+        Returns:
+            a future that is done when the log file is recorded
+        """
+        self.futureList = [future for future in self.futureList if not future.done()]
+        future = self.executor.submit(self._record, logFilePath, start=_isoTime(startTime), end=_isoTime(endTime),
+                                      exitStatus=exitStatus, **info)
+        self.futureList.append(future)
+        return future
+
+    def _record(self, logFilePath, **info):
+        try:
+            record = recordFile(logFilePath, **info)
+        except OSError:
+            ## on a worker thread, stdout may be a widget of the GUI thread
+            logging.exception("Cannot record the checksum of %s", logFilePath)
+            return
+        logging.debug("Recorded %s, sha256 %s", logFilePath, record['sha256'])
+
+    def pending(self):
+        """
+        Number of log files that are not recorded yet
+        """
+        return len([future for future in self.futureList if not future.done()])
+
+    def close(self):
+        """
+        Wait for the queued log files and stop the worker threads
+        """
+        if self.pending():
+            print("Waiting for the checksums of " + str(self.pending()) + " log file(s)...")
+        self.executor.shutdown(wait=True)
+        self.futureList = []
+
+def _isoTime(timestamp):
+    return time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(timestamp))
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import os
+import json
+import logging
+
+
+class ScoreJournal(object):
+    """
+    Append-only journal (JSON lines) of the records of scored files. The
+    first line holds the settings of the run, every following line the
+    record of one scored file. A journal written with other settings is
+    not used for resuming. Without a path the journal is not written.
+    """
+    def __init__(self, path, settings, resume=False, sync=True):
+
+        self.path = path
+        ## compare settings the way they are read back from the journal
+        self.settings = json.loads(json.dumps(settings))
+        self.sync = sync
+        self.recordDict = None
+
+        if resume and self.path is not None:
+            self.recordDict = self.load()
+
+        if self.recordDict is not None:
+            ## continue the journal, a line cut off by a crash is ended first
+            self.fp = open(self.path, 'at', encoding='utf-8')
+            if self.fp.tell() > 0 and not self._endsWithNewline():
+                self.fp.write('\n')
+        elif self.path is None:
+            self.recordDict = {}
+            self.fp = None
+        else:
+            self.recordDict = {}
+            self.fp = open(self.path, 'wt', encoding='utf-8')
+            self._writeLine({'settings': self.settings})
+
+    def load(self):
+        """
+        Read the records of a previous run, keyed by relative path. A later
+        record of the same file replaces an earlier one. Returns None when
+        there is no journal written with the same settings.
+        """
+        recordDict = {}
+
+        if not os.path.isfile(self.path):
+            return None
+
+        with open(self.path, 'rt', encoding='utf-8') as fp:
+            firstLine = fp.readline()
+            try:
+                settings = json.loads(firstLine).get('settings')
+            except (ValueError, AttributeError):
+                settings = None
+
+            if settings != self.settings:
+                print("Journal " + self.path + " was written with other settings, not resuming")
+                return None
+
+            for lineNr, line in enumerate(fp, 2):
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    ## the last line can be incomplete after a crash
+                    logging.debug("Skipping incomplete journal line %d of %s", lineNr, self.path)
+                    continue
+
+                recordDict[item['relativePath']] = item
+
+        return recordDict
+
+    def lookup(self, entry):
+        """
+        Return the journalled record of a manifest entry, or None when the
+        file was not scored yet or has changed since
+        """
+        record = self.recordDict.get(entry.relativePath)
+        if record is not None and record['size'] == entry.size and record['mtime'] == entry.mtime:
+            return record
+        return None
+
+    def append(self, record):
+        """
+        Append a record and make sure it reaches the disk
+        """
+        self._writeLine(record)
+
+    def _endsWithNewline(self):
+        with open(self.path, 'rb') as fp:
+            fp.seek(-1, os.SEEK_END)
+            return fp.read(1) == b'\n'
+
+    def _writeLine(self, item):
+        if self.fp is None:
+            return
+        self.fp.write(json.dumps(item, ensure_ascii=False) + '\n')
+        self.fp.flush()
+        if self.sync:
+            os.fsync(self.fp.fileno())
+
+    def close(self, remove=False):
+        """
+        Close the journal, removing it when the run completed
+        """
+        if self.fp is None:
+            return
+        self.fp.close()
+        self.fp = None
+        if remove:
+            os.remove(self.path)
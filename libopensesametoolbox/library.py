@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import os
+import re
+import errno
+import shutil
+import tarfile
+import zipfile
+import logging
+import collections
+
+from PyQt5 import QtCore
+
+from libopensesametoolbox.archive import listArchive, iterArchiveMembers
+
+## kind is rename, remove, copy or import; for a copy target is the language
+## copied to, for an import source is the file or (archive, member) to import
+LibraryOperation = collections.namedtuple('LibraryOperation', ['kind', 'language', 'name', 'target', 'source'])
+
+
+def experimentExtension(name, extensionList):
+    """
+    The experiment extension the file name ends with, '' when it has none
+    """
+    for extension in sorted(extensionList, key=len, reverse=True):
+        if name.lower().endswith(extension.lower()):
+            return name[len(name) - len(extension):]
+    return ''
+
+def patternRename(nameList, pattern, replacement, extensionList):
+    """
+    The new names of the experiments in nameList when the regular expression
+    pattern is replaced by replacement in their names without extension
+
+    Raises:
+        ValueError when the pattern or replacement is invalid
+    """
+    try:
+        regex = re.compile(pattern)
+    except re.error as e:
+        raise ValueError("Invalid pattern " + pattern + ": " + str(e))
+
+    targetDict = collections.OrderedDict()
+    for name in nameList:
+        extension = experimentExtension(name, extensionList)
+        try:
+            targetDict[name] = regex.sub(replacement, name[:len(name) - len(extension)]) + extension
+        except (re.error, IndexError) as e:
+            raise ValueError("Invalid replacement " + replacement + ": " + str(e))
+    return targetDict
+
+def renamePlan(language, targetDict, existingNameList):
+    """
+    The operations to rename the experiments in targetDict (name -> new
+    name). Experiments whose name does not change are left out. The plan is
+    checked against existingNameList, the experiments of the language, so
+    nothing is renamed when one of the new names is taken.
+
+    Raises:
+        ValueError when a new name is invalid or taken
+    """
+    takenSet = set(existingNameList) | set(targetDict)
+    targetSet = set()
+    operationList = []
+
+    for name in targetDict:
+        target = targetDict[name]
+        if target == name:
+            continue
+        if not target.strip() or target.startswith('.') or os.sep in target or '/' in target:
+            raise ValueError("Invalid new name for " + name + ": " + target)
+        if target in takenSet or target in targetSet:
+            raise ValueError("Cannot rename " + name + ", a questionnaire with the name " + target +
+                             " already exists")
+        targetSet.add(target)
+        operationList.append(LibraryOperation('rename', language, name, target, None))
+
+    return operationList
+
+def removePlan(language, nameList):
+    """
+    The operations to remove the experiments in nameList
+    """
+    return [LibraryOperation('remove', language, name, None, None) for name in nameList]
+
+def copyPlan(language, nameList, targetLanguage, targetNameList):
+    """
+    The operations to copy the experiments in nameList to another language.
+    Experiments that the target language already has are skipped.
+
+    Returns:
+        a list with the operations and a list with the skipped names
+    """
+    targetNameSet = set(targetNameList)
+    operationList = []
+    skippedList = []
+    for name in nameList:
+        if name in targetNameSet:
+            skippedList.append(name)
+        else:
+            operationList.append(LibraryOperation('copy', language, name, targetLanguage, None))
+    return [operationList, skippedList]
+
+def importPlan(sourcePath, language, existingNameList, extensionList):
+    """
+    The operations to import the experiments in a folder (and its
+    subfolders) or a zip or tar archive into a language. Experiments that
+    the language already has, or that are found twice, are skipped.
+
+    Returns:
+        a list with the operations and a list with the skipped names
+    """
+    sourceList = []
+    if os.path.isdir(sourcePath):
+        for [folder, subFolderList, fileList] in os.walk(sourcePath):
+            subFolderList[:] = sorted(subFolder for subFolder in subFolderList if not subFolder.startswith('.'))
+            for fileName in sorted(fileList):
+                if experimentExtension(fileName, extensionList) and not fileName.startswith('.'):
+                    sourceList.append([fileName, os.path.join(folder, fileName)])
+    else:
+        for member in listArchive(sourcePath):
+            if experimentExtension(member.parts[-1], extensionList):
+                sourceList.append([member.parts[-1], (sourcePath, member.name)])
+
+    takenSet = set(existingNameList)
+    operationList = []
+    skippedList = []
+    for [name, source] in sourceList:
+        if name in takenSet:
+            skippedList.append(name)
+        else:
+            takenSet.add(name)
+            operationList.append(LibraryOperation('import', language, name, None, source))
+    return [operationList, skippedList]
+
+
+class LibraryWorker(QtCore.QObject):
+    """
+    Runs the rename, remove, copy and import operations of the experiment
+    library on a worker thread (see moveToThread), so a large library on a
+    network share does not block the GUI. plan is called on the worker
+    thread and returns the operations and the skipped names, e.g. a
+    functools.partial of importPlan. An operation that fails is reported
+    and the others are still done; cancel stops before the next operation.
+
+    finished is emitted with the operations that were done, the skipped
+    names and the error messages, so the caller can update its index once.
+    """
+    progress = QtCore.pyqtSignal(int, int)
+    finished = QtCore.pyqtSignal(list, list, list)
+
+    def __init__(self, sourceFolder, plan, parent=None):
+
+        super(LibraryWorker, self).__init__(parent)
+
+        self.sourceFolder = sourceFolder
+        self.plan = plan
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Stop before the next operation
+        """
+        self.cancelled = True
+
+    def run(self):
+        """
+        Plan and run the operations
+        """
+        doneList = []
+        skippedList = []
+        errorList = []
+
+        try:
+            [operationList, skippedList] = self.plan()
+        except (OSError, ValueError, EOFError, tarfile.TarError, zipfile.BadZipFile) as e:
+            errorList.append(str(e))
+            self.finished.emit(doneList, skippedList, errorList)
+            return
+
+        ## the members of an archive are read in a single pass
+        archiveMemberDict = collections.OrderedDict()
+        for operation in operationList:
+            if operation.kind == 'import' and isinstance(operation.source, tuple):
+                archiveMemberDict.setdefault(operation.source[0], []).append(operation)
+
+        totalCount = len(operationList)
+        doneCount = 0
+        self.progress.emit(doneCount, totalCount)
+
+        for operation in operationList:
+            if self.cancelled:
+                break
+            if operation.kind == 'import' and isinstance(operation.source, tuple):
+                continue
+            try:
+                self.apply(operation)
+            except (OSError, shutil.Error) as e:
+                logging.exception("Cannot %s %s", operation.kind, operation.name)
+                errorList.append("Cannot " + operation.kind + " " + operation.name + ": " + str(e))
+            else:
+                doneList.append(operation)
+            doneCount += 1
+            self.progress.emit(doneCount, totalCount)
+
+        for archivePath in archiveMemberDict:
+            if self.cancelled:
+                break
+            memberOperationDict = dict((operation.source[1], operation)
+                                       for operation in archiveMemberDict[archivePath])
+            try:
+                for [memberName, data] in iterArchiveMembers(archivePath, list(memberOperationDict)):
+                    operation = memberOperationDict[memberName]
+                    try:
+                        self.write(operation.language, operation.name, data)
+                    except OSError as e:
+                        errorList.append("Cannot import " + operation.name + ": " + str(e))
+                    else:
+                        doneList.append(operation)
+                    doneCount += 1
+                    self.progress.emit(doneCount, totalCount)
+                    if self.cancelled:
+                        break
+            except (OSError, EOFError, KeyError, tarfile.TarError, zipfile.BadZipFile) as e:
+                logging.exception("Cannot read archive %s", archivePath)
+                errorList.append("Cannot read archive " + archivePath + ": " + str(e))
+
+        self.finished.emit(doneList, skippedList, errorList)
+
+    def apply(self, operation):
+        """
+        Run a single operation on disk, an existing experiment is never
+        overwritten
+        """
+        filePath = os.path.join(self.sourceFolder, operation.language, operation.name)
+
+        if operation.kind == 'rename':
+            destFilePath = os.path.join(self.sourceFolder, operation.language, operation.target)
+            if os.path.exists(destFilePath):
+                raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), destFilePath)
+            os.rename(filePath, destFilePath)
+        elif operation.kind == 'remove':
+            if os.path.isfile(filePath):
+                os.remove(filePath)
+        elif operation.kind == 'copy':
+            with open(filePath, 'rb') as source:
+                self.write(operation.target, operation.name, source)
+        elif operation.kind == 'import':
+            with open(operation.source, 'rb') as source:
+                self.write(operation.language, operation.name, source)
+
+    def write(self, language, name, source):
+        """
+        Write an experiment (bytes or a file object) into a language folder,
+        the folder is created when the language is new
+        """
+        languageFolder = os.path.join(self.sourceFolder, language)
+        os.makedirs(languageFolder, exist_ok=True)
+        destFilePath = os.path.join(languageFolder, name)
+
+        try:
+            with open(destFilePath, 'xb') as dest:
+                if isinstance(source, bytes):
+                    dest.write(source)
+                else:
+                    shutil.copyfileobj(source, dest, 1024 * 1024)
+        except FileExistsError:
+            raise
+        except OSError:
+            ## leave no half written experiment behind
+            try:
+                os.remove(destFilePath)
+            except OSError:
+                pass
+            raise
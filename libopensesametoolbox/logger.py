@@ -17,9 +17,21 @@ Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public Lic
 @author Bob Rosbag
 """
 
+import atexit
+import json
+import queue
 import logging
 import logging.handlers
 
+from configobj import ConfigObj
+
+from libopensesametoolbox.io_tools import getResourceLoc
+from libopensesametoolbox.clean_data import stringToBool
+
+config = ConfigObj(getResourceLoc('opensesame-toolbox.conf'))
+
+_listener = None
+
 class OneLineExceptionFormatter(logging.Formatter):
     def formatException(self, exc_info):
         """
@@ -34,20 +46,94 @@ class OneLineExceptionFormatter(logging.Formatter):
             s = s.replace('\n', '') + '|'
         return s
 
-def configureLogging(filePath, level):
+class JsonLineFormatter(logging.Formatter):
+    """
+    Format a record as a single JSON object per line, so log files from
+    several machines can be parsed by other tools.
+    """
+    def format(self, record):
+        entry = {'time': self.formatTime(record, self.datefmt),
+                 'level': record.levelname,
+                 'logger': record.name,
+                 'message': record.getMessage()}
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
     """
-    Setup logging.
+    Queue handler that leaves exception formatting to the listener thread.
     """
+    def prepare(self, record):
+        """
+        Only merge the message with its arguments, the queue is in-process so
+        the record (and its traceback) does not have to be pickled.
+        """
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+def configureLogging(filePath, level, maxBytes=None, backupCount=None, structured=None):
+    """
+    Setup logging. Records are put on a queue by the calling thread and
+    written to the rotating log file by a background listener thread.
+    """
+    global _listener
+
+    conf_logging = config['logging']
+
+    if maxBytes is None:
+        maxBytes = int(conf_logging['maxBytes'])
+    if backupCount is None:
+        backupCount = int(conf_logging['backupCount'])
+    if structured is None:
+        structured = stringToBool(conf_logging['structured'])
 
-    fh = logging.handlers.RotatingFileHandler(filePath, 
-                                              mode='a', 
-                                              maxBytes=(1048576*7), 
-                                              backupCount=7, 
+    fh = logging.handlers.RotatingFileHandler(filePath,
+                                              mode='a',
+                                              maxBytes=maxBytes,
+                                              backupCount=backupCount,
                                               encoding='utf-8')
-                                                  
-    f = OneLineExceptionFormatter('%(asctime)s|%(levelname)s|%(message)s|',
-                                  '%d/%m/%Y %H:%M:%S')
+
+    if structured:
+        f = JsonLineFormatter(datefmt='%d/%m/%Y %H:%M:%S')
+    else:
+        f = OneLineExceptionFormatter('%(asctime)s|%(levelname)s|%(message)s|',
+                                      '%d/%m/%Y %H:%M:%S')
     fh.setFormatter(f)
+
+    if _listener is not None:
+        stopLogging()
+
+    logQueue = queue.Queue(-1)
+    qh = DeferredQueueHandler(logQueue)
+
     root = logging.getLogger()
     root.setLevel(level)
-    root.addHandler(fh)
\ No newline at end of file
+    root.addHandler(qh)
+
+    _listener = logging.handlers.QueueListener(logQueue, fh)
+    _listener.start()
+
+    return _listener
+
+def stopLogging():
+    """
+    Flush the pending records to the log file and stop the listener thread.
+    """
+    global _listener
+
+    if _listener is None:
+        return
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, DeferredQueueHandler):
+            root.removeHandler(handler)
+
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+atexit.register(stopLogging)
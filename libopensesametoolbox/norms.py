@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import csv
+from collections import OrderedDict
+
+import numpy as np
+
+## the normed scores a norm table can have, in the order of the output
+normStatisticList = ['Percentile', 'T']
+
+
+def loadNormTable(pathToCsv):
+    """
+    Load a norm table. The csv file has a Category, Raw and a Percentile
+    and/or T column, and optionally AgeMin, AgeMax and Sex columns when the
+    norms depend on the age and sex of the subject. A row applies to the raw
+    scores from its Raw value up to the Raw value of the next row of the same
+    category (and age/sex group).
+
+    Raises:
+        ValueError when the table cannot be read
+    """
+    try:
+        with open(pathToCsv, 'rt', newline='', encoding='utf-8-sig') as fp:
+            sample = fp.read(65536)
+            fp.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+            rowList = list(csv.reader(fp, dialect=dialect))
+    except (OSError, UnicodeDecodeError) as e:
+        raise ValueError("Cannot read norm table " + pathToCsv + ": " + str(e))
+
+    if not rowList:
+        raise ValueError("Norm table " + pathToCsv + " is empty")
+
+    columnDict = dict((name.strip().lower(), index) for index, name in enumerate(rowList[0]))
+    for column in ['category', 'raw']:
+        if column not in columnDict:
+            raise ValueError("Norm table " + pathToCsv + " has no " + column.capitalize() + " column")
+
+    statisticList = [statistic for statistic in normStatisticList if statistic.lower() in columnDict]
+    if not statisticList:
+        raise ValueError("Norm table " + pathToCsv + " has no Percentile or T column")
+
+    def field(row, column):
+        index = columnDict.get(column)
+        if index is None or index >= len(row):
+            return ''
+        return row[index].strip()
+
+    def number(row, column, lineNr):
+        text = field(row, column)
+        if not text:
+            return np.nan
+        try:
+            return float(text)
+        except ValueError:
+            raise ValueError("Norm table " + pathToCsv + ", line " + str(lineNr) + ": " + text + " is not a number")
+
+    normRowList = []
+    for lineNr, row in enumerate(rowList[1:], 2):
+        if not ''.join(row).strip():
+            continue
+        raw = number(row, 'raw', lineNr)
+        if np.isnan(raw):
+            raise ValueError("Norm table " + pathToCsv + ", line " + str(lineNr) + " has no Raw score")
+        stratum = (number(row, 'agemin', lineNr), number(row, 'agemax', lineNr), field(row, 'sex').lower())
+        normRowList.append([field(row, 'category'), stratum, raw,
+                            [number(row, statistic.lower(), lineNr) for statistic in statisticList]])
+
+    return NormTable(normRowList, statisticList)
+
+
+class NormTable(object):
+    """
+    A norm table compiled into sorted arrays. The rows of every category and
+    age/sex group (a segment) are sorted by raw score and put one after the
+    other in a single key array, with every segment shifted past the raw
+    scores of the previous one, so the raw scores of all categories of a
+    subject are converted with one np.searchsorted call.
+    """
+    def __init__(self, normRowList, statisticList):
+
+        self.statistics = list(statisticList)
+
+        ## category -> [(ageMin, ageMax, sex, segmentNr)], in the order of the table
+        self.stratumDict = OrderedDict()
+        segmentRowDict = OrderedDict()
+        for [category, stratum, raw, valueList] in normRowList:
+            segmentRowDict.setdefault((category, stratum), []).append([raw] + valueList)
+
+        rawArray = np.array([row[2] for row in normRowList], dtype='d')
+        self.minRaw = rawArray.min() if len(rawArray) else 0.0
+        self.span = rawArray.max() - self.minRaw if len(rawArray) else 0.0
+        self.step = self.span + 1
+
+        keyList = []
+        valueList = []
+        startList = []
+        for segmentNr, [category, stratum] in enumerate(segmentRowDict):
+            self.stratumDict.setdefault(category, []).append(stratum + (segmentNr,))
+            segmentRowList = sorted(segmentRowDict[(category, stratum)], key=lambda row: row[0])
+            startList.append(len(keyList))
+            for row in segmentRowList:
+                keyList.append(segmentNr * self.step + (row[0] - self.minRaw))
+                valueList.append(row[1:])
+
+        self.keyArray = np.array(keyList, dtype='d')
+        self.valueArray = np.array(valueList, dtype='d').reshape(len(keyList), len(self.statistics))
+        self.startArray = np.array(startList, dtype=np.intp)
+
+        ## (age, sex, categories) -> segment per category
+        self.segmentCache = {}
+
+    def segments(self, categoryList, age, sex):
+        """
+        The segment of every category for a subject, -1 when the table has
+        no norms for the category, age and sex
+        """
+        ## NaN is not equal to itself, an unknown age is cached as None
+        cacheKey = (None if np.isnan(age) else age, sex, tuple(categoryList))
+        segmentArray = self.segmentCache.get(cacheKey)
+        if segmentArray is None:
+            segmentList = []
+            for category in categoryList:
+                segmentNr = -1
+                for [ageMin, ageMax, stratumSex, stratumSegmentNr] in self.stratumDict.get(category, []):
+                    if not np.isnan(ageMin) and not age >= ageMin:
+                        continue
+                    if not np.isnan(ageMax) and not age <= ageMax:
+                        continue
+                    if stratumSex and stratumSex != sex:
+                        continue
+                    segmentNr = stratumSegmentNr
+                    break
+                segmentList.append(segmentNr)
+            segmentArray = np.array(segmentList, dtype=np.intp)
+            self.segmentCache[cacheKey] = segmentArray
+        return segmentArray
+
+    def convert(self, categoryList, rawArray, age=np.nan, sex=''):
+        """
+        Convert the raw score of every category in categoryList for a
+        subject of the given age (NaN when unknown) and sex.
+
+        Returns:
+            a dict with an array of values per category for every statistic,
+            NaN where the table has no norms for the raw score
+        """
+        rawArray = np.asarray(rawArray, dtype='d')
+        segmentArray = self.segments(categoryList, age, sex)
+
+        hasSegment = segmentArray >= 0
+        safeSegmentArray = np.where(hasSegment, segmentArray, 0)
+
+        ## a raw score outside the range of the table stays between its own segment and the next
+        shiftedArray = np.clip(rawArray - self.minRaw, -0.5, self.span + 0.5)
+        keyArray = safeSegmentArray * self.step + np.nan_to_num(shiftedArray)
+        rowArray = np.searchsorted(self.keyArray, keyArray, side='right') - 1
+
+        found = hasSegment & ~np.isnan(rawArray)
+        if len(self.startArray):
+            found &= rowArray >= self.startArray[safeSegmentArray]
+        rowArray = np.where(found, rowArray, 0)
+
+        resultDict = {}
+        for statisticNr, statistic in enumerate(self.statistics):
+            if len(self.keyArray):
+                resultDict[statistic] = np.where(found, self.valueArray[rowArray, statisticNr], np.nan)
+            else:
+                resultDict[statistic] = np.full(len(rawArray), np.nan)
+        return resultDict
+
+def parseAge(valueList):
+    """
+    The age of a subject from a log column, the first value that is a
+    number; NaN when there is none
+    """
+    for value in valueList:
+        try:
+            return float(value)
+        except ValueError:
+            continue
+    return np.nan
+
+def parseSex(valueList):
+    """
+    The sex of a subject from a log column, the first value that is not empty
+    """
+    for value in valueList:
+        if value.strip():
+            return value.strip().lower()
+    return ''
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import os
+import sys
+import logging
+import concurrent.futures
+
+from configobj import ConfigObj
+
+from libopensesametoolbox.io_tools import getResourceLoc
+from libopensesametoolbox.clean_data import stringToBool
+from libopensesametoolbox.compression import compressFile, selectCodec
+from libopensesametoolbox.integrity import recordFile
+from libopensesametoolbox.publish import DestinationLock
+from libopensesametoolbox.results import ScoreResults
+from libopensesametoolbox.writers import appendResultsTsv, writeResultsTsv, reportExt
+from libopensesametoolbox.norms import loadNormTable
+from libopensesametoolbox.questionnaireprocessor import scoreLogFile, DataFileError
+
+config = ConfigObj(getResourceLoc('opensesame-toolbox.conf'))
+
+
+def createPostRunPipeline():
+    """
+    Create the pipeline with the post-run steps enabled in the config file,
+    None when there are none
+    """
+    conf_experimentmanager = config['experimentmanager']
+
+    stepList = []
+
+    ## scoring reads the log before it is compressed
+    if stringToBool(conf_experimentmanager['scoreLogs']):
+        try:
+            stepList.append(('score', scoreLogStep()))
+        except ValueError as e:
+            print("Error: " + str(e) + ", logs are not scored", file=sys.stderr)
+
+    if stringToBool(conf_experimentmanager['compressLogs']):
+        try:
+            codec = selectCodec(conf_experimentmanager['compression'])
+        except ValueError as e:
+            print("Error: " + str(e) + ", logs are not compressed", file=sys.stderr)
+        else:
+            stepList.append(('compress', compressLogStep(codec)))
+
+    if not stepList:
+        return None
+
+    return PostRunPipeline(stepList)
+
+def scoreLogStep():
+    """
+    Post-run step that scores a log file with the default input keys and
+    appends its scores to the score results (scoreResultName) in the folder
+    of the log, so the scores of a session are there when it ends. Scores
+    with other items than the earlier logs (e.g. of a subject who stopped
+    early) are saved to a file of their own, scoreResultName_<log>. The
+    statistics, norm table and result delimiter of the questionnaire
+    processor are used.
+
+    Raises:
+        ValueError when the norm table cannot be loaded
+    """
+    conf_default_input = config['default_input']
+    conf_questionnaireprocessor = config['questionnaireprocessor']
+    resultName = config['experimentmanager']['scoreResultName']
+    resultDelimiter = conf_questionnaireprocessor['resultDelimiter']
+
+    ## the results must not be taken for a log by the questionnaire processor
+    resultExt = reportExt(conf_questionnaireprocessor['resultExt'])
+    if resultExt in conf_questionnaireprocessor['dataExtList']:
+        resultExt = 'txt'
+
+    normTable = None
+    if conf_questionnaireprocessor['normTable']:
+        normTable = loadNormTable(conf_questionnaireprocessor['normTable'])
+
+    statisticList = list(conf_questionnaireprocessor['scoreTypeList'])
+    if normTable is not None:
+        statisticList += normTable.statistics
+
+    def scoreLog(logFilePath):
+        ## a log that cannot be scored is still handed to the next steps
+        try:
+            record = scoreLogFile(logFilePath, conf_default_input['responseKey'], conf_default_input['idKey'],
+                                  conf_default_input['categoryKey'], conf_default_input['answerKey'],
+                                  conf_default_input['scoreKey'], normTable=normTable)
+        except DataFileError as e:
+            logging.error("Cannot score %s: %s", logFilePath, ' '.join(e.message.split()))
+            return logFilePath
+        except Exception:
+            logging.exception("Cannot score %s", logFilePath)
+            return logFilePath
+
+        folder = os.path.dirname(logFilePath)
+        resultPath = os.path.join(folder, resultName + '.' + resultExt)
+        results = ScoreResults.fromRecords(record['group'], [record], statisticList)
+        try:
+            ## another station can add to the same results
+            with DestinationLock(folder, report=logging.info):
+                try:
+                    appendResultsTsv(resultPath, results, resultDelimiter)
+                except ValueError:
+                    ## other items than the earlier subjects (e.g. stopped early): a file of its own
+                    subjectName = resultName + '_' + os.path.splitext(record['file'])[0]
+                    subjectPath = os.path.join(folder, subjectName + '.' + resultExt)
+                    writeResultsTsv(subjectPath, results, resultDelimiter)
+                    logging.error("The scores of %s have other items than %s, saved to %s instead",
+                                  logFilePath, resultPath, subjectPath)
+                    return logFilePath
+        except Exception:
+            logging.exception("Cannot save the scores of %s", logFilePath)
+            return logFilePath
+
+        logging.info("Scored log %s, saved to %s", logFilePath, resultPath)
+        return logFilePath
+
+    return scoreLog
+
+def compressLogStep(codec):
+    """
+    Post-run step that compresses a log file and verifies its checksum. When
+    integrityManifest is enabled the compressed file is recorded in the
+    integrity manifest as well, with the log it replaces.
+    """
+    integrityManifest = stringToBool(config['experimentmanager']['integrityManifest'])
+
+    def compressLog(logFilePath):
+        compressedPath = compressFile(logFilePath, codec)
+        logging.info("Compressed log %s", compressedPath)
+        if integrityManifest:
+            recordFile(compressedPath, source=os.path.basename(logFilePath))
+        return compressedPath
+
+    return compressLog
+
+
+class PostRunPipeline(object):
+    """
+    Runs a list of (name, step) pairs on the log file of every finished
+    experiment on a background worker thread, so the next experiment can be
+    started right away. A step gets the path of the log file and returns
+    its (new) path; the log files are handled one at a time, in order.
+
+    The steps report through logging and must not print: in the GUI stdout
+    and stderr write to a widget, which may only be used by the GUI thread.
+    """
+    def __init__(self, stepList):
+
+        self.stepList = stepList
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.futureList = []
+
+    def submit(self, logFilePath, waitFor=None):
+        """
+        Queue the steps for a finished log file, when waitFor (a future) is
+        given they start when it is done, e.g. when the log is hashed
+        """
+        self.futureList = [future for future in self.futureList if not future.done()]
+        self.futureList.append(self.executor.submit(self._run, logFilePath, waitFor))
+
+    def _run(self, logFilePath, waitFor=None):
+        if waitFor is not None:
+            concurrent.futures.wait([waitFor])
+        for [name, step] in self.stepList:
+            try:
+                logFilePath = step(logFilePath)
+            except Exception:
+                logging.exception("Post-run step %s failed for %s", name, logFilePath)
+                return
+
+    def pending(self):
+        """
+        Number of log files that are not done yet
+        """
+        return len([future for future in self.futureList if not future.done()])
+
+    def close(self):
+        """
+        Wait for the queued log files and stop the worker thread
+        """
+        if self.pending():
+            print("Waiting for " + str(self.pending()) + " log file(s) to be processed...")
+        self.executor.shutdown(wait=True)
+        self.futureList = []
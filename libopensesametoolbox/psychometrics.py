@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import csv
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+
+from libopensesametoolbox.publish import atomicOpen
+
+reportHeader = ['Category', 'Item', 'N', 'Skipped', 'Mean', 'Variance', 'Item_Total_Correlation',
+                'Alpha_If_Item_Deleted', 'Alpha']
+
+
+class ItemAccumulator(object):
+    """
+    Running mean vector and co-moment matrix (Welford) of the item scores of
+    one category, so the covariance matrix is known after a single pass
+    without keeping the scores of every subject.
+    """
+    def __init__(self, itemList):
+
+        self.itemList = list(itemList)
+        self.n = 0
+        self.skipped = 0
+        self.mean = np.zeros(len(self.itemList))
+        self.comoment = np.zeros((len(self.itemList), len(self.itemList)))
+
+    def add(self, scoreArray):
+        """
+        Add the item scores of one subject
+        """
+        self.n += 1
+        delta = scoreArray - self.mean
+        self.mean += delta / self.n
+        self.comoment += np.outer(delta, scoreArray - self.mean)
+
+    def covariance(self):
+        """
+        The sample covariance matrix of the items, None with less than two
+        subjects
+        """
+        if self.n < 2:
+            return None
+        return self.comoment / (self.n - 1)
+
+
+class ItemStatistics(object):
+    """
+    Study-level item statistics of a group: per category the item means and
+    variances, corrected item-total correlations and Cronbach's alpha (also
+    with every item left out). Only subjects with a score for every item of
+    the category count; others are counted as skipped for that category.
+    """
+    def __init__(self):
+
+        self.accumulatorDict = OrderedDict()
+
+    def addRecord(self, record):
+        """
+        Add the scores of a scored file (its record)
+        """
+        itemDict = record.get('items')
+        if itemDict is None:
+            return
+
+        categoryItemDict = OrderedDict()
+        for identity in sorted(itemDict):
+            for category in itemDict[identity][1]:
+                categoryItemDict.setdefault(category, []).append(identity)
+
+        scoreDict = record['scores']
+
+        for category in categoryItemDict:
+            itemList = categoryItemDict[category]
+
+            accumulator = self.accumulatorDict.get(category)
+            if accumulator is None:
+                accumulator = ItemAccumulator(itemList)
+                self.accumulatorDict[category] = accumulator
+
+            if itemList != accumulator.itemList:
+                accumulator.skipped += 1
+                continue
+
+            try:
+                scoreArray = np.array([float(scoreDict[identity]) for identity in itemList])
+            except ValueError:
+                ## a missing item (empty score)
+                accumulator.skipped += 1
+                continue
+
+            accumulator.add(scoreArray)
+
+    def rows(self):
+        """
+        The report as rows: for every category a row with the total score and
+        alpha followed by a row per item
+        """
+        rowList = []
+
+        with warnings.catch_warnings(), np.errstate(divide='ignore', invalid='ignore'):
+            warnings.simplefilter('ignore', RuntimeWarning)
+
+            for category in sorted(self.accumulatorDict):
+                accumulator = self.accumulatorDict[category]
+                covariance = accumulator.covariance()
+                nrItems = len(accumulator.itemList)
+
+                if covariance is None:
+                    rowList.append([category, '', accumulator.n, accumulator.skipped, '', '', '', '', ''])
+                    continue
+
+                itemVariance = np.diag(covariance)
+                rowSum = covariance.sum(axis=1)
+                totalVariance = covariance.sum()
+
+                alpha = cronbachAlpha(nrItems, itemVariance.sum(), totalVariance)
+
+                ## the item against the total of the other items
+                restVariance = totalVariance - 2 * rowSum + itemVariance
+                itemRestCovariance = rowSum - itemVariance
+                itemTotalCorrelation = itemRestCovariance / np.sqrt(itemVariance * restVariance)
+                alphaIfDeleted = cronbachAlpha(nrItems - 1, itemVariance.sum() - itemVariance, restVariance)
+
+                rowList.append([category, '', accumulator.n, accumulator.skipped, accumulator.mean.sum(),
+                                totalVariance, '', '', alpha])
+
+                for index in range(nrItems):
+                    rowList.append([category, accumulator.itemList[index], accumulator.n, accumulator.skipped,
+                                    accumulator.mean[index], itemVariance[index], itemTotalCorrelation[index],
+                                    alphaIfDeleted[index], ''])
+
+        return rowList
+
+    def write(self, pathToTsv, delimiter):
+        """
+        Write the report to tsv
+        """
+        with atomicOpen(pathToTsv, 'wt', newline='', encoding='utf-8') as fp:
+            writer = csv.writer(fp, delimiter=delimiter)
+            writer.writerow(reportHeader)
+            for row in self.rows():
+                writer.writerow([_formatValue(value) for value in row])
+
+def cronbachAlpha(nrItems, itemVarianceSum, totalVariance):
+    """
+    Cronbach's alpha from the sum of the item variances and the variance of
+    the total score, NaN with less than two items
+    """
+    if nrItems < 2:
+        return np.full(np.shape(totalVariance), np.nan)[()]
+    return nrItems / (nrItems - 1) * (1 - itemVarianceSum / totalVariance)
+
+def _formatValue(value):
+    if isinstance(value, (float, np.floating)):
+        if np.isnan(value):
+            return ''
+        return str(np.float64(value))
+    return value
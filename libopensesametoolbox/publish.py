@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import os
+import sys
+import json
+import time
+import contextlib
+
+from configobj import ConfigObj
+
+from libopensesametoolbox.io_tools import getResourceLoc
+from libopensesametoolbox.integrity import sha256File
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+config = ConfigObj(getResourceLoc('opensesame-toolbox.conf'))
+
+
+def temporaryPathOf(path):
+    """
+    The temporary path a file is written to before it is published: a
+    hidden file in the same folder (so it is renamed on the same file
+    system) with the same extension, unique per process
+    """
+    [folder, fileName] = os.path.split(path)
+    [stem, extension] = os.path.splitext(fileName)
+    return os.path.join(folder, '.' + stem + '.tmp-' + str(os.getpid()) + extension)
+
+@contextlib.contextmanager
+def atomicPath(path):
+    """
+    Write a file under a temporary path and publish it with a rename when
+    the block is done, so readers see the old or the new file but never a
+    partly written one. The temporary file is removed when the block fails.
+
+    Yields:
+        the temporary path to write to
+    """
+    temporaryPath = temporaryPathOf(path)
+    try:
+        yield temporaryPath
+        os.replace(temporaryPath, path)
+    except BaseException:
+        if os.path.exists(temporaryPath):
+            os.remove(temporaryPath)
+        raise
+
+@contextlib.contextmanager
+def atomicOpen(path, mode='wt', **kwargs):
+    """
+    Open a file for writing that is published when it is closed, see
+    atomicPath. The data is flushed to disk before the rename.
+    """
+    with atomicPath(path) as temporaryPath:
+        with open(temporaryPath, mode, **kwargs) as fp:
+            yield fp
+            fp.flush()
+            os.fsync(fp.fileno())
+
+
+class DestinationLock(object):
+    """
+    Advisory lock on a destination folder (fcntl on Linux and macOS, msvcrt
+    on Windows), taken by every run that writes to it so two runs on the
+    same folder wait for each other instead of overwriting each other's
+    files. A shared lock only waits for runs that hold the lock exclusively.
+    report is called with a message when the lock is busy, e.g. logging.info
+    on a worker thread.
+    """
+    def __init__(self, folder, shared=False, suffix='', report=print):
+
+        self.path = os.path.join(folder, config['default_io']['lockName'] + suffix)
+        self.shared = shared
+        self.report = report
+        self.fp = None
+
+    def acquire(self):
+        """
+        Take the lock, waiting for the run that holds it. The lock file is
+        opened read-only, so users that cannot write it (e.g. a lock file
+        created by another user) can lock it as well.
+
+        Raises:
+            OSError when the lock file cannot be created or opened
+        """
+        try:
+            fd = os.open(self.path, os.O_RDONLY | os.O_CREAT, 0o666)
+        except OSError:
+            try:
+                fd = os.open(self.path, os.O_RDONLY)
+            except FileNotFoundError:
+                ## no run has locked the read-only folder yet, a reader has nothing to wait for
+                if self.shared:
+                    return
+                raise
+        self.fp = os.fdopen(fd, 'rb')
+        if not self._lock(blocking=False):
+            self.report("Waiting for another run on " + os.path.dirname(self.path) + "...")
+            self._lock(blocking=True)
+
+    def release(self):
+        """
+        Release the lock
+        """
+        if self.fp is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.fp.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                self.fp.seek(0)
+                msvcrt.locking(self.fp.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.fp.close()
+            self.fp = None
+
+    def _lock(self, blocking):
+        if fcntl is not None:
+            operation = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+            if not blocking:
+                operation |= fcntl.LOCK_NB
+            try:
+                fcntl.flock(self.fp.fileno(), operation)
+            except BlockingIOError:
+                return False
+            return True
+
+        if msvcrt is not None:
+            ## msvcrt has no shared locks, and LK_LOCK gives up after 10 tries
+            self.fp.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self.fp.fileno(), msvcrt.LK_NBLCK, 1)
+                    return True
+                except OSError:
+                    if not blocking:
+                        return False
+                    time.sleep(1)
+
+        return True
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.release()
+
+
+def readGeneration(folder):
+    """
+    The generation manifest of a destination folder, None when there is
+    none. It lists the result files of the last run that finished, with
+    their size and SHA-256, so a reader can check it has a consistent set.
+    The lock is taken shared, so a run that is still writing is waited for.
+    """
+    with DestinationLock(folder, shared=True):
+        return _loadGeneration(folder)
+
+def writeGeneration(folder, fileList, keepGroupList=()):
+    """
+    Write the next generation manifest of a destination folder. It lists
+    the files published by the run, (path, group) pairs with the group (None
+    for files of the whole run, e.g. the error report), and nothing else: a
+    file of an earlier run that was not published again is left out. Only
+    the files of the groups in keepGroupList, which a run on some of the
+    groups leaves in place (e.g. watch mode), are taken over from the
+    previous generation when they still exist; their size and SHA-256 are
+    computed again. Must be called with the lock.
+
+    Returns:
+        the generation number
+    """
+    previous = _loadGeneration(folder) or {'generation': 0, 'files': []}
+    generationNr = previous.get('generation', 0) + 1
+
+    fileDict = {}
+    keepGroupSet = set(keepGroupList)
+    for item in previous.get('files', []):
+        path = os.path.join(folder, item['name'])
+        if item.get('group') is None or item['group'] not in keepGroupSet or not os.path.isfile(path):
+            continue
+        entry = _fileEntry(folder, path, item['group'], generationNr)
+        if entry['sha256'] == item.get('sha256'):
+            entry['generation'] = item.get('generation', generationNr)
+        fileDict[entry['name']] = entry
+
+    for [path, group] in fileList:
+        entry = _fileEntry(folder, path, group, generationNr)
+        fileDict[entry['name']] = entry
+
+    generation = {'generation': generationNr,
+                  'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                  'files': [fileDict[name] for name in sorted(fileDict)]}
+    with atomicOpen(os.path.join(folder, config['default_io']['generationName']), 'wt', encoding='utf-8') as fp:
+        json.dump(generation, fp, ensure_ascii=False, indent=1)
+
+    return generationNr
+
+def _loadGeneration(folder):
+    try:
+        with open(os.path.join(folder, config['default_io']['generationName']), 'rt', encoding='utf-8') as fp:
+            return json.load(fp)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _fileEntry(folder, path, group, generationNr):
+    return {'name': os.path.relpath(path, folder).replace(os.sep, '/'), 'group': group,
+            'size': os.path.getsize(path), 'sha256': sha256File(path), 'generation': generationNr}
+
+
+class Publication(object):
+    """
+    The files a run publishes to a destination folder. The folder is locked
+    while the run writes, and when it is closed the generation manifest
+    is written, last, before the lock is released.
+
+    Runs with a suffix (the shards of a sharded run) take a lock of their
+    own, so they can write to the same folder at the same time, and do not
+    write a generation manifest: their partial results are not a result set.
+    Without a folder (None) nothing is locked or written. Raises OSError
+    when the folder cannot be locked.
+    """
+    def __init__(self, folder, suffix=''):
+
+        self.folder = folder
+        self.suffix = suffix
+        self.fileList = []
+        self.keepGroupList = []
+        self.lock = None
+        if folder is not None:
+            self.lock = DestinationLock(folder, suffix=suffix)
+            self.lock.acquire()
+
+    def add(self, pathList, group=None):
+        """
+        Add published files, of a group or (None) of the whole run
+        """
+        self.fileList.extend([path, group] for path in pathList)
+
+    def keep(self, groupList):
+        """
+        Keep the files that earlier runs published for these groups, for a
+        run that only writes the results of the other groups
+        """
+        self.keepGroupList.extend(groupList)
+
+    def abort(self):
+        """
+        Release the lock without writing a generation manifest, for a run
+        that stopped before it was done: the previous generation stays
+        """
+        if self.lock is not None:
+            self.lock.release()
+            self.lock = None
+
+    def close(self):
+        """
+        Write the generation manifest and release the lock
+        """
+        if self.lock is None:
+            return
+        try:
+            if not self.suffix:
+                generation = writeGeneration(self.folder, self.fileList, self.keepGroupList)
+                print("Published generation " + str(generation) + " of the results in " + self.folder)
+        except OSError as e:
+            print("Error: Cannot write the generation manifest: " + str(e), file=sys.stderr)
+        finally:
+            self.lock.release()
+            self.lock = None
@@ -17,25 +17,138 @@ Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public Lic
 @author Bob Rosbag
 """
 
-import glob
+import io
+import collections
+import json
+import zlib
+import hashlib
+import tarfile
+import zipfile
+import codecs
+import mmap
 import os
 import sys
 import csv
+import time
 import logging
 
 from configobj import ConfigObj
 import numpy as np
 
-from libopensesametoolbox.clean_data import cleanUpStringList, removeJunk
+from libopensesametoolbox.clean_data import cleanUpStringList, removeJunk, stringToBool
 from libopensesametoolbox.io_tools import getResourceLoc
+from libopensesametoolbox.instrumentation import createInstrumentation
+from libopensesametoolbox.journal import ScoreJournal
+from libopensesametoolbox.results import ScoreResults
+from libopensesametoolbox.aggregation import categoryScoreArray, aggregate, unknownAggregations
+from libopensesametoolbox.psychometrics import ItemStatistics
+from libopensesametoolbox.norms import loadNormTable, parseAge, parseSex
+from libopensesametoolbox.writers import getResultWriter, reportExt, formatScore, LongResultsWriter
+from libopensesametoolbox.integrity import loadManifest, verifyFile
+from libopensesametoolbox.publish import Publication, atomicOpen
+from libopensesametoolbox.archive import archiveExtension, archiveStem, listArchive, ArchivePrefetcher
+from libopensesametoolbox.compression import (compressionOf, stripCompressionExt, decompressData, readDecompressed,
+                                              DecompressingReader, codecExtDict)
 
 config = ConfigObj(getResourceLoc('opensesame-toolbox.conf'))
 
 fs = os.sep
 
+sniffDelimiters = ',;\t|'
+
+bomList = [(codecs.BOM_UTF32_LE, 'utf-32'),
+           (codecs.BOM_UTF32_BE, 'utf-32'),
+           (codecs.BOM_UTF8, 'utf-8-sig'),
+           (codecs.BOM_UTF16_LE, 'utf-16'),
+           (codecs.BOM_UTF16_BE, 'utf-16')]
+
+class DataFileError(Exception):
+    """
+    A data file that cannot be scored. The kind is one of: read,
+    missing_column, unknown_id, unknown_response, invalid_score,
+    invalid_weight, invalid_reverse and integrity; value holds the offending
+    column name, ID or response (for invalid_score the category, the ID of
+    an item with more or fewer scores than answer options or the custom
+    input that does not match the custom IDs), or for integrity whether the
+    file is truncated or modified.
+    """
+    def __init__(self, kind, message, value=None):
+        super(DataFileError, self).__init__(message)
+        self.kind = kind
+        self.message = message
+        self.value = value
+
+
 def QuestionnaireProcessor(dataFolder, destinationFolder, responseKey, idKey, categoryKey,
                            answerKey, scoreKey, customId, customCategory, customAnswers,
-                           customScore, custom, caseInsensitiveComparison, ui=None):
+                           customScore, custom, caseInsensitiveComparison, ui=None, instrumentation=None,
+                           maxDepth=None, continueOnError=None, resume=False, shard=None, results=None,
+                           resultFormat=None, longFormat=None, itemStatistics=None, normTable=None,
+                           customWeight=None, customReverse=None, groupList=None, keepJournal=False,
+                           verifyIntegrity=None, manifest=None):
+    """
+    Score all data files in the data folder and write the results per folder
+    to the destination folder.
+
+    Returns True when all files were processed, None when processing was
+    stopped by an error. With continueOnError, files that cannot be scored
+    are listed in an error report instead of stopping the run and False is
+    returned when there were any.
+
+    Every scored file is written to a journal in the destination folder as
+    soon as it is done. With resume, files in the journal of a previous
+    (interrupted) run that did not change since are not scored again. The
+    journal is removed when all files were processed.
+
+    With shard given as an (index, count) tuple, index counting from 1, only
+    the files of that shard are scored and their records are written to a
+    partial results file; mergePartialResults combines the partial results of
+    all shards into the usual results files.
+
+    Zip and tar archives in the data folder are read as if they were
+    extracted to a folder with the name of the archive. The archives are
+    read ahead on worker threads while the files are scored.
+
+    When results is a list, the ScoreResults of every group are appended to
+    it. Without a destination folder (None) no files are written at all,
+    see scoreQuestionnaires.
+
+    The results are written in the format of resultFormat, by default the
+    resultExt in the config file: tsv (or csv/txt), npz, sqlite or parquet.
+
+    With longFormat the results are written as text with a row per file,
+    item and category instead, while the files are scored. The records of
+    the files are not kept in memory then (unless results is a list), and
+    a sharded run writes its own long results instead of partial results.
+
+    With itemStatistics the item means and variances, item-total
+    correlations and Cronbach's alpha per category are computed while the
+    files are scored and written to an item statistics report per group
+    (for a sharded run by mergePartialResults).
+
+    With normTable, the path of a norm table (by default normTable in the
+    config file), the normStatistic of every category is converted to a
+    percentile and/or T score, which are added to the results as statistics
+    after the scoreTypeList, see the norms module.
+
+    Items can be weighted and reverse keyed, and a category can weigh its
+    items, see scoreDataFile; with custom, customWeight and customReverse
+    give the weight and reverse keying of every custom ID.
+
+    With groupList only the folders (groups) with these names are scored
+    and written; the results of the other groups are kept and the error
+    report keeps their errors. With keepJournal the journal is kept after a
+    complete run, so a next run with resume only scores new and changed
+    files. A manifest (see buildManifest) that was already built is used
+    instead of listing the data folder again, see the watcher module.
+
+    With verifyIntegrity (by default verifyIntegrity in the config file)
+    every data file with a record in the integrity manifest of its folder,
+    written by the Experiment Manager, is checked against it before it is
+    scored; a truncated or modified file is an error of kind integrity. A
+    file with the size and modification time of its record is not hashed
+    again, see the integrity module.
+    """
 
     conf_questionnaireprocessor = config['questionnaireprocessor']
     dataExtList             = conf_questionnaireprocessor['dataExtList']
@@ -44,318 +157,1190 @@ def QuestionnaireProcessor(dataFolder, destinationFolder, responseKey, idKey, ca
     scoreTypeList           = conf_questionnaireprocessor['scoreTypeList']
     incompleteCheck         = None
 
+    if resultFormat is not None:
+        resultExt = resultFormat
+    if longFormat is None:
+        longFormat = stringToBool(conf_questionnaireprocessor['longFormat'])
+    if destinationFolder is None:
+        longFormat = False
+    if itemStatistics is None:
+        itemStatistics = stringToBool(conf_questionnaireprocessor['itemStatistics'])
+    if normTable is None:
+        normTable = conf_questionnaireprocessor['normTable'] or None
+    if verifyIntegrity is None:
+        verifyIntegrity = stringToBool(conf_questionnaireprocessor['verifyIntegrity'])
+
+    try:
+        resultWriter = getResultWriter(resultExt)
+        if unknownAggregations(scoreTypeList):
+            raise ValueError("Unknown score type(s) in scoreTypeList: " + ', '.join(unknownAggregations(scoreTypeList)))
+
+        norms = None
+        if normTable is not None:
+            if unknownAggregations([conf_questionnaireprocessor['normStatistic']]):
+                raise ValueError("Unknown normStatistic: " + conf_questionnaireprocessor['normStatistic'])
+            norms = loadNormTable(normTable)
+    except ValueError as e:
+        errorMessage = "Error: " + str(e)
+        print(errorMessage, file=sys.stderr)
+        if ui is not None:
+            ui.showErrorMessage(errorMessage)
+        return
 
-    dataFolderList    = listDataFolders(dataFolder)
+    if maxDepth is None:
+        maxDepth = int(conf_questionnaireprocessor['maxDepth'])
+    if continueOnError is None:
+        continueOnError = stringToBool(conf_questionnaireprocessor['continueOnError'])
 
-    if not dataFolderList:
-        dataFolderList = [dataFolder]
-        singleFolder = True
+    ## columns needed from the data files
+    if custom:
+        columnList = [responseKey, idKey]
     else:
-        singleFolder = False
+        columnList = [responseKey, idKey, answerKey, categoryKey, scoreKey]
 
-    totalFiles = 0
+    ## the weight and reverse columns are only read when their key is set
+    if not custom:
+        conf_default_input = config['default_input']
+        columnList += [key for key in [conf_default_input['weightKey'], conf_default_input['reverseKey']] if key]
 
-    for dataFolder in dataFolderList:
-        nrDataFile    = len(listDataFiles(dataFolder, dataExtList))
-        totalFiles += nrDataFile
+    statisticList = list(scoreTypeList)
+    if norms is not None:
+        statisticList += norms.statistics
+        columnList += [conf_questionnaireprocessor['ageKey'], conf_questionnaireprocessor['sexKey']]
 
-    counter = 0
-
-    for newDataFolder in dataFolderList:
+    if shard is not None:
+        [shardNr, shardCount] = shard
+        shardSuffix = '.shard-' + str(shardNr) + '-of-' + str(shardCount)
+    else:
+        shardSuffix = ''
 
-        ## find data files and put file names in list and array
-        dataFileList    = listDataFiles(newDataFolder, dataExtList)
+    if instrumentation is None:
+        instrumentation = createInstrumentation('Questionnaire_Processor' + shardSuffix.replace('.', '_'))
 
-        ## start counter and progressbar
+    ## another run on the destination folder is waited for, the results are published when it is closed
+    try:
+        publication = Publication(destinationFolder, shardSuffix)
+    except OSError as e:
+        errorMessage = "Error: Cannot lock the destination folder " + str(destinationFolder) + ": " + str(e)
+        print(errorMessage, file=sys.stderr)
         if ui is not None:
-            ui.progressBar.setValue(0)
-
+            ui.showErrorMessage(errorMessage)
+        return
+    journal = None
+    prefetcher = None
+    longWriter = None
 
-        subjectResponseDict = {}
-        subjectCategoryDict = {}
-        fileNameList = []
+    ## the lock, the journal and the archive readers are released however the run ends
+    try:
+        keepGroupList = []
+        with instrumentation.phase('discovery'):
+            if manifest is None:
+                try:
+                    manifest = buildManifest(dataFolder, dataExtList, maxDepth)
+                except ValueError as e:
+                    errorMessage = "Error: " + str(e)
+                    print(errorMessage, file=sys.stderr)
+                    if ui is not None:
+                        ui.showErrorMessage(errorMessage)
+                    return
 
-        for dataFile in dataFileList:
-            fileName = os.path.basename(dataFile)
-            sys.stdout.write(fileName)
+            if shard is not None:
+                manifest = selectShard(manifest, shardNr, shardCount)
+            if groupList is not None:
+                ## the results of the other groups stay as they are
+                keepGroupList = [group.name for group in manifest if group.name not in groupList]
+                publication.keep(keepGroupList)
+                manifest = [group for group in manifest if group.name in groupList]
+
+        settings = {'dataFolder': os.path.abspath(dataFolder), 'responseKey': responseKey, 'idKey': idKey,
+                    'categoryKey': categoryKey, 'answerKey': answerKey, 'scoreKey': scoreKey, 'customId': customId,
+                    'customCategory': customCategory, 'customAnswers': customAnswers, 'customScore': customScore,
+                    'customWeight': customWeight, 'customReverse': customReverse,
+                    'custom': custom, 'caseInsensitiveComparison': caseInsensitiveComparison,
+                    'scoreTypeList': scoreTypeList, 'normTable': normTable and os.path.abspath(normTable),
+                    'normStatistics': statisticList[len(scoreTypeList):]}
+        if destinationFolder is not None:
+            journalPath = os.path.join(destinationFolder, conf_questionnaireprocessor['journalName'] + shardSuffix)
+        else:
+            journalPath = None
+        journal = ScoreJournal(journalPath, settings, resume,
+                               stringToBool(conf_questionnaireprocessor['journalFsync']))
+
+        totalFiles = sum(len(group.entries) for group in manifest)
+
+        ## members to read per archive and the last group that needs the archive
+        archiveMemberDict = collections.OrderedDict()
+        archiveSizeDict = {}
+        archiveLastGroupDict = {}
+        for group in manifest:
+            for entry in group.entries:
+                if entry.archive is not None and journal.lookup(entry) is None:
+                    archiveMemberDict.setdefault(entry.archive, []).append(entry.member)
+                    archiveSizeDict[entry.archive] = archiveSizeDict.get(entry.archive, 0) + entry.size
+                    archiveLastGroupDict[entry.archive] = group.name
+
+        prefetcher = ArchivePrefetcher(archiveMemberDict, archiveSizeDict,
+                                       int(conf_questionnaireprocessor['archiveWorkers']),
+                                       int(conf_questionnaireprocessor['archivePrefetchBytes']))
+
+        counter = 0
+        errorList = []
+        shardRecordList = []
+
+        for group in manifest:
+
+            ## start counter and progressbar
+            if ui is not None:
+                ui.progressBar.setValue(0)
 
-            dataDict = readCsv(dataFile, ui)
-            if dataDict == None:
-                return
 
-            fileNameList.append(fileName)
+            recordList = []
+            formatCache = {}
+            longWriter = None
+            groupStatistics = ItemStatistics() if itemStatistics else None
+            integrityDict = None
 
-            ## make lists with the dependent variables from the dict
+            for entry in group.entries:
+                ## a compressed log is reported under the name of the log itself
+                fileName = stripCompressionExt(os.path.basename(entry.path))
+                sys.stdout.write(fileName)
 
-            try:
-                responseList     = dataDict[responseKey]
+                record = journal.lookup(entry)
+                if record is not None:
+                    incompleteCheck = incompleteCheck or record['incomplete']
+                    sys.stdout.write(' Resumed!\n')
 
-            except:
-                errorMessage = ("\nError: Column with name: " + responseKey + " is not present in the data file, "
-                                "please try custom experiment")
-                print(errorMessage, file=sys.stderr)
+                else:
+                    try:
+                        ## files in archives are not in a manifest
+                        if verifyIntegrity and entry.archive is None:
+                            with instrumentation.phase('verify'):
+                                if integrityDict is None:
+                                    integrityDict = loadManifest(group.folder)
+                                checkIntegrity(entry, integrityDict)
+
+                        with instrumentation.phase('read'):
+                            rawData = None
+                            if entry.archive is not None:
+                                rawData = readArchiveEntry(prefetcher, entry)
+
+                            ## in continue mode errors are reported at the end instead of in a dialog per file
+                            dataDict = loadDataFile(entry.path, None if continueOnError else ui, columnList, formatCache,
+                                                    rawData)
+                        if dataDict == None:
+                            raise DataFileError('read', "\nError: Cannot process csv file, unknown format")
+                        instrumentation.addBytes(entry.size)
+
+                        [individualScoreDict, uniCategoryScoreDict, keyIdList, incomplete, itemDict] = \
+                            scoreDataFile(dataDict, responseKey, idKey, categoryKey, answerKey, scoreKey, customId,
+                                          customCategory, customAnswers, customScore, custom, caseInsensitiveComparison,
+                                          instrumentation, scoreTypeList, norms, customWeight, customReverse)
+
+                    except DataFileError as e:
+                        print(e.message, file=sys.stderr)
+                        if not continueOnError:
+                            ## the results of the stopped run are not published, the previous generation stays
+                            if longWriter is not None:
+                                longWriter.discard()
+                                longWriter = None
+                            publication.abort()
+                            if ui is not None and e.kind != 'read':
+                                ui.showErrorMessage(e.message)
+                            return
+
+                        errorList.append([entry.path, group.name, e.kind, e.value, e.message])
+                        counter += 1
+                        continue
+
+                    if incomplete:
+                        incompleteCheck = True
+
+                    record = {'relativePath': entry.relativePath, 'size': entry.size, 'mtime': entry.mtime,
+                              'group': group.name, 'file': fileName, 'ids': list(keyIdList),
+                              'scores': individualScoreDict, 'categories': uniCategoryScoreDict,
+                              'items': itemDict, 'incomplete': incomplete}
+                    journal.append(record)
+
+                    sys.stdout.write(' Done!\n')
+
+                if longFormat:
+                    if longWriter is None:
+                        longPath = os.path.join(destinationFolder, resultFileName(group.name, reportExt(resultExt),
+                                                                                'Long_Score_Results' + shardSuffix))
+                        longWriter = LongResultsWriter(longPath, resultDelimiter)
+                    with instrumentation.phase('write'):
+                        longWriter.writeRecord(record)
+
+                if groupStatistics is not None:
+                    groupStatistics.addRecord(record)
+
+                ## in long format the records are not kept, the rows are written as the files are scored
+                if not longFormat or results is not None:
+                    recordList.append(record)
+
+                counter += 1
                 if ui is not None:
-                    ui.showErrorMessage(errorMessage)
-                return
+                    ui.progressBar.setValue(counter / totalFiles * 100)
 
-            try:
-                responseIdList           = dataDict[idKey]
+            if longWriter is not None:
+                longWriter.close()
+                longWriter = None
+                publication.add([longPath], group.name)
+                print('Saved file: ' + longPath)
 
-            except:
-                errorMessage = ("\nError: Column with name: " + idKey + " is not present in the data file, "
-                                "please try custom experiment")
-                print(errorMessage, file=sys.stderr)
-                if ui is not None:
-                    ui.showErrorMessage(errorMessage)
-                return
-
-            if custom:
-                keyIdList = customId
-                categoryList = customCategory
-                answerList = customAnswers
-                scoreList = customScore
-            else:
+            ## a sharded run gets its item statistics from the merged partial results
+            if groupStatistics is not None and destinationFolder is not None and (shard is None or longFormat):
+                statisticsPath = os.path.join(destinationFolder, resultFileName(group.name, reportExt(resultExt),
+                                                                              'Item_Statistics' + shardSuffix))
+                with instrumentation.phase('write'):
+                    groupStatistics.write(statisticsPath, resultDelimiter)
+                publication.add([statisticsPath], group.name)
+                print('Saved file: ' + statisticsPath)
 
-                keyIdList = responseIdList
+            for archivePath in archiveMemberDict:
+                if archiveLastGroupDict[archivePath] == group.name:
+                    prefetcher.release(archivePath)
 
-                try:
-                    answerList       = dataDict[answerKey]
+            if not recordList:
+                continue
 
-                except:
-                    errorMessage = ("\nError: Column with name: " + answerKey + " is not present in the data file, "
-                                    "please try custom experiment")
-                    print(errorMessage, file=sys.stderr)
-                    if ui is not None:
-                        ui.showErrorMessage(errorMessage)
-                    return
+            if shard is not None and not longFormat:
+                shardRecordList.extend(recordList)
 
-                try:
-                    categoryList     = dataDict[categoryKey]
+            if results is None and (shard is not None or destinationFolder is None or longFormat):
+                continue
 
-                except:
-                    errorMessage = ("\nError: Column with name: " + categoryKey + " is not present in the data file, "
-                                    "please try custom experiment")
-                    print(errorMessage, file=sys.stderr)
-                    if ui is not None:
-                        ui.showErrorMessage(errorMessage)
-                    return
+            groupResults = ScoreResults.fromRecords(group.name, recordList, statisticList)
+            if results is not None:
+                results.append(groupResults)
 
-                try:
-                    scoreList  = dataDict[scoreKey]
+            if shard is not None or destinationFolder is None or longFormat:
+                continue
 
-                except:
-                    errorMessage = ("\nError: Column with name: " + scoreKey + " is not present in the data file, "
-                                    "please try custom experiment")
-                    print(errorMessage, file=sys.stderr)
-                    if ui is not None:
-                        ui.showErrorMessage(errorMessage)
-                    return
+            destinationFilePath = os.path.join(destinationFolder, resultFileName(group.name, resultExt))
 
-            ## clean up items
-            responseList   = removeJunk(responseList)
-            responseIdList = removeJunk(responseIdList)
+            with instrumentation.phase('write'):
+                publication.add(resultWriter(destinationFilePath, groupResults, resultDelimiter), group.name)
 
-            if not custom:
-                categoryList = cleanUpStringList(categoryList,';')
-                scoreList    = cleanUpStringList(scoreList,';')
-                answerList   = cleanUpStringList(answerList,';')
+            print('Saved file: ' +  destinationFilePath)
 
+        prefetcher.close()
+
+        if incompleteCheck     :
+            errorMessage = ("Warning:\n\nLog file contains more trials than were defined in the custom "
+                            "input fields, only defined trials were processed!")
+            print(errorMessage, file=sys.stderr)
+            if ui is not None:
+                ui.showErrorMessage(errorMessage)
+        else:
+            pass
+
+        if shard is not None and destinationFolder is not None and not longFormat:
+            partialPath = os.path.join(destinationFolder,
+                                       conf_questionnaireprocessor['partialResultName'] + shardSuffix + '.jsonl')
+            with instrumentation.phase('write'):
+                writePartialResults(partialPath, settings, shard, shardRecordList)
+            publication.add([partialPath])
+            print('Saved file: ' + partialPath)
+
+        if ui is not None:
+            ui.progressBar.setValue(100)
+
+        instrumentation.addEvent(files=counter, folders=len(manifest), errors=len(errorList))
+        reportPath = None
+        if destinationFolder is not None:
+            reportPath = instrumentation.writeReport(destinationFolder)
+        if reportPath:
+            print('Saved performance report: ' + reportPath)
+
+        journal.close(remove=not errorList and not keepJournal)
+
+        if destinationFolder is not None:
+            ## a run on some of the groups keeps the errors of the other groups
+            reportErrorList = [error for error in readErrorReport(destinationFolder, shardSuffix)
+                               if error[1] in keepGroupList] + errorList
+            if reportErrorList:
+                errorReportPath = writeErrorReport(destinationFolder, reportErrorList, resultDelimiter, shardSuffix)
+                publication.add([errorReportPath])
             else:
-                pass
+                removeErrorReport(destinationFolder, shardSuffix)
+
+        if errorList:
+            errorMessage = str(len(errorList)) + " of " + str(totalFiles) + " files could not be processed"
+            if destinationFolder is not None:
+                errorMessage += ", see " + errorReportPath
+            publication.close()
+            print('\n' + errorMessage, file=sys.stderr)
+            if ui is not None:
+                ui.showErrorMessage(errorMessage)
+            return False
+
+        publication.close()
+
+        sys.stdout.write('\nTotal process done!\n')
+
+        succesMessage = ("Total process done!")
+        if ui is not None:
+            ui.showErrorMessage(succesMessage)
+
+        return True
+    finally:
+        if longWriter is not None:
+            longWriter.discard()
+        if prefetcher is not None:
+            prefetcher.close()
+        if journal is not None:
+            journal.close()
+        publication.abort()
+
+def scoreQuestionnaires(dataFolder, responseKey, idKey, categoryKey, answerKey, scoreKey, customId=None,
+                        customCategory=None, customAnswers=None, customScore=None, custom=False,
+                        caseInsensitiveComparison=True, maxDepth=None, customWeight=None, customReverse=None):
+    """
+    Score all data files in the data folder without writing any files, e.g.
+    for use in an analysis script.
+
+    Returns:
+        a list of ScoreResults, one per folder, or None when a file could not
+        be scored
+    """
+    resultList = []
+    if QuestionnaireProcessor(dataFolder, None, responseKey, idKey, categoryKey, answerKey, scoreKey, customId,
+                              customCategory, customAnswers, customScore, custom, caseInsensitiveComparison,
+                              maxDepth=maxDepth, continueOnError=False, results=resultList,
+                              customWeight=customWeight, customReverse=customReverse) is None:
+        return None
+    return resultList
+
+def scoreLogFile(pathToCsv, responseKey, idKey, categoryKey, answerKey, scoreKey,
+                 caseInsensitiveComparison=True, normTable=None):
+    """
+    Score a single log file without scanning its folder, e.g. right after
+    its experiment has finished. normTable is a loaded NormTable or None.
+
+    Returns:
+        the record of the file, as written to the journal
+    Raises:
+        DataFileError when the file cannot be scored
+    """
+    conf_questionnaireprocessor = config['questionnaireprocessor']
+    conf_default_input = config['default_input']
+    scoreTypeList = conf_questionnaireprocessor['scoreTypeList']
+
+    columnList = [responseKey, idKey, answerKey, categoryKey, scoreKey]
+    columnList += [key for key in [conf_default_input['weightKey'], conf_default_input['reverseKey']] if key]
+    if normTable is not None:
+        columnList += [conf_questionnaireprocessor['ageKey'], conf_questionnaireprocessor['sexKey']]
+
+    dataDict = loadDataFile(pathToCsv, None, columnList)
+    if dataDict == None:
+        raise DataFileError('read', "\nError: Cannot process csv file, unknown format")
+
+    [individualScoreDict, uniCategoryScoreDict, keyIdList, incomplete, itemDict] = \
+        scoreDataFile(dataDict, responseKey, idKey, categoryKey, answerKey, scoreKey, None, None, None, None,
+                      False, caseInsensitiveComparison, createInstrumentation('Log_Scoring'), scoreTypeList,
+                      normTable)
+
+    fileStat = os.stat(pathToCsv)
+    return {'relativePath': os.path.basename(pathToCsv), 'size': fileStat.st_size, 'mtime': fileStat.st_mtime,
+            'group': os.path.basename(os.path.dirname(os.path.abspath(pathToCsv))),
+            'file': stripCompressionExt(os.path.basename(pathToCsv)), 'ids': list(keyIdList),
+            'scores': individualScoreDict, 'categories': uniCategoryScoreDict, 'items': itemDict,
+            'incomplete': incomplete}
+
+def scoreDataFile(dataDict, responseKey, idKey, categoryKey, answerKey, scoreKey, customId, customCategory,
+                  customAnswers, customScore, custom, caseInsensitiveComparison, instrumentation,
+                  scoreTypeList=None, normTable=None, customWeight=None, customReverse=None):
+    """
+    Score the responses of a single data file.
+
+    A category can be given as name:weight, the item scores are multiplied
+    by the weight in that category. The weight of an item and whether it is
+    reverse keyed are in the weightKey and reverseKey columns of the data
+    file, when these keys are set (or customWeight and customReverse); a
+    reverse keyed score is mirrored between the lowest and highest score of
+    the item before it is weighted. The score of a weighted or reverse keyed
+    item is reported as the keyed score. Without them the scores are used as
+    they are.
+
+    The statistics in scoreTypeList (see the aggregation module) are computed
+    for all categories at once. An answer with an empty score is a missing
+    item, it is left out of the statistics and counted by Missing. With a
+    NormTable the normed scores of the categories are added as well, for the
+    age and sex in the ageKey and sexKey columns of the data file.
+
+    Returns:
+        [individualScoreDict, uniCategoryScoreDict, keyIdList, incomplete, itemDict]
+        with the score per ID, the score statistics per category, the scored
+        IDs, whether the file contains more trials than the custom IDs and
+        the response and categories per ID.
+    Raises:
+        DataFileError when the file cannot be scored
+    """
+
+    if scoreTypeList is None:
+        scoreTypeList = config['questionnaireprocessor']['scoreTypeList']
+
+    ## make lists with the dependent variables from the dict
+    responseList   = _getColumn(dataDict, responseKey)
+    responseIdList = _getColumn(dataDict, idKey)
+
+    if custom:
+        keyIdList = customId
+        categoryList = customCategory
+        answerList = customAnswers
+        scoreList = customScore
+        weightList = customWeight or []
+        reverseList = customReverse or []
+
+        for [name, valueList] in [['categories', categoryList], ['answers', answerList], ['scores', scoreList]]:
+            if len(valueList) != len(keyIdList):
+                errorMessage = ("\nThere are " + str(len(keyIdList)) + " custom IDs but " + str(len(valueList)) +
+                                " custom " + name + ", please input a value for every ID")
+                raise DataFileError('invalid_score', errorMessage, name)
+    else:
+        keyIdList = responseIdList
 
-            responseDict = {}
-            answerScoreDict = {}
-            categoryDict = {}
+        answerList   = _getColumn(dataDict, answerKey)
+        categoryList = _getColumn(dataDict, categoryKey)
+        scoreList    = _getColumn(dataDict, scoreKey)
 
-            if not len(keyIdList) == len(responseIdList):
-                incompleteCheck = True
+        ## optional columns, not used when their key is empty (the default)
+        conf_default_input = config['default_input']
+        weightList  = dataDict.get(conf_default_input['weightKey'], []) if conf_default_input['weightKey'] else []
+        reverseList = dataDict.get(conf_default_input['reverseKey'], []) if conf_default_input['reverseKey'] else []
+
+    ## clean up items
+    with instrumentation.phase('clean'):
+        responseList   = removeJunk(responseList)
+        responseIdList = removeJunk(responseIdList)
+
+        if not custom:
+            categoryList = cleanUpStringList(categoryList,';')
+            scoreList    = cleanUpStringList(scoreList,';')
+            answerList   = cleanUpStringList(answerList,';')
+
+        else:
+            pass
+
+    responseDict = {}
+    responseTextDict = {}
+    answerScoreDict = {}
+    categoryDict = {}
+    membershipWeightDict = {}
+    itemKeyDict = {}
+
+    incomplete = not len(keyIdList) == len(responseIdList)
+
+    ## make dicts
+    compileStart = time.perf_counter()
+    for index in range(len(keyIdList)):
+
+        ## make categoryDict
+        categoryItemList = []
+        membershipWeightList = []
+        for categoryItem in categoryList[index].split(';'):
+            [category, weight] = _parseCategoryWeight(categoryItem)
+            categoryItemList.append(category)
+            membershipWeightList.append(weight)
+        categoryDict[keyIdList[index]] = categoryItemList
+        membershipWeightDict[keyIdList[index]] = membershipWeightList
+
+        ## make answerScoreDict
+        answerItemList = answerList[index].split(';')
+        scoreItemList  = scoreList[index].split(';')
+
+        if len(answerItemList) != len(scoreItemList):
+            errorMessage = ("\nItem with ID: \"" + keyIdList[index] + "\" has " + str(len(answerItemList)) +
+                            " answer options but " + str(len(scoreItemList)) + " scores: \"" + answerList[index] +
+                            "\", \"" + scoreList[index] + "\"")
+            raise DataFileError('invalid_score', errorMessage, keyIdList[index])
+
+        ## the weight and reverse keying of the item, None when it is scored as is
+        weight = _parseWeight(weightList[index] if index < len(weightList) else '', keyIdList[index])
+        reverse = _parseReverse(reverseList[index] if index < len(reverseList) else '', keyIdList[index])
+        if weight != 1.0 or reverse:
+            itemKeyDict[keyIdList[index]] = [weight, reverse, _scoreRange(scoreItemList)]
+
+        answerDict = {}
+
+        for subindex in range(len(answerItemList)):
+            if caseInsensitiveComparison:
+                answerDict[answerItemList[subindex].lower()] = scoreItemList[subindex]
             else:
-                pass
+                answerDict[answerItemList[subindex]] = scoreItemList[subindex]
+
+        answerScoreDict[keyIdList[index]] = answerDict
 
-            ## make dicts
-            for index in range(len(keyIdList)):
+    ## make reponseDict
+    for index in range(len(responseIdList)):
+        responseTextDict[responseIdList[index]] = responseList[index]
 
-                ## make categoryDict
-                categoryItemList = categoryList[index].split(';')
-                categoryDict[keyIdList[index]] = categoryItemList
+        if caseInsensitiveComparison:
+            responseDict[responseIdList[index]] = responseList[index].lower()
+        else:
+            responseDict[responseIdList[index]] = responseList[index]
+
+    instrumentation.addTime('compile', time.perf_counter() - compileStart)
 
-                ## make answerScoreDict
-                answerItemList = answerList[index].split(';')
-                scoreItemList  = scoreList[index].split(';')
+    individualScoreDict = {}
+    itemDict = {}
 
-                answerDict = {}
+    ## every (category, item) pair: the index of the category and the score
+    categoryIndexDict = {}
+    pairCategoryList = []
+    pairScoreList = []
+    pairWeightList = []
+    sortedIdList = sorted(keyIdList)
 
-                for subindex in range(len(answerItemList)):
-                    if caseInsensitiveComparison:
-                        answerDict[answerItemList[subindex].lower()] = scoreItemList[subindex]
-                    else:
-                        answerDict[answerItemList[subindex]] = scoreItemList[subindex]
+    scoringStart = time.perf_counter()
 
-                answerScoreDict[keyIdList[index]] = answerDict
+    for index in range(len(sortedIdList)):
+        selectedId = sortedIdList[index]
 
-                ## make reponseDict
-            for index in range(len(responseIdList)):
+        categoryList = categoryDict[selectedId]
+        scoreDict = answerScoreDict[selectedId]
 
-                if caseInsensitiveComparison:
-                    responseDict[responseIdList[index]] = responseList[index].lower()
+        try:
+            response = responseDict[selectedId]
+        except KeyError:
+            errorMessage = ("\nResponse with ID: \"" + selectedId + "\" is not found in the log file.\n"
+                            "Log File contains the following ID values:\n\n\"" + '\"\n\"'.join(responseIdList) + "\"\n\n"
+                            "Please input the correct ID values")
+            raise DataFileError('unknown_id', errorMessage, selectedId)
+
+        try:
+            score = scoreDict[response]
+        except KeyError:
+            errorMessage = ("\nResponse: \"" + response + "\" is not defined in the response field\n"
+                            "Given values are: \n\n\"" + '\"\n\"'.join(scoreDict))
+            raise DataFileError('unknown_response', errorMessage, response)
+
+        if selectedId in itemKeyDict:
+            score = _keyScore(score, *itemKeyDict[selectedId])
+
+        individualScoreDict[selectedId] = score
+        itemDict[selectedId] = [responseTextDict[selectedId], categoryList]
+
+        for category, weight in zip(categoryList, membershipWeightDict[selectedId]):
+            pairCategoryList.append(categoryIndexDict.setdefault(category, len(categoryIndexDict)))
+            pairScoreList.append(score)
+            pairWeightList.append(weight)
+
+    instrumentation.addTime('scoring', time.perf_counter() - scoringStart)
+
+    uniCategoryScoreDict = {}
+
+    with instrumentation.phase('aggregation'):
+        pairValueList = []
+        for index in range(len(pairScoreList)):
+            score = pairScoreList[index]
+            if not score.strip():
+                ## an answer without a score is a missing item
+                pairValueList.append(np.nan)
+                continue
+            try:
+                pairValueList.append(float(score))
+            except ValueError:
+                uniCategory = list(categoryIndexDict)[pairCategoryList[index]]
+                uniCategoryScoreList = [pairScoreList[pairIndex] for pairIndex in range(len(pairScoreList))
+                                        if pairCategoryList[pairIndex] == pairCategoryList[index]]
+                errorMessage = ("\nCategory: \"" + uniCategory + "\" contains scores that are not numbers: \"" +
+                                '\", \"'.join(uniCategoryScoreList) + "\"")
+                raise DataFileError('invalid_score', errorMessage, uniCategory)
+
+        if categoryIndexDict:
+            ## the category weights of the items, 1 for unweighted categories
+            pairValueArray = np.asarray(pairValueList, dtype='d') * np.asarray(pairWeightList, dtype='d')
+            [scoreArray, sizeArray] = categoryScoreArray(pairCategoryList, pairValueArray, len(categoryIndexDict))
+            statisticDict = aggregate(scoreArray, sizeArray, scoreTypeList)
+            statisticList = list(scoreTypeList)
+
+            if normTable is not None:
+                conf_questionnaireprocessor = config['questionnaireprocessor']
+                normStatistic = conf_questionnaireprocessor['normStatistic']
+                if normStatistic in statisticDict:
+                    rawArray = statisticDict[normStatistic]
                 else:
-                    responseDict[responseIdList[index]] = responseList[index]
+                    rawArray = aggregate(scoreArray, sizeArray, [normStatistic])[normStatistic]
 
-            individualScoreDict = {}
-            categoryScoreDict = {}
-            sortedIdList = sorted(keyIdList)
+                age = parseAge(dataDict.get(conf_questionnaireprocessor['ageKey'], []))
+                sex = parseSex(dataDict.get(conf_questionnaireprocessor['sexKey'], []))
+                statisticDict.update(normTable.convert(list(categoryIndexDict), rawArray, age, sex))
+                statisticList += normTable.statistics
 
-            for index in range(len(sortedIdList)):
-                selectedId = sortedIdList[index]
+            for uniCategory in categoryIndexDict:
+                categoryIndex = categoryIndexDict[uniCategory]
+                uniCategoryScoreDict[uniCategory] = dict((scoreType, float(statisticDict[scoreType][categoryIndex]))
+                                                         for scoreType in statisticList)
 
-                categoryList = categoryDict[selectedId]
-                scoreDict = answerScoreDict[selectedId]
+    return [individualScoreDict, uniCategoryScoreDict, keyIdList, incomplete, itemDict]
 
-                try:
-                    response = responseDict[selectedId]
-                except:
+def _parseCategoryWeight(categoryItem):
+    """
+    Split a category given as name:weight, a category without a (numeric)
+    weight has weight 1
+    """
+    [category, separator, weight] = categoryItem.rpartition(':')
+    if separator:
+        try:
+            return [category.strip(), float(weight)]
+        except ValueError:
+            pass
+    return [categoryItem, 1.0]
 
-                    errorMessage = ("\nResponse with ID: \"" + selectedId + "\" is not found in the log file.\n"
-                                    "Log File contains the following ID values:\n\n\"" + '\"\n\"'.join(responseIdList) + "\"\n\n"
-                                    "Please input the correct ID values")
+def _parseWeight(value, identity):
+    """
+    The weight of an item, 1 when it is empty
+    """
+    value = str(value).strip()
+    if not value:
+        return 1.0
+    try:
+        return float(value)
+    except ValueError:
+        errorMessage = "\nItem with ID: \"" + identity + "\" has a weight that is not a number: \"" + value + "\""
+        raise DataFileError('invalid_weight', errorMessage, identity)
 
-                    print(errorMessage, file=sys.stderr)
-                    if ui is not None:
-                        ui.showErrorMessage(errorMessage)
-                    return
+def _parseReverse(value, identity):
+    """
+    Whether an item is reverse keyed, not when it is empty
+    """
+    value = str(value).strip().lower()
+    if value in ('', '0', 'false', 'no', 'n'):
+        return False
+    if value in ('1', 'true', 'yes', 'y', 'r', 'reverse'):
+        return True
+    errorMessage = "\nItem with ID: \"" + identity + "\" has an unknown reverse value: \"" + value + "\""
+    raise DataFileError('invalid_reverse', errorMessage, identity)
+
+def _scoreRange(scoreItemList):
+    """
+    The lowest and highest numeric score of the answers of an item
+    """
+    valueList = []
+    for score in scoreItemList:
+        try:
+            valueList.append(float(score))
+        except ValueError:
+            continue
+    if not valueList:
+        return None
+    return [min(valueList), max(valueList)]
+
+def _keyScore(score, weight, reverse, scoreRange):
+    """
+    The score of a weighted and/or reverse keyed item; missing and invalid
+    scores are left as they are
+    """
+    try:
+        value = float(score)
+    except ValueError:
+        return score
+    if reverse and scoreRange is not None:
+        value = scoreRange[0] + scoreRange[1] - value
+    return formatScore(value * weight)
+
+def readArchiveEntry(prefetcher, entry):
+    """
+    The data of a file in an archive, raise a DataFileError when the archive
+    cannot be read
+    """
+    try:
+        return prefetcher.take(entry.archive, entry.member)
+    except (OSError, EOFError, KeyError, zlib.error, zipfile.BadZipFile, tarfile.TarError) as e:
+        errorMessage = ("\nError: Cannot read " + entry.member + " from archive " + entry.archive + ": " + str(e))
+        raise DataFileError('read', errorMessage, entry.archive)
 
-                try:
-                    score = scoreDict[response]
+def _getColumn(dataDict, key):
+    """
+    Return a column of the data, raise a DataFileError when it is missing
+    """
+    try:
+        return dataDict[key]
+    except KeyError:
+        errorMessage = ("\nError: Column with name: " + key + " is not present in the data file, "
+                        "please try custom experiment")
+        raise DataFileError('missing_column', errorMessage, key)
 
-                except:
+def errorReportPath(destinationFolder, suffix=''):
+    """
+    Path of the error report in the destination folder
+    """
+    conf_questionnaireprocessor = config['questionnaireprocessor']
+    resultExt = reportExt(conf_questionnaireprocessor['resultExt'])
+    return os.path.join(destinationFolder, conf_questionnaireprocessor['errorReportName'] + suffix + '.' + resultExt)
 
-                    errorMessage = ("\nResponse: \"" + response + "\" is not defined in the response field\n"
-                                    "Given values are: \n\n\"" + '\"\n\"'.join(scoreDict))
+def writeErrorReport(destinationFolder, errorList, delimiter, suffix=''):
+    """
+    Write the files that could not be processed to the error report, one
+    row per file with the error kind, the offending value and the message.
+    Returns the path of the report.
+    """
+    reportPath = errorReportPath(destinationFolder, suffix)
 
-                    print(errorMessage, file=sys.stderr)
-                    if ui is not None:
-                        ui.showErrorMessage(errorMessage)
-                    return
+    with atomicOpen(reportPath, 'wt', newline='', encoding='utf-8') as fp:
+        writer = csv.writer(fp, delimiter=delimiter)
+        writer.writerow(['File', 'Folder', 'Error', 'Value', 'Message'])
+        for [path, groupName, kind, value, message] in errorList:
+            writer.writerow([path, groupName, kind, '' if value is None else value,
+                             ' '.join(message.split())])
 
-                individualScoreDict[selectedId] = score
+    return reportPath
 
-                for category in categoryList:
-                    if category in categoryScoreDict:
-                        categoryScoreDict[category].append(score)
-                    else:
-                        categoryScoreDict[category] = [score]
+def readErrorReport(destinationFolder, suffix=''):
+    """
+    The rows of the error report, as given to writeErrorReport; an empty
+    list when there is no report
+    """
+    delimiter = config['questionnaireprocessor']['resultDelimiter']
+    try:
+        with open(errorReportPath(destinationFolder, suffix), 'rt', newline='', encoding='utf-8') as fp:
+            rowList = list(csv.reader(fp, delimiter=delimiter))
+    except FileNotFoundError:
+        return []
+    return [[row[0], row[1], row[2], row[3] or None, row[4]] for row in rowList[1:] if len(row) == 5]
 
-            subjectResponseDict[fileName] = individualScoreDict
-            uniCategoryList = categoryScoreDict.keys()
-            uniCategoryScoreDict = {}
+def removeErrorReport(destinationFolder, suffix=''):
+    """
+    Remove the error report of an earlier run, so a run without errors does
+    not leave the errors of a previous run behind
+    """
+    try:
+        os.remove(errorReportPath(destinationFolder, suffix))
+    except FileNotFoundError:
+        pass
 
-            for uniCategory in uniCategoryList:
-                uniCategoryScoreList = categoryScoreDict[uniCategory]
-                uniCategoryScoreArray = np.array(uniCategoryScoreList, dtype='d')
 
-                sumUniCategoryScoreString = str(np.sum(uniCategoryScoreArray))
-                meanUniCategoryScoreString = str(np.mean(uniCategoryScoreArray))
+def resultFileName(groupName, resultExt, resultName='Cumulative_Score_Results'):
+    """
+    Name of the results file of a group
+    """
+    if not groupName:
+        return resultName + '.' + resultExt
+    else:
+        return groupName + '_' + resultName + '.' + resultExt
 
-                uniCategoryScoreDict1 = {}
-                uniCategoryScoreDict1['Sum'] = sumUniCategoryScoreString
-                uniCategoryScoreDict1['Mean'] = meanUniCategoryScoreString
-                uniCategoryScoreDict[uniCategory] = uniCategoryScoreDict1
+def shardOf(relativePath, shardCount):
+    """
+    The shard (counting from 1) a data file belongs to. Only depends on the
+    path relative to the data folder, so every node computes the same
+    partition. A cryptographic digest is used because the bits of a crc32
+    hardly change between paths that differ in a single character.
+    """
+    digest = hashlib.sha1(relativePath.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shardCount + 1
 
-            subjectCategoryDict[fileName] = uniCategoryScoreDict
+def selectShard(manifest, shardNr, shardCount):
+    """
+    Keep only the entries of the manifest that belong to the given shard
+    """
+    shardManifest = []
+    for group in manifest:
+        entryList = [entry for entry in group.entries if shardOf(entry.relativePath, shardCount) == shardNr]
+        if entryList:
+            shardManifest.append(group._replace(entries=entryList))
+    return shardManifest
+
+def writePartialResults(path, settings, shard, recordList):
+    """
+    Write the records of a shard as JSON lines. The file is written under a
+    temporary name and renamed when complete, so a partial results file
+    always holds a whole shard.
+    """
+    with atomicOpen(path, 'wt', encoding='utf-8') as fp:
+        fp.write(json.dumps({'settings': settings, 'shard': list(shard)}, ensure_ascii=False) + '\n')
+        for record in recordList:
+            fp.write(json.dumps(record, ensure_ascii=False) + '\n')
 
-            sys.stdout.write(' Done!\n')
-            counter += 1
-            if ui is not None:
-                ui.progressBar.setValue(counter / totalFiles * 100)
+def mergePartialResults(partialPathList, destinationFolder, resultFormat=None, itemStatistics=None):
+    """
+    Combine the partial results of all shards of a run into the results
+    files, the same files as an unsharded run would have written, with the
+    item statistics reports when itemStatistics is set.
 
-        if singleFolder:
-            destinationFile = 'Cumulative_Score_Results.' + resultExt
-        else:
-            destinationFile = os.path.basename(os.path.dirname(newDataFolder)) + '_Cumulative_Score_Results.' + resultExt
+    Returns True on success, None when the partial results do not belong to
+    the same run, shards are missing or the result format is not available.
+    """
+    conf_questionnaireprocessor = config['questionnaireprocessor']
+    resultExt               = conf_questionnaireprocessor['resultExt']
+    resultDelimiter         = conf_questionnaireprocessor['resultDelimiter']
 
-        destinationFilePath = os.path.join(destinationFolder, destinationFile)
+    if resultFormat is not None:
+        resultExt = resultFormat
+    if itemStatistics is None:
+        itemStatistics = stringToBool(conf_questionnaireprocessor['itemStatistics'])
 
-        writeCsv(destinationFilePath, subjectCategoryDict, subjectResponseDict, sorted(fileNameList),
-                 sorted(uniCategoryList), sorted(keyIdList),scoreTypeList,resultDelimiter)
+    try:
+        resultWriter = getResultWriter(resultExt)
+    except ValueError as e:
+        print("Error: " + str(e), file=sys.stderr)
+        return None
+
+    settings = None
+    shardCount = None
+    shardNrList = []
+    groupRecordDict = {}
+
+    for partialPath in partialPathList:
+        with open(partialPath, 'rt', encoding='utf-8') as fp:
+            header = json.loads(fp.readline())
+
+            ## the data folder may be mounted at another path on every node
+            header['settings'].pop('dataFolder', None)
+
+            if settings is None:
+                settings = header['settings']
+                shardCount = header['shard'][1]
+            elif header['settings'] != settings or header['shard'][1] != shardCount:
+                errorMessage = "Error: " + partialPath + " belongs to another run, cannot merge"
+                print(errorMessage, file=sys.stderr)
+                return None
 
-        print('Saved file: ' +  destinationFilePath)
+            shardNrList.append(header['shard'][0])
 
-    if incompleteCheck     :
-        errorMessage = ("Warning:\n\nLog file contains more trials than were defined in the custom "
-                        "input fields, only defined trials were processed!")
-        print(errorMessage, file=sys.stderr)
-        if ui is not None:
-            ui.showErrorMessage(errorMessage)
-    else:
-        pass
+            for line in fp:
+                record = json.loads(line)
+                groupRecordDict.setdefault(record['group'], []).append(record)
+
+    if settings is None:
+        print("Error: No partial results to merge", file=sys.stderr)
+        return None
+
+    ## every shard 1..N exactly once, a shard given twice would count its files twice
+    errorMessage = checkShardNumbers(shardNrList, shardCount)
+    if errorMessage is not None:
+        print("Error: " + errorMessage + ", cannot merge", file=sys.stderr)
+        return None
+
+    try:
+        publication = Publication(destinationFolder)
+    except OSError as e:
+        print("Error: Cannot lock the destination folder " + destinationFolder + ": " + str(e), file=sys.stderr)
+        return None
+
+    for groupName in sorted(groupRecordDict):
+        recordList = sorted(groupRecordDict[groupName], key=lambda record: record['relativePath'])
+        destinationFilePath = os.path.join(destinationFolder, resultFileName(groupName, resultExt))
+        groupResults = ScoreResults.fromRecords(groupName, recordList,
+                                                settings['scoreTypeList'] + settings.get('normStatistics', []))
+        publication.add(resultWriter(destinationFilePath, groupResults, resultDelimiter), groupName)
+        print('Saved file: ' +  destinationFilePath)
 
-    if ui is not None:
-        ui.progressBar.setValue(100)
-    sys.stdout.write('\nTotal process done!\n')
+        if itemStatistics:
+            groupStatistics = ItemStatistics()
+            for record in recordList:
+                groupStatistics.addRecord(record)
+            statisticsPath = os.path.join(destinationFolder, resultFileName(groupName, reportExt(resultExt),
+                                                                          'Item_Statistics'))
+            groupStatistics.write(statisticsPath, resultDelimiter)
+            publication.add([statisticsPath], groupName)
+            print('Saved file: ' + statisticsPath)
 
-    succesMessage = ("Total process done!")
-    if ui is not None:
-        ui.showErrorMessage(succesMessage)
+    publication.close()
 
     return True
 
+def checkShardNumbers(shardNrList, shardCount):
+    """
+    Check that the shard numbers of the partial results to merge are 1 to
+    shardCount, each exactly once.
+
+    Returns:
+        None when they are, otherwise a message with the problem
+    """
+    if not isinstance(shardCount, int) or shardCount < 1:
+        return "Invalid number of shards: " + str(shardCount)
+
+    problemList = []
+
+    duplicateList = sorted(set(nr for nr in shardNrList if shardNrList.count(nr) > 1))
+    if duplicateList:
+        problemList.append("shard(s) " + ', '.join(str(nr) for nr in duplicateList) + " are given more than once")
 
-def listDataFolders(folder):
+    invalidList = sorted(set(nr for nr in shardNrList if not isinstance(nr, int) or not 1 <= nr <= shardCount))
+    if invalidList:
+        problemList.append("shard(s) " + ', '.join(str(nr) for nr in invalidList) + " are not shards of " +
+                           str(shardCount))
 
-    folderList = sorted(glob.glob(folder + fs + '*/'))
+    missingList = sorted(set(range(1, shardCount + 1)) - set(shardNrList))
+    if missingList:
+        problemList.append("partial results of shard(s) " + ', '.join(str(nr) for nr in missingList) + " of " +
+                           str(shardCount) + " are missing")
 
-    return folderList
+    if not problemList:
+        return None
+    message = '; '.join(problemList)
+    return message[0].upper() + message[1:]
 
-def listDataFiles(dataDir,extensionList):
+def checkIntegrity(entry, integrityDict):
     """
-    List data files
+    Check a data file against its record in the integrity manifest of its
+    folder, a file without a record is not checked
+
+    Raises:
+        DataFileError when the file is truncated or modified
+    """
+    integrityRecord = integrityDict.get(os.path.basename(entry.path))
+    if integrityRecord is None:
+        return
+
+    try:
+        problem = verifyFile(entry.path, entry.size, entry.mtime, integrityRecord)
+    except OSError as e:
+        raise DataFileError('read', "\nError: Cannot read " + entry.path + ": " + str(e))
+
+    if problem is not None:
+        raise DataFileError('integrity', "\nError: " + entry.path + " was " + problem +
+                            " after it was recorded (size " + str(integrityRecord['size']) + ", sha256 " +
+                            integrityRecord['sha256'] + ")", problem)
+
+ManifestEntry = collections.namedtuple('ManifestEntry', ['path', 'relativePath', 'size', 'mtime',
+                                                       'archive', 'member'])
+ManifestGroup = collections.namedtuple('ManifestGroup', ['folder', 'name', 'entries'])
+
+## a folder in an archive, node is None until the archive has been listed
+ArchiveFolder = collections.namedtuple('ArchiveFolder', ['path', 'archive', 'node'])
+
+def buildManifest(dataFolder, extensionList, maxDepth=1, archiveExtList=None):
     """
+    Walk the data folder once with os.scandir and list the data files, with
+    their size and modification time, grouped per folder. The results of
+    every group are written to a separate file.
 
-    fileList = []
-    for extension in extensionList:
-        fileList.extend(glob.glob(dataDir + fs + '*.' + extension))
+    When the data folder has subfolders these are processed (up to maxDepth
+    levels deep) and the files directly in the data folder are ignored,
+    otherwise the data folder itself is the only group. Hidden files and
+    folders are skipped. Groups without data files are left out.
 
-    fileList = sorted(fileList)
+    A zip or tar archive is a folder with the name of the archive without
+    its extension; the data folder can be an archive as well. An archive is
+    skipped when there is a folder with the same name.
 
-    return fileList
+    Data files compressed with gzip (.gz) or zstd (.zst) are listed as
+    well, unless the uncompressed file is present too (a log that is being
+    compressed).
 
-def readCsv(pathToCsv, ui):
+    The relative path of an entry uses forward slashes on every platform.
+    The name of a group is the path of its folder joined with '_', so
+    folders like a/b_c and a_b/c would share their results file; such
+    folders are refused.
+
+    Returns:
+        a list of ManifestGroup tuples, with the entries sorted by path
+    Raises:
+        ValueError when two folders get the same group name
+    """
+
+    if archiveExtList is None:
+        archiveExtList = config['questionnaireprocessor']['archiveExtList']
+
+    suffixList = [os.path.normcase('.' + extension) for extension in extensionList]
+    suffixList += [suffix + '.' + codecExtDict[codec] for suffix in suffixList for codec in codecExtDict]
+
+    if os.path.isfile(dataFolder) and archiveExtension(dataFolder, archiveExtList):
+        dataFolder = ArchiveFolder(dataFolder, dataFolder, None)
+
+    manifest = []
+    [entryList, subFolderList] = _scanDataFolder(dataFolder, [], suffixList, archiveExtList)
+
+    if not subFolderList:
+        if entryList:
+            manifest.append(ManifestGroup(_folderPath(dataFolder), '', entryList))
+        return manifest
+
+    ## group name -> the relative path of its folder
+    groupFolderDict = {}
+
+    folderList = [(subFolder, [name], 1) for [name, subFolder] in subFolderList]
+    while folderList:
+        [folder, nameList, depth] = folderList.pop(0)
+        [entryList, subFolderList] = _scanDataFolder(folder, nameList, suffixList, archiveExtList)
+
+        if entryList:
+            groupName = '_'.join(nameList)
+            if groupName in groupFolderDict:
+                raise ValueError("Folders " + groupFolderDict[groupName] + " and " + '/'.join(nameList) +
+                                 " in " + str(_folderPath(dataFolder)) + " both give the group name " + groupName +
+                                 ", rename one of them")
+            groupFolderDict[groupName] = '/'.join(nameList)
+            manifest.append(ManifestGroup(_folderPath(folder), groupName, entryList))
+
+        if depth < maxDepth:
+            childList = [(subFolder, nameList + [name], depth + 1) for [name, subFolder] in subFolderList]
+            folderList = childList + folderList
+
+    return manifest
+
+def _folderPath(folder):
+    if isinstance(folder, ArchiveFolder):
+        return folder.path
+    return folder
+
+def _scanDataFolder(folder, nameList, suffixList, archiveExtList):
+    """
+    List the data files and the subfolders, as [name, folder] pairs, of a
+    single folder
+    """
+
+    if isinstance(folder, ArchiveFolder):
+        return _scanArchiveFolder(folder, nameList, suffixList)
+
+    entryList = []
+    subFolderList = []
+    archiveList = []
+
+    with os.scandir(folder) as iterator:
+        for dirEntry in iterator:
+            if dirEntry.name.startswith('.'):
+                continue
+            if dirEntry.is_dir():
+                subFolderList.append([dirEntry.name, dirEntry.path])
+            elif dirEntry.is_file() and os.path.normcase(dirEntry.name).endswith(tuple(suffixList)):
+                stat = dirEntry.stat()
+                relativePath = '/'.join(nameList + [dirEntry.name])
+                entryList.append(ManifestEntry(dirEntry.path, relativePath, stat.st_size, stat.st_mtime,
+                                               None, None))
+            elif dirEntry.is_file() and archiveExtension(dirEntry.name, archiveExtList):
+                name = archiveStem(dirEntry.name, archiveExtList)
+                archiveList.append([name, ArchiveFolder(os.path.join(folder, name), dirEntry.path, None)])
+
+    entryList = _dropCompressedDuplicates(entryList)
+
+    folderNameSet = set(name for [name, subFolder] in subFolderList)
+    for [name, archiveFolder] in sorted(archiveList):
+        if name in folderNameSet:
+            print("Warning: Archive " + archiveFolder.archive + " is skipped, there is a folder with the same name",
+                  file=sys.stderr)
+            continue
+        folderNameSet.add(name)
+        subFolderList.append([name, archiveFolder])
+
+    return [sorted(entryList), sorted(subFolderList, key=lambda item: item[0])]
+
+def _scanArchiveFolder(folder, nameList, suffixList):
+    """
+    List the data files and the subfolders of a folder in an archive
+    """
+
+    if folder.node is None:
+        try:
+            memberList = listArchive(folder.archive)
+        except (OSError, EOFError, zlib.error, zipfile.BadZipFile, tarfile.TarError) as e:
+            print("Warning: Archive " + folder.archive + " is skipped, it cannot be read: " + str(e),
+                  file=sys.stderr)
+            return [[], []]
+
+        ## tree of nested dicts, a file maps to its ArchiveMember
+        node = {}
+        for member in memberList:
+            parentNode = node
+            for part in member.parts[:-1]:
+                parentNode = parentNode.setdefault(part, {})
+                if not isinstance(parentNode, dict):
+                    break
+            else:
+                parentNode[member.parts[-1]] = member
+        folder = folder._replace(node=node)
+
+    entryList = []
+    subFolderList = []
+
+    for name in folder.node:
+        child = folder.node[name]
+        path = os.path.join(folder.path, name)
+        if isinstance(child, dict):
+            subFolderList.append([name, ArchiveFolder(path, folder.archive, child)])
+        elif os.path.normcase(name).endswith(tuple(suffixList)):
+            relativePath = '/'.join(nameList + [name])
+            entryList.append(ManifestEntry(path, relativePath, child.size, child.mtime,
+                                           folder.archive, child.name))
+
+    entryList = _dropCompressedDuplicates(entryList)
+
+    return [sorted(entryList), sorted(subFolderList, key=lambda item: item[0])]
+
+def _dropCompressedDuplicates(entryList):
+    """
+    Leave out compressed files of which the uncompressed file is listed too
+    """
+    pathSet = set(entry.path for entry in entryList)
+    return [entry for entry in entryList
+            if compressionOf(entry.path) is None or stripCompressionExt(entry.path) not in pathSet]
+
+def readCsv(pathToCsv, ui, formatCache=None, rawData=None):
     """
     Reads csv file to a dict containing lists, each representing a column.
     The keys of the dictionary represent the column names, and the value contains
     the corresponding list of the column.
 
+    The encoding and dialect are detected from a sample of the file. When a
+    formatCache dict is given, the detected format is stored per folder and
+    reused for the other files in that folder; a file is only sniffed again
+    when it cannot be read with the cached format.
+
     Args:
         pathToCsv (string): a path to the csv file to be parsed
+        formatCache (dict): optional cache of detected formats per folder
+        rawData (bytes): optional contents of the file, e.g. read from an
+            archive, used instead of reading pathToCsv
     Returns:
         a dictionary with for every key the corresponding column list of data
 
     """
 
-    encoding = 'utf-8'
-#    delimiter = ','
-#    quotechar = '"'
+    conf_questionnaireprocessor = config['questionnaireprocessor']
+    encodingList = conf_questionnaireprocessor['csvEncodingList']
+    sampleSize   = int(conf_questionnaireprocessor['csvSampleSize'])
 
+    if rawData is None:
+        with open(pathToCsv, 'rb') as fp:
+            rawData = fp.read()
 
-    with open(pathToCsv, 'rt', newline='', encoding=encoding) as fp:
-
-        try:
-            dialect = csv.Sniffer().sniff(fp.readline())
-        except Exception:
-            dialect = csv.get_dialect('excel')
-        fp.seek(0)
+    folder = os.path.dirname(pathToCsv)
+    rowDataList = None
 
+    if formatCache is not None and folder in formatCache:
+        [encoding, dialect] = formatCache[folder]
+        rowDataList = parseCsvData(rawData, encoding, dialect)
 
+    if rowDataList is None:
         try:
-            data = csv.reader(fp, dialect=dialect)
+            [encoding, dialect] = detectCsvFormat(rawData[:sampleSize], encodingList)
+            rowDataList = parseCsvData(rawData, encoding, dialect)
+
+            ## the sample can be valid in an encoding the rest of the file is not
+            if rowDataList is None and encoding in encodingList:
+                for candidate in encodingList[encodingList.index(encoding) + 1:]:
+                    rowDataList = parseCsvData(rawData, candidate, dialect)
+                    if rowDataList is not None:
+                        encoding = candidate
+                        break
         except Exception as e:
             errorMessage = ("Cannot process csv file, unknown format, see the log file for more information")
+            logging.exception("Cannot process csv file: %s", e)
             if ui is not None:
-                logging.exception("Cannot process csv file: %s", e)
                 ui.showErrorMessage(errorMessage)
             return None
 
-        rowDataList = list(data)
+        if rowDataList is not None and formatCache is not None:
+            formatCache[folder] = [encoding, dialect]
+
+    return _rowsToDict(pathToCsv, rowDataList, ui)
+
+def _rowsToDict(pathToCsv, rowDataList, ui):
+    """
+    Turn the rows of a csv file in a dict of columns, None when there are no
+    rows or no data
+    """
+
+    if not rowDataList:
+        errorMessage = ("Cannot process csv file, unknown format")
+        if ui is not None:
+            logging.error("Cannot process csv file: %s", pathToCsv)
+            ui.showErrorMessage(errorMessage)
+        return None
+
     headerList = rowDataList[0]
     dataTupleList = list(zip(*rowDataList[1:]))
 
@@ -379,45 +1364,346 @@ def readCsv(pathToCsv, ui):
 
     return dataDict
 
+def detectCsvFormat(sample, encodingList):
+    """
+    Detect the encoding and csv dialect from the first bytes of a file.
+    A byte order mark takes precedence over the encodings in encodingList,
+    which are tried in order.
+
+    Returns:
+        an [encoding, dialect] list
+    """
+
+    encoding = None
+    for (bom, bomEncoding) in bomList:
+        if sample.startswith(bom):
+            encoding = bomEncoding
+            break
+
+    if encoding is not None:
+        text = sample.decode(encoding, errors='ignore')
+    else:
+        ## a multi-byte character can be cut off at the end of the sample
+        lastNewline = sample.rfind(b'\n')
+        if lastNewline > 0:
+            sample = sample[:lastNewline + 1]
+
+        for candidate in encodingList:
+            try:
+                text = sample.decode(candidate)
+            except UnicodeDecodeError:
+                continue
+            encoding = candidate
+            break
+        else:
+            raise UnicodeDecodeError(encodingList[-1], sample, 0, len(sample), 'no matching encoding')
+
+    ## drop the possibly incomplete last line of the sample
+    lineList = text.splitlines(True)
+    if len(lineList) > 1 and not lineList[-1].endswith(('\n', '\r')):
+        text = ''.join(lineList[:-1])
+
+    sniffer = csv.Sniffer()
+    try:
+        dialect = sniffer.sniff(text, delimiters=sniffDelimiters)
+    except csv.Error:
+        try:
+            dialect = sniffer.sniff(lineList[0] if lineList else text, delimiters=sniffDelimiters)
+        except csv.Error:
+            dialect = csv.get_dialect('excel')
+
+    return [encoding, dialect]
+
+def readCsvCompressed(pathToCsv, ui, formatCache=None):
+    """
+    Reads a csv file compressed with gzip or zstd, with the same result as
+    readCsv on the uncompressed file. The file is decompressed on a worker
+    thread while the rows are parsed. When the data does not match the
+    cached or detected format, the decompressed file is handed to readCsv,
+    which tries the other encodings.
+    """
+
+    conf_questionnaireprocessor = config['questionnaireprocessor']
+    encodingList = conf_questionnaireprocessor['csvEncodingList']
+    sampleSize   = int(conf_questionnaireprocessor['csvSampleSize'])
+
+    folder = os.path.dirname(pathToCsv)
+
+    try:
+        reader = DecompressingReader(pathToCsv)
+        try:
+            if formatCache is not None and folder in formatCache:
+                [encoding, dialect] = formatCache[folder]
+            else:
+                [encoding, dialect] = detectCsvFormat(reader.peekStart(sampleSize), encodingList)
+
+            textStream = io.TextIOWrapper(io.BufferedReader(reader), encoding=encoding, newline='')
+            rowDataList = parseCsvStream(textStream, dialect)
+        finally:
+            reader.close()
+
+        if rowDataList is None:
+            return readCsv(pathToCsv, ui, formatCache, readDecompressed(pathToCsv))
+
+    except Exception as e:
+        errorMessage = ("Cannot process csv file, unknown format, see the log file for more information")
+        logging.exception("Cannot process csv file: %s", e)
+        if ui is not None:
+            ui.showErrorMessage(errorMessage)
+        return None
+
+    if formatCache is not None and folder not in formatCache:
+        formatCache[folder] = [encoding, dialect]
+
+    return _rowsToDict(pathToCsv, rowDataList, ui)
+
+def parseCsvStream(textStream, dialect):
+    """
+    Parse the rows of a text stream, with the same checks as parseCsvData
+    """
+
+    def lineIterator():
+        first = True
+        for line in textStream:
+            if first and line.startswith('\ufeff'):
+                line = line[1:]
+            first = False
+            yield line
+
+    try:
+        rowDataList = list(csv.reader(lineIterator(), dialect=dialect))
+    except (UnicodeDecodeError, csv.Error):
+        return None
+
+    if not rowDataList or len(rowDataList[0]) < 2:
+        return None
+
+    nrColumns = len(rowDataList[0])
+    for row in rowDataList:
+        if len(row) < nrColumns:
+            return None
+
+    return rowDataList
+
+def parseCsvData(rawData, encoding, dialect):
+    """
+    Decode and parse the data of a csv file. Returns the list of rows, or None
+    when the data does not match the given encoding and dialect: it cannot be
+    decoded, the header has a single column or a row is shorter than the
+    header.
+    """
+
+    try:
+        text = rawData.decode(encoding)
+    except UnicodeDecodeError:
+        return None
+
+    if text.startswith('\ufeff'):
+        text = text[1:]
+
+    try:
+        rowDataList = list(csv.reader(io.StringIO(text, newline=''), dialect=dialect))
+    except csv.Error:
+        return None
+
+    if not rowDataList or len(rowDataList[0]) < 2:
+        return None
+
+    nrColumns = len(rowDataList[0])
+    for row in rowDataList:
+        if len(row) < nrColumns:
+            return None
+
+    return rowDataList
+
+
+def readCsvMapped(pathToCsv, ui, columnList, formatCache=None):
+    """
+    Reads only the columns in columnList from a (large) csv file. The file is
+    memory mapped and only the requested fields of each row are taken from
+    the buffer and decoded, so memory use depends on the requested columns
+    instead of the size of the file. The result is equal to the result of
+    readCsv restricted to columnList; columns that are not present in the
+    header are left out.
+
+    Files in a format the scanner does not handle (e.g. UTF-16 or an escape
+    character) are read with readCsv instead.
+    """
+
+    conf_questionnaireprocessor = config['questionnaireprocessor']
+    encodingList = conf_questionnaireprocessor['csvEncodingList']
+    sampleSize   = int(conf_questionnaireprocessor['csvSampleSize'])
+
+    folder = os.path.dirname(pathToCsv)
+
+    with open(pathToCsv, 'rb') as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            return readCsv(pathToCsv, ui, formatCache)
+
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+
+            if formatCache is not None and folder in formatCache:
+                [encoding, dialect] = formatCache[folder]
+            else:
+                try:
+                    [encoding, dialect] = detectCsvFormat(buffer[:sampleSize], encodingList)
+                except Exception:
+                    return readCsv(pathToCsv, ui, formatCache)
+
+            try:
+                dataDict = _scanMappedCsv(buffer, encoding, dialect, columnList)
+            except (_MappedFormatError, UnicodeDecodeError, csv.Error):
+                dataDict = None
+
+    if dataDict is None:
+        dataDict = readCsv(pathToCsv, ui, formatCache)
+        if dataDict is None:
+            return None
+        return dict((column, dataDict[column]) for column in columnList if column in dataDict)
+
+    if formatCache is not None and folder not in formatCache:
+        formatCache[folder] = [encoding, dialect]
+
+    return dataDict
+
+class _MappedFormatError(Exception):
+    """
+    Raised when the memory mapped scanner cannot read a file like readCsv
+    """
+    pass
 
-def writeCsv(pathToTsv, subjectCategoryDict, subjectResponseDict, fileNameList,
-             uniCategoryList, keyIdList, scoreTypeList, delimiter):
+class _MappedLineIterator(object):
+    """
+    Iterates over the decoded lines of a buffer from a position, keeping
+    track of the position after the last line read.
+    """
+    def __init__(self, buffer, position, encoding):
+        self.buffer = buffer
+        self.position = position
+        self.encoding = encoding
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.position >= len(self.buffer):
+            raise StopIteration
+        lineEnd = self.buffer.find(b'\n', self.position)
+        lineEnd = len(self.buffer) if lineEnd == -1 else lineEnd + 1
+        line = self.buffer[self.position:lineEnd]
+        self.position = lineEnd
+        return line.decode(self.encoding)
+
+def _scanMappedCsv(buffer, encoding, dialect, columnList):
     """
-    Write data to tsv
+    Extract the requested columns from a memory mapped csv file. Returns None
+    when a row is shorter than the header or there are no rows after the
+    header, like readCsv. Raises
+    _MappedFormatError when the file has to be read by readCsv.
     """
-    encoding = 'utf-8'
 
+    if encoding == 'utf-8-sig':
+        encoding = 'utf-8'
 
-    with open(pathToTsv, 'wt', newline='', encoding=encoding) as fp:
+    if getattr(dialect, 'escapechar', None) or dialect.quoting == csv.QUOTE_NONE:
+        raise _MappedFormatError
+    specialString = dialect.delimiter + (dialect.quotechar or '') + '\r\n '
+    try:
+        if specialString.encode(encoding) != specialString.encode('ascii'):
+            raise _MappedFormatError
+    except UnicodeEncodeError:
+        raise _MappedFormatError
+
+    delimiter = dialect.delimiter.encode(encoding)
+    quotechar = (dialect.quotechar or '"').encode(encoding)
+    skipInitialSpace = dialect.skipinitialspace
+
+    position = len(codecs.BOM_UTF8) if buffer[:len(codecs.BOM_UTF8)] == codecs.BOM_UTF8 else 0
+
+    lineIterator = _MappedLineIterator(buffer, position, encoding)
+    headerList = next(csv.reader(lineIterator, dialect=dialect))
+    position = lineIterator.position
+
+    nrColumns = len(headerList)
+    if nrColumns < 2:
+        return None
+
+    ## the last column with a given name wins, as in readCsv
+    columnIndexDict = {}
+    for index in range(nrColumns):
+        if headerList[index] in columnList:
+            columnIndexDict[headerList[index]] = index
+
+    indexList = sorted(set(columnIndexDict.values()))
+    maxIndex = indexList[-1] if indexList else 0
+    valueListDict = dict((index, []) for index in indexList)
+    nrRows = 0
+
+    size = len(buffer)
+    while position < size:
+        lineEnd = buffer.find(b'\n', position)
+        nextPosition = size if lineEnd == -1 else lineEnd + 1
+        line = buffer[position:nextPosition if lineEnd == -1 else lineEnd]
+        if line.endswith(b'\r'):
+            line = line[:-1]
+
+        if quotechar in line or b'\r' in line:
+            ## quoted fields can contain delimiters and newlines, use the csv module
+            lineIterator.position = position
+            row = next(csv.reader(lineIterator, dialect=dialect))
+            if len(row) < nrColumns:
+                return None
+            for index in indexList:
+                valueListDict[index].append(row[index])
+            nrRows += 1
+            position = lineIterator.position
+            continue
+
+        if not line:
+            ## an empty line is an empty row
+            return None
 
-        writer = csv.writer(fp, delimiter=delimiter)
+        fieldList = line.split(delimiter, maxIndex + 1)
+        if len(fieldList) + (fieldList[-1].count(delimiter) if len(fieldList) > maxIndex + 1 else 0) < nrColumns:
+            return None
 
-        catHeader = []
-        for cat in uniCategoryList:
-            for scoreType in scoreTypeList:
-                catHeader = catHeader + [cat + '_' + scoreType]
+        for index in indexList:
+            field = fieldList[index]
+            if skipInitialSpace:
+                field = field.lstrip(b' ')
+            valueListDict[index].append(field.decode(encoding))
 
-        responseHeader = []
-        for identity in keyIdList:
-            responseHeader = responseHeader + [identity]
+        nrRows += 1
+        position = nextPosition
 
-        header = ['Item'] + catHeader + responseHeader
+    ## a file with only a header has no data
+    if nrRows == 0:
+        return None
 
-        writer.writerow(header)
+    dataDict = {}
+    for column in columnIndexDict:
+        dataDict[column] = valueListDict[columnIndexDict[column]]
+    return dataDict
 
-        for dataFile in fileNameList:
-            categoryDict = subjectCategoryDict[dataFile]
-            score =[]
-            for category in uniCategoryList:
-                scoreDict = categoryDict[category]
+def loadDataFile(pathToCsv, ui, columnList, formatCache=None, rawData=None):
+    """
+    Read a data file, using the memory mapped reader for files larger than
+    the mmapThreshold in the config file (0 disables it). With rawData, the
+    contents of a file in an archive, the file itself is not read. Files
+    compressed with gzip or zstd are decompressed while they are parsed.
+    """
 
-                for scoreType in scoreTypeList:
-                    score.append(scoreDict[scoreType])
+    threshold = int(config['questionnaireprocessor']['mmapThreshold'])
 
-            responseDict = subjectResponseDict[dataFile]
-            responseList = []
-            for identity in keyIdList:
-                responseList.append(responseDict[identity])
+    codec = compressionOf(pathToCsv)
 
-            row = [dataFile]  +  score + responseList
-            writer.writerow(row)
\ No newline at end of file
+    if rawData is not None:
+        if codec is not None:
+            rawData = decompressData(rawData, codec)
+        return readCsv(pathToCsv, ui, formatCache, rawData)
+    elif codec is not None:
+        return readCsvCompressed(pathToCsv, ui, formatCache)
+    elif threshold and os.path.getsize(pathToCsv) >= threshold:
+        return readCsvMapped(pathToCsv, ui, columnList, formatCache)
+    else:
+        return readCsv(pathToCsv, ui, formatCache)
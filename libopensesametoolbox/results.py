@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import numpy as np
+
+
+class ScoreResults(object):
+    """
+    The scores of the files (subjects) of one group as arrays:
+
+        categoryScores  float array, files x categories x statistics
+        itemScores      float array, files x items
+        itemScoreText   the item scores as found in the log files, files x
+                        items, used where the text has to be kept as is
+
+    A score that is missing (a category or item the file does not have) is
+    NaN, or '' in itemScoreText. The labels of every axis are in files,
+    categories, statistics and items, with a dict from label to position
+    in fileIndex, categoryIndex, statisticIndex and itemIndex.
+    """
+    def __init__(self, group, files, categories, statistics, items, categoryScores, itemScores, itemScoreText):
+
+        self.group = group
+        self.files = list(files)
+        self.categories = list(categories)
+        self.statistics = list(statistics)
+        self.items = list(items)
+
+        self.categoryScores = categoryScores
+        self.itemScores = itemScores
+        self.itemScoreText = itemScoreText
+
+        self.fileIndex = _labelIndex(self.files)
+        self.categoryIndex = _labelIndex(self.categories)
+        self.statisticIndex = _labelIndex(self.statistics)
+        self.itemIndex = _labelIndex(self.items)
+
+    @classmethod
+    def fromDicts(cls, group, subjectCategoryDict, subjectResponseDict, fileNameList, uniCategoryList,
+                  keyIdList, scoreTypeList):
+        """
+        Build the arrays from the score dicts per file: the statistics per
+        category and the score per ID
+        """
+        categoryScores = np.full((len(fileNameList), len(uniCategoryList), len(scoreTypeList)), np.nan)
+        itemScoreText = np.full((len(fileNameList), len(keyIdList)), '', dtype=object)
+
+        for fileNr, dataFile in enumerate(fileNameList):
+            categoryDict = subjectCategoryDict[dataFile]
+            for categoryNr, category in enumerate(uniCategoryList):
+                scoreDict = categoryDict.get(category)
+                if scoreDict is None:
+                    continue
+                for statisticNr, scoreType in enumerate(scoreTypeList):
+                    if scoreType in scoreDict:
+                        categoryScores[fileNr, categoryNr, statisticNr] = scoreDict[scoreType]
+
+            responseDict = subjectResponseDict[dataFile]
+            for itemNr, identity in enumerate(keyIdList):
+                itemScoreText[fileNr, itemNr] = responseDict.get(identity, '')
+
+        itemScores = np.full(itemScoreText.shape, np.nan)
+        for index, text in np.ndenumerate(itemScoreText):
+            try:
+                itemScores[index] = float(text)
+            except ValueError:
+                pass
+
+        return cls(group, fileNameList, uniCategoryList, scoreTypeList, keyIdList,
+                   categoryScores, itemScores, itemScoreText)
+
+    @classmethod
+    def fromRecords(cls, group, recordList, scoreTypeList):
+        """
+        Build the results of a group from the records of its scored files.
+        The categories and items are taken from the last record, as the
+        files are scored in order.
+        """
+        subjectCategoryDict = {}
+        subjectResponseDict = {}
+        fileNameList = []
+
+        for record in recordList:
+            fileNameList.append(record['file'])
+            subjectCategoryDict[record['file']] = record['categories']
+            subjectResponseDict[record['file']] = record['scores']
+
+        lastRecord = recordList[-1]
+
+        return cls.fromDicts(group, subjectCategoryDict, subjectResponseDict, sorted(fileNameList),
+                             sorted(lastRecord['categories']), sorted(lastRecord['ids']), scoreTypeList)
+
+    def categoryScore(self, dataFile, category, statistic):
+        """
+        A single category statistic of a file
+        """
+        return self.categoryScores[self.fileIndex[dataFile], self.categoryIndex[category],
+                                   self.statisticIndex[statistic]]
+
+    def itemScore(self, dataFile, item):
+        """
+        The score of a single item of a file
+        """
+        return self.itemScores[self.fileIndex[dataFile], self.itemIndex[item]]
+
+    def categoryDataFrame(self):
+        """
+        The category statistics as a pandas DataFrame with a file index and
+        (category, statistic) columns. The data is not copied.
+        """
+        import pandas as pd
+
+        columns = pd.MultiIndex.from_product([self.categories, self.statistics],
+                                             names=['category', 'statistic'])
+        data = self.categoryScores.reshape(len(self.files), len(self.categories) * len(self.statistics))
+        return pd.DataFrame(data, index=pd.Index(self.files, name='file'), columns=columns, copy=False)
+
+    def itemDataFrame(self):
+        """
+        The item scores as a pandas DataFrame with a file index and an item
+        column per ID. The data is not copied.
+        """
+        import pandas as pd
+
+        return pd.DataFrame(self.itemScores, index=pd.Index(self.files, name='file'),
+                            columns=pd.Index(self.items, name='item'), copy=False)
+
+def _labelIndex(labelList):
+    return dict((label, index) for index, label in enumerate(labelList))
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import os
+import csv
+import json
+import time
+import random
+import socket
+import threading
+import collections
+
+from configobj import ConfigObj
+
+from libopensesametoolbox.io_tools import getResourceLoc
+
+config = ConfigObj(getResourceLoc('opensesame-toolbox.conf'))
+
+## the ways the experiments of a battery can be ordered
+orderList = ['fixed', 'latin', 'random']
+
+RosterJob = collections.namedtuple('RosterJob', ['jobId', 'subject', 'language', 'session', 'experiments'])
+
+
+def loadRoster(pathToCsv, order=None, seed=None):
+    """
+    Load a roster and expand it into jobs, in the order of the roster. The
+    csv file has a subject, language, session and battery column, the
+    battery lists the experiments separated by ';'. An optional order column
+    overrides the order of the experiments (fixed, latin or random) for a
+    row; by default rosterOrder and rosterSeed of the config file are used.
+
+    Raises:
+        ValueError when the roster cannot be read
+    """
+    conf_experimentmanager = config['experimentmanager']
+    if order is None:
+        order = conf_experimentmanager['rosterOrder']
+    if seed is None:
+        seed = conf_experimentmanager['rosterSeed']
+
+    try:
+        with open(pathToCsv, 'rt', newline='', encoding='utf-8-sig') as fp:
+            sample = fp.read(65536)
+            fp.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+            rowList = list(csv.DictReader(fp, dialect=dialect))
+    except (OSError, UnicodeDecodeError) as e:
+        raise ValueError("Cannot read roster " + pathToCsv + ": " + str(e))
+
+    jobList = []
+    jobIdSet = set()
+    subjectIndexDict = {}
+
+    for lineNr, row in enumerate(rowList, 2):
+        row = dict((str(key).strip().lower(), (value or '').strip()) for key, value in row.items() if key is not None)
+
+        for column in ['subject', 'language', 'battery']:
+            if not row.get(column):
+                raise ValueError("Roster " + pathToCsv + ", line " + str(lineNr) + " has no " + column)
+
+        subject = row['subject']
+        if not subject.isdigit():
+            raise ValueError("Roster " + pathToCsv + ", line " + str(lineNr) + ": subject " + subject +
+                             " is not an integer")
+
+        session = row.get('session', '')
+        jobId = subject + ('-' + session if session else '')
+        if jobId in jobIdSet:
+            raise ValueError("Roster " + pathToCsv + ", line " + str(lineNr) + ": subject " + subject +
+                             " and session " + session + " are already in the roster")
+        jobIdSet.add(jobId)
+
+        rowOrder = row.get('order') or order
+        if rowOrder not in orderList:
+            raise ValueError("Roster " + pathToCsv + ", line " + str(lineNr) + ": unknown order " + rowOrder)
+
+        subjectIndex = subjectIndexDict.setdefault(subject, len(subjectIndexDict))
+        experimentList = [experiment.strip() for experiment in row['battery'].split(';') if experiment.strip()]
+        experimentList = orderBattery(experimentList, rowOrder, subjectIndex, str(seed) + '-' + jobId)
+
+        jobList.append(RosterJob(jobId, subject, row['language'], session, experimentList))
+
+    return jobList
+
+def orderBattery(experimentList, order, subjectIndex, seed):
+    """
+    The experiments of a battery in the order for a subject: as listed
+    (fixed), counterbalanced with a balanced Latin square on the position of
+    the subject in the roster (latin) or shuffled with a generator seeded
+    with seed (random), so the order is the same every time the roster is
+    loaded
+    """
+    if order == 'latin':
+        return [experimentList[index] for index in latinSquareRow(len(experimentList), subjectIndex)]
+    elif order == 'random':
+        experimentList = list(experimentList)
+        random.Random(seed).shuffle(experimentList)
+        return experimentList
+    return list(experimentList)
+
+def latinSquareRow(size, rowNr):
+    """
+    A row of a balanced Latin square (Williams design) of the given size,
+    every position follows every other position equally often. For an odd
+    size the square has 2 * size rows, the second half mirrored.
+    """
+    if size == 0:
+        return []
+    nrRows = size if size % 2 == 0 else 2 * size
+    rowNr = rowNr % nrRows
+
+    firstRow = [(index + 1) // 2 if index % 2 == 1 else (size - index // 2) % size for index in range(size)]
+    row = [(position + rowNr) % size for position in firstRow]
+    if rowNr >= size:
+        row.reverse()
+    return row
+
+
+class RosterScheduler(object):
+    """
+    Hands out the jobs of a roster to the stations that run them. The state
+    is kept in a folder next to the roster (<roster>.state): a station claims
+    a job by creating its .claim file, which fails when another station was
+    first, and marks it done with a .done file. Progress is therefore kept
+    between sessions and shared by all stations that use the same roster.
+    A job claimed by this station that was not finished (e.g. after a crash)
+    is handed out again to this station.
+
+    While a station runs a job it touches the claim every third of
+    claimTimeout seconds (rosterClaimTimeout in the config file). A claim
+    that was not touched for claimTimeout seconds belongs to a station that
+    crashed or was switched off, and another station takes the job over,
+    so the roster can still be finished. A claimTimeout of 0 keeps claims
+    forever.
+    """
+    def __init__(self, rosterPath, station=None, order=None, seed=None, claimTimeout=None):
+
+        self.rosterPath = rosterPath
+        self.station = station or socket.gethostname()
+        self.jobList = loadRoster(rosterPath, order, seed)
+        self.stateFolder = rosterPath + '.state'
+        os.makedirs(self.stateFolder, exist_ok=True)
+
+        if claimTimeout is None:
+            claimTimeout = float(config['experimentmanager']['rosterClaimTimeout'])
+        self.claimTimeout = claimTimeout
+        self.heartbeat = None
+
+    def nextJob(self):
+        """
+        Claim the next job of the roster, None when all jobs are done or
+        claimed by other stations
+        """
+        for job in self.jobList:
+            if os.path.exists(self._statePath(job, 'done')):
+                continue
+
+            claimPath = self._statePath(job, 'claim')
+            try:
+                fd = os.open(claimPath, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self._claimStation(claimPath) == self.station:
+                    self._startHeartbeat(job)
+                    return job
+                if not self._takeOverStaleClaim(claimPath):
+                    continue
+                try:
+                    fd = os.open(claimPath, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                except FileExistsError:
+                    continue
+
+            with os.fdopen(fd, 'wt', encoding='utf-8') as fp:
+                json.dump({'station': self.station, 'time': time.time()}, fp)
+            self._startHeartbeat(job)
+            return job
+
+        return None
+
+    def finishJob(self, job, success):
+        """
+        Mark a job as done, or release it for another try when it failed
+        """
+        self._stopHeartbeat()
+        if success:
+            temporaryPath = self._statePath(job, 'done') + '.tmp'
+            with open(temporaryPath, 'wt', encoding='utf-8') as fp:
+                json.dump({'station': self.station, 'time': time.time(), 'experiments': job.experiments}, fp)
+            os.replace(temporaryPath, self._statePath(job, 'done'))
+        else:
+            try:
+                os.remove(self._statePath(job, 'claim'))
+            except FileNotFoundError:
+                pass
+
+    def progress(self):
+        """
+        The number of jobs that are done and the total number of jobs
+        """
+        doneCount = len([job for job in self.jobList if os.path.exists(self._statePath(job, 'done'))])
+        return [doneCount, len(self.jobList)]
+
+    def _takeOverStaleClaim(self, claimPath):
+        """
+        Remove the claim of another station when it is stale. The claim is
+        first renamed, which only one station can do, and put back when it
+        turns out to be touched after all.
+
+        Returns:
+            True when the job can be claimed
+        """
+        if not self.claimTimeout:
+            return False
+        try:
+            if time.time() - os.path.getmtime(claimPath) < self.claimTimeout:
+                return False
+        except FileNotFoundError:
+            return True
+
+        stalePath = claimPath + '.stale-' + self.station + '-' + str(os.getpid())
+        try:
+            os.rename(claimPath, stalePath)
+        except FileNotFoundError:
+            return False
+
+        if time.time() - os.path.getmtime(stalePath) < self.claimTimeout:
+            ## another station took the job over in the meantime
+            try:
+                os.link(stalePath, claimPath)
+            except OSError:
+                pass
+            os.remove(stalePath)
+            return False
+
+        print("Taking over job " + os.path.basename(claimPath) + " of station " +
+              str(self._claimStation(stalePath)) + ", its claim is older than " + "%g" % self.claimTimeout + " s")
+        os.remove(stalePath)
+        return True
+
+    def _startHeartbeat(self, job):
+        """
+        Touch the claim of a job on a thread until the job is finished, so
+        other stations do not take it over while it runs
+        """
+        self._stopHeartbeat()
+        if not self.claimTimeout:
+            return
+
+        claimPath = self._statePath(job, 'claim')
+        stopEvent = threading.Event()
+
+        def touchClaim():
+            while not stopEvent.wait(self.claimTimeout / 3):
+                if self._claimStation(claimPath) != self.station:
+                    return
+                try:
+                    os.utime(claimPath)
+                except OSError:
+                    return
+
+        thread = threading.Thread(target=touchClaim, name='roster-heartbeat', daemon=True)
+        thread.start()
+        self.heartbeat = [stopEvent, thread]
+
+    def _stopHeartbeat(self):
+        if self.heartbeat is not None:
+            [stopEvent, thread] = self.heartbeat
+            stopEvent.set()
+            thread.join()
+            self.heartbeat = None
+
+    def _statePath(self, job, kind):
+        return os.path.join(self.stateFolder, 'job-' + job.jobId + '.' + kind)
+
+    def _claimStation(self, claimPath):
+        try:
+            with open(claimPath, 'rt', encoding='utf-8') as fp:
+                return json.load(fp).get('station')
+        except (OSError, ValueError):
+            return None
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import os
+import sys
+
+from PyQt5 import QtCore
+from configobj import ConfigObj
+
+from libopensesametoolbox.io_tools import getResourceLoc
+from libopensesametoolbox.questionnaireprocessor import buildManifest
+from libopensesametoolbox.integrity import manifestPath, loadManifest
+
+config = ConfigObj(getResourceLoc('opensesame-toolbox.conf'))
+
+
+class ScoreWatcher(QtCore.QObject):
+    """
+    Watches a data folder and rescores the folders (groups) in which log
+    files were added, changed or removed. The folder is checked
+    watchDebounce seconds after a change, and also every watchInterval
+    seconds, for file systems that do not report changes (e.g. network
+    shares).
+
+    A log file is only scored when it is complete: a group is scored when
+    the size and modification time of its files are the same at two checks
+    in a row, and in a folder with an integrity manifest (written by the
+    Experiment Manager when an experiment has finished) a new log is left
+    out until it is recorded in the manifest.
+
+    scoreGroups is called with the manifest of the complete files (see
+    buildManifest) and the list of group names to score, so the processor
+    does not list the data folder again; on start the group list is None,
+    to score all groups.
+    """
+    def __init__(self, dataFolder, scoreGroups, maxDepth=None, parent=None):
+
+        super(ScoreWatcher, self).__init__(parent)
+
+        conf_questionnaireprocessor = config['questionnaireprocessor']
+
+        self.dataFolder = dataFolder
+        self.scoreGroups = scoreGroups
+        self.dataExtList = conf_questionnaireprocessor['dataExtList']
+        if maxDepth is None:
+            maxDepth = int(conf_questionnaireprocessor['maxDepth'])
+        self.maxDepth = maxDepth
+
+        ## group name -> the (relative path, size, mtime) of the files it was scored with
+        self.scoredSnapshot = {}
+        ## relative path -> (size, mtime) of every data file at the last check
+        self.lastSeenDict = {}
+
+        self.watcher = QtCore.QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.onChanged)
+
+        self.debounceTimer = QtCore.QTimer(self)
+        self.debounceTimer.setSingleShot(True)
+        self.debounceTimer.setInterval(int(float(conf_questionnaireprocessor['watchDebounce']) * 1000))
+        self.debounceTimer.timeout.connect(self.check)
+
+        self.pollTimer = QtCore.QTimer(self)
+        self.pollTimer.setInterval(int(float(conf_questionnaireprocessor['watchInterval']) * 1000))
+        self.pollTimer.timeout.connect(self.onChanged)
+
+    def start(self):
+        """
+        Score all groups and start watching
+        """
+        manifest = self.listDataFolder()
+        if manifest is not None:
+            ## logs of experiments that are still running are left out, like in check
+            completeManifest = self.completeManifestOf(manifest)
+            self.scoredSnapshot = dict((group.name, snapshotOf(group)) for group in completeManifest)
+            self.lastSeenDict = lastSeenOf(manifest)
+            self.scoreGroups(completeManifest, None)
+        self.watchFolders()
+        self.pollTimer.start()
+        print("Watching " + self.dataFolder + " for new log files, press Ctrl+C to stop")
+
+    def onChanged(self, path=None):
+        """
+        (Re)start the debounce timer, the folder is checked when it expires
+        """
+        self.debounceTimer.start()
+
+    def check(self):
+        """
+        Score the groups of which the complete files changed since they were
+        scored. A group with files that are still being written is checked
+        again after the debounce interval.
+        """
+        manifest = self.listDataFolder()
+        if manifest is None:
+            self.watchFolders()
+            return
+
+        completeManifest = self.completeManifestOf(manifest)
+        changedGroupList = []
+        changing = False
+        for [group, completeGroup] in zip(manifest, completeManifest):
+            if any(self.lastSeenDict.get(entry.relativePath) != (entry.size, entry.mtime)
+                   for entry in group.entries if entry.archive is None):
+                changing = True
+            elif snapshotOf(completeGroup) != self.scoredSnapshot.get(group.name):
+                changedGroupList.append(group.name)
+        self.lastSeenDict = lastSeenOf(manifest)
+
+        if changedGroupList:
+            print("Scoring changed folder(s): " + ', '.join(name or '.' for name in changedGroupList))
+            self.scoreGroups(completeManifest, changedGroupList)
+            for group in completeManifest:
+                if group.name in changedGroupList:
+                    self.scoredSnapshot[group.name] = snapshotOf(group)
+
+        if changing:
+            self.debounceTimer.start()
+
+        self.watchFolders()
+
+    def listDataFolder(self):
+        """
+        The manifest of the data folder, None when it cannot be scored (two
+        folders with the same group name) until the folders are renamed
+        """
+        try:
+            return buildManifest(self.dataFolder, self.dataExtList, self.maxDepth)
+        except ValueError as e:
+            print("Error: " + str(e), file=sys.stderr)
+            return None
+
+    def completeManifestOf(self, manifest):
+        """
+        The manifest with only the complete logs of every group, see
+        recordedEntries
+        """
+        return [group._replace(entries=self.recordedEntries(group)) for group in manifest]
+
+    def recordedEntries(self, group):
+        """
+        The entries of a group without the logs of experiments that are
+        still running, when the folder has an integrity manifest: a log that
+        is not recorded in it and changed after its last record. Logs from
+        before the manifest was used are kept. A log recorded later changes
+        the folder, which triggers a check.
+        """
+        try:
+            manifestTime = os.path.getmtime(manifestPath(group.folder))
+        except OSError:
+            return group.entries
+        integrityDict = loadManifest(group.folder)
+        return [entry for entry in group.entries
+                if entry.archive is not None or os.path.basename(entry.path) in integrityDict or
+                entry.mtime <= manifestTime]
+
+    def watchFolders(self):
+        """
+        Watch the data folder and its subfolders up to maxDepth, including
+        folders created since the last check
+        """
+        folderList = []
+        rootDepth = os.path.abspath(self.dataFolder).rstrip(os.sep).count(os.sep)
+        for [folder, subFolderList, fileList] in os.walk(os.path.abspath(self.dataFolder)):
+            folderList.append(folder)
+            if folder.count(os.sep) - rootDepth >= self.maxDepth:
+                del subFolderList[:]
+
+        watchedSet = set(self.watcher.directories())
+        newFolderList = [folder for folder in folderList if folder not in watchedSet]
+        if newFolderList:
+            self.watcher.addPaths(newFolderList)
+
+def snapshotOf(group):
+    """
+    The files of a group with their size and modification time
+    """
+    return frozenset((entry.relativePath, entry.size, entry.mtime) for entry in group.entries)
+
+def lastSeenOf(manifest):
+    """
+    The size and modification time of every data file in the manifest
+    """
+    return dict((entry.relativePath, (entry.size, entry.mtime)) for group in manifest for entry in group.entries)
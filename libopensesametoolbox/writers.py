@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import io
+import os
+import csv
+import json
+import sqlite3
+import importlib.util
+
+import numpy as np
+
+from libopensesametoolbox.results import ScoreResults
+from libopensesametoolbox.publish import atomicOpen, atomicPath, temporaryPathOf
+
+## result formats written as delimited text
+textFormatList = ['tsv', 'csv', 'txt']
+
+
+def getResultWriter(resultExt):
+    """
+    The writer for a result format (the resultExt in the config file).
+    A writer is called as writer(path, results, delimiter) and returns the
+    paths of the files it wrote. Every file is written under a temporary
+    name and renamed when complete, see the publish module.
+
+    Raises:
+        ValueError when the format is unknown or needs a package that is not
+        installed
+    """
+    resultExt = resultExt.lower()
+
+    if resultExt in textFormatList:
+        return writeResultsTsv
+    elif resultExt == 'npz':
+        return writeResultsNpz
+    elif resultExt in ('sqlite', 'db'):
+        return writeResultsSqlite
+    elif resultExt == 'parquet':
+        if importlib.util.find_spec('pyarrow') is None:
+            raise ValueError("The parquet result format needs the pyarrow package")
+        return writeResultsParquet
+    else:
+        raise ValueError("Unknown result format: " + resultExt)
+
+def reportExt(resultExt):
+    """
+    The extension of the text reports next to the results, the result
+    format itself when that is text
+    """
+    if resultExt.lower() in textFormatList:
+        return resultExt
+    return 'tsv'
+
+def writeCsv(pathToTsv, subjectCategoryDict, subjectResponseDict, fileNameList,
+             uniCategoryList, keyIdList, scoreTypeList, delimiter):
+    """
+    Write data to tsv
+    """
+    results = ScoreResults.fromDicts('', subjectCategoryDict, subjectResponseDict, fileNameList,
+                                     uniCategoryList, keyIdList, scoreTypeList)
+    writeResultsTsv(pathToTsv, results, delimiter)
+
+def writeResultsTsv(pathToTsv, results, delimiter):
+    """
+    Write the ScoreResults of a group to tsv, one row per file with the
+    statistics per category followed by the score per ID
+    """
+    encoding = 'utf-8'
+
+    with atomicOpen(pathToTsv, 'wt', newline='', encoding=encoding) as fp:
+
+        writer = csv.writer(fp, delimiter=delimiter)
+
+        writer.writerow(_tsvHeader(results))
+        writer.writerows(_tsvRows(results))
+
+    return [pathToTsv]
+
+def appendResultsTsv(pathToTsv, results, delimiter):
+    """
+    Append the rows of the ScoreResults to a tsv, the header is written when
+    the file is new. Only the header of an existing file is read, so an
+    append takes the same time however long the file is. The rows are
+    written at once and synced; processes that append to the same file take
+    the lock of its folder, see the publish module.
+
+    Raises:
+        ValueError when the existing file has other columns
+    """
+    header = _tsvHeader(results)
+
+    text = io.StringIO()
+    writer = csv.writer(text, delimiter=delimiter)
+
+    with open(pathToTsv, 'a+b') as fp:
+        fp.seek(0)
+        headerLine = fp.readline()
+        if headerLine:
+            existingHeader = next(csv.reader([headerLine.decode('utf-8')], delimiter=delimiter), [])
+            if existingHeader != header:
+                raise ValueError(pathToTsv + " has other columns than the scores to add")
+            ## a row cut off by a crash is ended, so the new rows start on a line of their own
+            fp.seek(-1, os.SEEK_END)
+            if fp.read(1) != b'\n':
+                text.write('\r\n')
+        else:
+            writer.writerow(header)
+
+        writer.writerows(_tsvRows(results))
+        fp.write(text.getvalue().encode('utf-8'))
+        fp.flush()
+        os.fsync(fp.fileno())
+
+    return [pathToTsv]
+
+def _tsvHeader(results):
+    return ['Item'] + _categoryColumnList(results) + results.items
+
+def _tsvRows(results):
+    """
+    The rows of the tsv, the statistics per category and the score per ID of
+    every file
+    """
+    categoryScores = results.categoryScores.reshape(len(results.files), -1)
+
+    for fileNr, dataFile in enumerate(results.files):
+        score = [formatScore(value) for value in categoryScores[fileNr]]
+
+        row = [dataFile]  +  score + list(results.itemScoreText[fileNr])
+        yield row
+
+def writeResultsNpz(pathToNpz, results, delimiter=None):
+    """
+    Write the score arrays to a NumPy .npz file and their labels to a JSON
+    sidecar file next to it (<name>.labels.json)
+    """
+    with atomicOpen(pathToNpz, 'wb') as fp:
+        np.savez(fp, categoryScores=results.categoryScores, itemScores=results.itemScores)
+
+    labelPath = os.path.splitext(pathToNpz)[0] + '.labels.json'
+    labelDict = {'group': results.group, 'files': results.files, 'categories': results.categories,
+                 'statistics': results.statistics, 'items': results.items}
+    with atomicOpen(labelPath, 'wt', encoding='utf-8') as fp:
+        json.dump(labelDict, fp, ensure_ascii=False, indent=1)
+
+    return [pathToNpz, labelPath]
+
+def writeResultsSqlite(pathToDb, results, delimiter=None):
+    """
+    Write the scores to an SQLite database with a category_scores table (one
+    row per file, category and statistic) and an item_scores table (one row
+    per file and item). An existing database is replaced.
+    """
+    with atomicPath(pathToDb) as temporaryPath:
+        _writeSqlite(temporaryPath, results)
+
+    return [pathToDb]
+
+def _writeSqlite(pathToDb, results):
+
+    if os.path.exists(pathToDb):
+        os.remove(pathToDb)
+
+    connection = sqlite3.connect(pathToDb)
+    try:
+        with connection:
+            connection.execute("CREATE TABLE category_scores (file TEXT, category TEXT, statistic TEXT, "
+                               "score REAL, PRIMARY KEY (file, category, statistic))")
+            connection.execute("CREATE TABLE item_scores (file TEXT, item TEXT, score REAL, score_text TEXT, "
+                               "PRIMARY KEY (file, item))")
+
+            categoryRowList = []
+            for [fileNr, categoryNr, statisticNr], value in np.ndenumerate(results.categoryScores):
+                if not np.isnan(value):
+                    categoryRowList.append((results.files[fileNr], results.categories[categoryNr],
+                                            results.statistics[statisticNr], float(value)))
+            connection.executemany("INSERT INTO category_scores VALUES (?, ?, ?, ?)", categoryRowList)
+
+            itemRowList = []
+            for [fileNr, itemNr], text in np.ndenumerate(results.itemScoreText):
+                if text != '':
+                    value = results.itemScores[fileNr, itemNr]
+                    itemRowList.append((results.files[fileNr], results.items[itemNr],
+                                        None if np.isnan(value) else float(value), text))
+            connection.executemany("INSERT INTO item_scores VALUES (?, ?, ?, ?)", itemRowList)
+    finally:
+        connection.close()
+
+def writeResultsParquet(pathToParquet, results, delimiter=None):
+    """
+    Write the scores to a Parquet file with the same columns as the tsv, the
+    scores as float64
+    """
+    import pyarrow
+    import pyarrow.parquet
+
+    arrayList = [pyarrow.array(results.files, type=pyarrow.string())]
+
+    categoryScores = results.categoryScores.reshape(len(results.files), -1)
+    for columnNr in range(categoryScores.shape[1]):
+        arrayList.append(pyarrow.array(categoryScores[:, columnNr], from_pandas=True))
+
+    for itemNr in range(len(results.items)):
+        arrayList.append(pyarrow.array(results.itemScores[:, itemNr], from_pandas=True))
+
+    nameList = ['Item'] + _categoryColumnList(results) + results.items
+    with atomicPath(pathToParquet) as temporaryPath:
+        pyarrow.parquet.write_table(pyarrow.Table.from_arrays(arrayList, names=nameList), temporaryPath)
+
+    return [pathToParquet]
+
+class LongResultsWriter(object):
+    """
+    Writes scores in long format, a row per file, item and category with
+    the response and its score, one file at a time. An item in several
+    categories has a row for each of them. The rows are written to a
+    temporary file that is published when the writer is closed.
+    """
+    def __init__(self, pathToTsv, delimiter):
+
+        self.path = pathToTsv
+        self.temporaryPath = temporaryPathOf(pathToTsv)
+        self.fp = open(self.temporaryPath, 'wt', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.fp, delimiter=delimiter)
+        self.writer.writerow(['File', 'Item', 'Category', 'Response', 'Score'])
+
+    def writeRecord(self, record):
+        """
+        Write the rows of the record of a scored file
+        """
+        scoreDict = record['scores']
+        itemDict = record.get('items', {})
+
+        for identity in sorted(scoreDict):
+            [response, categoryList] = itemDict.get(identity, ['', ['']])
+            for category in categoryList:
+                self.writer.writerow([record['file'], identity, category, response, scoreDict[identity]])
+
+    def close(self):
+        """
+        Publish the file
+        """
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+        self.fp.close()
+        os.replace(self.temporaryPath, self.path)
+
+    def discard(self):
+        """
+        Remove the rows written so far, e.g. when the run is stopped; a file
+        published before is left as it is
+        """
+        self.fp.close()
+        os.remove(self.temporaryPath)
+
+def _categoryColumnList(results):
+    """
+    Column names of the category statistics: <category>_<statistic>
+    """
+    catHeader = []
+    for cat in results.categories:
+        for scoreType in results.statistics:
+            catHeader.append(cat + '_' + scoreType)
+    return catHeader
+
+def formatScore(value):
+    """
+    Format a score statistic as text, the way numpy prints a float64; a
+    missing (NaN) statistic is left empty
+    """
+    if isinstance(value, str):
+        return value
+    if np.isnan(value):
+        return ''
+    return str(np.float64(value))
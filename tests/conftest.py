@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import csv
+import os
+import sys
+
+import pytest
+
+## the tests run on the source tree, without a display
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+logHeader = ['subject_nr', 'id', 'response', 'category', 'answer_options', 'answer_options_scores',
+             'question_text', 'age', 'sex']
+
+## the questionnaire of the test logs: id, category, answer options and their scores
+itemList = [['1', 'BIS', 'No;Maybe;Yes', '0;1;2'],
+            ['2', 'BAS', 'No;Maybe;Yes', '0;1;2'],
+            ['3', 'BIS;BAS', 'No;Maybe;Yes', '0;1;2'],
+            ['4', 'BAS', 'No;Maybe;Yes', '2;1;0']]
+
+answerList = ['No', 'Maybe', 'Yes']
+
+
+def writeLog(path, subjectNr, responseList, age=21, sex='f', delimiter=',', extraColumns=None):
+    """
+    Write the log of a subject with a response per item of itemList;
+    extraColumns maps a column name to a value per item
+    """
+    extraColumns = extraColumns or {}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wt', newline='', encoding='utf-8') as fp:
+        writer = csv.writer(fp, delimiter=delimiter)
+        writer.writerow(logHeader + list(extraColumns))
+        for index, [identity, category, answers, scores] in enumerate(itemList):
+            writer.writerow([subjectNr, identity, responseList[index], category, answers, scores,
+                             'Question ' + identity + ', "quoted"', age, sex] +
+                            [extraColumns[column][index] for column in extraColumns])
+    return path
+
+
+@pytest.fixture
+def dataFolder(tmp_path):
+    """
+    A data folder with two groups (experiments) of five subjects each
+    """
+    folder = tmp_path / 'data'
+    for groupNr, groupName in enumerate(['expA', 'expB']):
+        for subjectNr in range(1, 6):
+            responseList = [answerList[(subjectNr * (index + 2) + groupNr) % 3] for index in range(len(itemList))]
+            writeLog(str(folder / groupName / ('subject-' + str(subjectNr) + '.csv')), subjectNr, responseList,
+                     age=20 + subjectNr, sex='f' if subjectNr % 2 else 'm')
+    return str(folder)
+
+
+def processData(dataFolder, destinationFolder, **kwargs):
+    """
+    Score a data folder with the column names of the test logs
+    """
+    from libopensesametoolbox.questionnaireprocessor import QuestionnaireProcessor
+
+    return QuestionnaireProcessor(dataFolder, destinationFolder, 'response', 'id', 'category', 'answer_options',
+                                  'answer_options_scores', None, None, None, None, False, True, **kwargs)
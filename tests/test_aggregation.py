@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from libopensesametoolbox import aggregation
+from libopensesametoolbox.aggregation import categoryScoreArray, aggregate, unknownAggregations, registerAggregation
+from libopensesametoolbox.instrumentation import createInstrumentation
+from libopensesametoolbox.questionnaireprocessor import scoreDataFile, DataFileError
+
+allScoreTypeList = ['Sum', 'Mean', 'SD', 'Median', 'Min', 'Max', 'Count', 'Missing']
+
+
+def test_categoryScoreArray():
+    [scoreArray, sizeArray] = categoryScoreArray([1, 0, 1, 2, 1], [1.0, 2.0, np.nan, 4.0, 5.0], 4)
+    assert sizeArray.tolist() == [1, 3, 1, 0]
+    np.testing.assert_array_equal(scoreArray, [[2, np.nan, np.nan],
+                                               [1, np.nan, 5],
+                                               [4, np.nan, np.nan],
+                                               [np.nan, np.nan, np.nan]])
+
+
+def test_aggregate_matches_numpy():
+    categoryScoreList = [[1.0, 2.0, 4.0], [3.0, np.nan, 5.0, 7.0], [np.nan, np.nan], [6.0]]
+    categoryIndexList = [index for index in range(4) for score in categoryScoreList[index]]
+    scoreList = [score for scores in categoryScoreList for score in scores]
+
+    [scoreArray, sizeArray] = categoryScoreArray(categoryIndexList, scoreList, 4)
+    resultDict = aggregate(scoreArray, sizeArray, allScoreTypeList)
+
+    for index, scores in enumerate(categoryScoreList[:2]):
+        validArray = np.array([score for score in scores if not np.isnan(score)])
+        assert resultDict['Sum'][index] == validArray.sum()
+        assert resultDict['Mean'][index] == pytest.approx(validArray.mean())
+        assert resultDict['SD'][index] == pytest.approx(validArray.std(ddof=1))
+        assert resultDict['Median'][index] == np.median(validArray)
+        assert resultDict['Min'][index] == validArray.min()
+        assert resultDict['Max'][index] == validArray.max()
+        assert resultDict['Count'][index] == len(validArray)
+        assert resultDict['Missing'][index] == len(scores) - len(validArray)
+
+    ## a category without valid scores: the statistics are NaN, the counts are not
+    for scoreType in ['Sum', 'Mean', 'SD', 'Median', 'Min', 'Max']:
+        assert np.isnan(resultDict[scoreType][2])
+    assert [resultDict['Count'][2], resultDict['Missing'][2]] == [0, 2]
+
+    ## the SD of a single score is NaN
+    assert np.isnan(resultDict['SD'][3])
+    assert resultDict['Sum'][3] == 6.0
+
+
+def test_registerAggregation(monkeypatch):
+    monkeypatch.setattr(aggregation, 'aggregationDict', OrderedDict(aggregation.aggregationDict))
+    registerAggregation('Range', lambda scoreArray, sizeArray:
+                        np.nanmax(scoreArray, axis=1) - np.nanmin(scoreArray, axis=1))
+    assert unknownAggregations(['Sum', 'Range', 'Mode']) == ['Mode']
+
+    [scoreArray, sizeArray] = categoryScoreArray([0, 0, 0], [1.0, 4.0, 2.0], 1)
+    assert aggregate(scoreArray, sizeArray, ['Range'])['Range'].tolist() == [3.0]
+
+
+def makeDataDict(responseList, scoreList, categoryList):
+    nrItems = len(responseList)
+    return {'response': responseList,
+            'id': [str(index + 1) for index in range(nrItems)],
+            'category': categoryList,
+            'answer_options': ['No;Maybe;Yes'] * nrItems,
+            'answer_options_scores': scoreList}
+
+
+def scoreData(dataDict, scoreTypeList):
+    return scoreDataFile(dataDict, 'response', 'id', 'category', 'answer_options', 'answer_options_scores',
+                         None, None, None, None, False, True, createInstrumentation('Test'), scoreTypeList)
+
+
+def test_scoreDataFile_statistics():
+    dataDict = makeDataDict(['Yes', 'Maybe', 'No', 'yes'], ['0;1;2', '0;1;2', ';1;2', '2;1;0'],
+                            ['BIS', 'BIS;BAS', 'BAS', 'BAS:2'])
+    [individualScoreDict, uniCategoryScoreDict, keyIdList, incomplete, itemDict] = \
+        scoreData(dataDict, allScoreTypeList)
+
+    assert individualScoreDict == {'1': '2', '2': '1', '3': '', '4': '0'}
+    assert not incomplete
+    ## BIS has items 1 and 2, BAS items 2, 3 (missing) and 4 (weight 2 in BAS)
+    assert uniCategoryScoreDict['BIS']['Sum'] == 3.0
+    assert uniCategoryScoreDict['BIS']['SD'] == pytest.approx(np.std([2.0, 1.0], ddof=1))
+    assert uniCategoryScoreDict['BAS']['Sum'] == 1.0
+    assert uniCategoryScoreDict['BAS']['Mean'] == 0.5
+    assert [uniCategoryScoreDict['BAS']['Count'], uniCategoryScoreDict['BAS']['Missing']] == [2.0, 1.0]
+
+
+def test_scoreDataFile_invalid_score():
+    dataDict = makeDataDict(['Yes'], ['0;1;two'], ['BIS'])
+    with pytest.raises(DataFileError) as excInfo:
+        scoreData(dataDict, ['Sum'])
+    assert excInfo.value.kind == 'invalid_score'
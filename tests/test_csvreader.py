@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import codecs
+
+import pytest
+
+from conftest import writeLog, logHeader
+from libopensesametoolbox.questionnaireprocessor import readCsv, readCsvMapped
+
+columnList = ['response', 'id', 'category', 'answer_options', 'answer_options_scores', 'question_text', 'absent']
+
+
+def assertSameAsReadCsv(path, formatCache=None):
+    dataDict = readCsv(path, None)
+    mappedDict = readCsvMapped(path, None, columnList, formatCache)
+    if dataDict is None:
+        ## a file readCsv rejects is rejected as well
+        assert mappedDict is None
+    else:
+        assert mappedDict == dict((column, dataDict[column]) for column in columnList if column in dataDict)
+    return mappedDict
+
+
+@pytest.mark.parametrize('delimiter', [',', ';', '\t'])
+def test_mapped_reader_equals_readCsv(tmp_path, delimiter):
+    path = writeLog(str(tmp_path / 'subject-1.csv'), 1, ['No', 'Maybe', 'Yes', 'No'], delimiter=delimiter)
+    mappedDict = assertSameAsReadCsv(path)
+    assert mappedDict['id'] == ['1', '2', '3', '4']
+    assert mappedDict['question_text'][0] == 'Question 1, "quoted"'
+    assert 'absent' not in mappedDict
+
+
+@pytest.mark.parametrize('data', [
+    b'id,response,question_text\r\n1,"a\nb",x\r\n2, y ,"he said ""hi"", ok"\r\n3,z,w\r\n',
+    codecs.BOM_UTF8 + b'id,response,question_text\n1,a,b\n',
+    'id,response,question_text\n1,\xe9,x\n'.encode('latin-1'),
+    'id,response,question_text\n1,a,b\n'.encode('utf-16'),
+    b'id,response,question_text\n1,a\n',
+    b'id,response,question_text\n1,a,b\n\n2,c,d\n',
+    b'id,response,question_text\n1,a,b\n2,c,d',
+    b'id,response,question_text\r1,a,b\r2,c,d\r',
+])
+def test_mapped_reader_edge_cases(tmp_path, data):
+    path = tmp_path / 'subject-1.csv'
+    path.write_bytes(data)
+    assertSameAsReadCsv(str(path))
+
+
+def test_mapped_reader_format_cache(tmp_path):
+    formatCache = {}
+    for subjectNr in [1, 2]:
+        path = writeLog(str(tmp_path / ('subject-' + str(subjectNr) + '.csv')), subjectNr,
+                        ['Yes', 'No', 'Maybe', 'Yes'], delimiter=';')
+        assertSameAsReadCsv(path, formatCache)
+    assert str(tmp_path) in formatCache
+
+
+@pytest.mark.parametrize('data', [(','.join(logHeader) + '\n').encode(), ','.join(logHeader).encode(),
+                                  (','.join(logHeader) + '\n\n').encode()])
+def test_header_only_file(tmp_path, data):
+    path = tmp_path / 'subject-1.csv'
+    path.write_bytes(data)
+    assert readCsv(str(path), None) is None
+    assert readCsvMapped(str(path), None, columnList) is None
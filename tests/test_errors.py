@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import csv
+import os
+
+import pytest
+
+from conftest import processData, itemList
+from libopensesametoolbox.instrumentation import createInstrumentation
+from libopensesametoolbox.questionnaireprocessor import scoreDataFile, readErrorReport, DataFileError
+
+
+def breakScores(path, scores):
+    """
+    Give the second item of a log other answer_options_scores
+    """
+    with open(path, 'rt', newline='', encoding='utf-8') as fp:
+        rowList = list(csv.reader(fp))
+    rowList[2][rowList[0].index('answer_options_scores')] = scores
+    with open(path, 'wt', newline='', encoding='utf-8') as fp:
+        csv.writer(fp).writerows(rowList)
+
+
+@pytest.mark.parametrize('scores', ['0;1', '0;1;2;3'])
+def test_malformed_log_is_reported(tmp_path, dataFolder, scores):
+    breakScores(os.path.join(dataFolder, 'expA', 'subject-2.csv'), scores)
+    destinationFolder = str(tmp_path / 'results')
+    os.makedirs(destinationFolder)
+
+    ## the other files are still scored
+    assert processData(dataFolder, destinationFolder, continueOnError=True) is False
+    errorList = readErrorReport(destinationFolder)
+    assert [[os.path.basename(error[0]), error[1], error[2], error[3]] for error in errorList] == \
+        [['subject-2.csv', 'expA', 'invalid_score', '2']]
+    with open(os.path.join(destinationFolder, 'expA_Cumulative_Score_Results.tsv'), 'rt', encoding='utf-8') as fp:
+        assert [line.split('\t')[0] for line in fp.read().splitlines()[1:]] == \
+            ['subject-1.csv', 'subject-3.csv', 'subject-4.csv', 'subject-5.csv']
+    assert os.path.isfile(os.path.join(destinationFolder, 'expB_Cumulative_Score_Results.tsv'))
+
+    ## without continueOnError the run stops, releasing the lock
+    assert processData(dataFolder, destinationFolder, continueOnError=False) is None
+    assert processData(dataFolder, destinationFolder, continueOnError=True) is False
+
+
+@pytest.mark.parametrize('field', ['categories', 'answers', 'scores'])
+def test_custom_input_must_match_the_ids(field):
+    customDict = {'categories': [item[1] for item in itemList], 'answers': [item[2] for item in itemList],
+                  'scores': [item[3] for item in itemList]}
+    customDict[field] = customDict[field][:-1]
+    dataDict = {'response': ['No', 'No', 'No', 'No'], 'id': [item[0] for item in itemList]}
+
+    with pytest.raises(DataFileError) as excInfo:
+        scoreDataFile(dataDict, 'response', 'id', None, None, None, [item[0] for item in itemList],
+                      customDict['categories'], customDict['answers'], customDict['scores'], True, True,
+                      createInstrumentation('Test'), ['Sum'])
+    assert [excInfo.value.kind, excInfo.value.value] == ['invalid_score', field]
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import hashlib
+import os
+import time
+
+from conftest import processData
+from libopensesametoolbox.integrity import recordFile, loadManifest, verifyFile, manifestPath, IntegrityRecorder
+from libopensesametoolbox.questionnaireprocessor import readErrorReport
+
+
+def verify(path, record):
+    stat = os.stat(path)
+    return verifyFile(path, stat.st_size, stat.st_mtime, record)
+
+
+def test_record_and_verify(tmp_path):
+    path = tmp_path / 'subject-1.csv'
+    path.write_bytes(b'id,response\n1,Yes\n')
+    record = recordFile(str(path), exitStatus=0)
+    assert record['sha256'] == hashlib.sha256(b'id,response\n1,Yes\n').hexdigest()
+    assert loadManifest(str(tmp_path)) == {'subject-1.csv': record}
+    assert verify(str(path), record) is None
+
+    ## same size, other contents and time
+    path.write_bytes(b'id,response\n1,No!\n')
+    os.utime(str(path), (record['mtime'] + 10, record['mtime'] + 10))
+    assert verify(str(path), record) == 'modified'
+
+    path.write_bytes(b'id,response\n')
+    assert verify(str(path), record) == 'truncated'
+    path.write_bytes(b'id,response\n1,Yes\n2,No\n')
+    assert verify(str(path), record) == 'modified'
+
+    ## a copy with another time but the same contents is intact
+    path.write_bytes(b'id,response\n1,Yes\n')
+    os.utime(str(path), (record['mtime'] + 20, record['mtime'] + 20))
+    assert verify(str(path), record) is None
+
+
+def test_manifest_last_record_wins(tmp_path):
+    path = tmp_path / 'subject-1.csv'
+    missingRecord = recordFile(str(path))
+    assert missingRecord['sha256'] is None
+    assert verifyFile(str(path), 0, 0, missingRecord) is None
+
+    path.write_bytes(b'data')
+    record = recordFile(str(path))
+    with open(manifestPath(str(tmp_path)), 'at', encoding='utf-8') as fp:
+        fp.write('{"file": "subject-2.c')
+    assert loadManifest(str(tmp_path)) == {'subject-1.csv': record}
+    assert loadManifest(str(tmp_path / 'missing')) == {}
+
+
+def test_recorder(tmp_path):
+    pathList = [str(tmp_path / ('subject-' + str(subjectNr) + '.csv')) for subjectNr in range(5)]
+    recorder = IntegrityRecorder(2)
+    for path in pathList:
+        with open(path, 'wb') as fp:
+            fp.write(path.encode())
+        recorder.submit(path, time.time() - 60, time.time(), 0, experiment='bis')
+    recorder.close()
+
+    recordDict = loadManifest(str(tmp_path))
+    assert sorted(recordDict) == sorted(os.path.basename(path) for path in pathList)
+    assert all(record['experiment'] == 'bis' and record['exitStatus'] == 0 for record in recordDict.values())
+
+
+def test_processor_reports_modified_logs(tmp_path, dataFolder):
+    groupFolder = os.path.join(dataFolder, 'expA')
+    for fileName in sorted(os.listdir(groupFolder)):
+        recordFile(os.path.join(groupFolder, fileName))
+    with open(os.path.join(groupFolder, 'subject-2.csv'), 'ab') as fp:
+        fp.write(b'2,5,No,BIS,No;Maybe;Yes,0;1;2,extra,22,m\n')
+
+    destinationFolder = str(tmp_path / 'results')
+    os.makedirs(destinationFolder)
+    assert processData(dataFolder, destinationFolder, continueOnError=True, verifyIntegrity=False) is True
+    assert processData(dataFolder, destinationFolder, continueOnError=True, verifyIntegrity=True) is False
+
+    errorList = readErrorReport(destinationFolder)
+    assert [[os.path.basename(error[0]), error[1], error[2], error[3]] for error in errorList] == \
+        [['subject-2.csv', 'expA', 'integrity', 'modified']]
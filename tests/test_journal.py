@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import collections
+import os
+
+from conftest import writeLog, processData
+from libopensesametoolbox import questionnaireprocessor
+from libopensesametoolbox.journal import ScoreJournal
+
+Entry = collections.namedtuple('Entry', ['relativePath', 'size', 'mtime'])
+
+settings = {'scoreTypeList': ['Sum', 'Mean'], 'custom': False}
+
+
+def makeRecord(relativePath, size=10, mtime=1.5):
+    return {'relativePath': relativePath, 'size': size, 'mtime': mtime, 'group': 'expA', 'scores': {'1': '2'}}
+
+
+def test_journal_resume(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = ScoreJournal(path, settings)
+    journal.append(makeRecord('expA/subject-1.csv'))
+    journal.append(makeRecord('expA/subject-2.csv'))
+    journal.append(makeRecord('expA/subject-1.csv', size=12))
+    journal.close()
+
+    journal = ScoreJournal(path, settings, resume=True)
+    ## the last record of a file wins, a changed file is scored again
+    assert journal.lookup(Entry('expA/subject-1.csv', 12, 1.5))['size'] == 12
+    assert journal.lookup(Entry('expA/subject-1.csv', 10, 1.5)) is None
+    assert journal.lookup(Entry('expA/subject-2.csv', 10, 2.5)) is None
+    assert journal.lookup(Entry('expA/subject-3.csv', 10, 1.5)) is None
+    journal.close(remove=True)
+    assert not os.path.exists(path)
+
+
+def test_journal_other_settings(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = ScoreJournal(path, settings)
+    journal.append(makeRecord('expA/subject-1.csv'))
+    journal.close()
+
+    journal = ScoreJournal(path, dict(settings, scoreTypeList=['Sum']), resume=True)
+    assert journal.lookup(Entry('expA/subject-1.csv', 10, 1.5)) is None
+    journal.close()
+
+
+def test_journal_cut_off_line(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = ScoreJournal(path, settings)
+    journal.append(makeRecord('expA/subject-1.csv'))
+    journal.close()
+    with open(path, 'at', encoding='utf-8') as fp:
+        fp.write('{"relativePath": "expA/subj')
+
+    ## the cut off line is skipped and ended, so the next record is on a line of its own
+    journal = ScoreJournal(path, settings, resume=True)
+    journal.append(makeRecord('expA/subject-2.csv'))
+    journal.close()
+
+    journal = ScoreJournal(path, settings, resume=True)
+    assert journal.lookup(Entry('expA/subject-1.csv', 10, 1.5)) is not None
+    assert journal.lookup(Entry('expA/subject-2.csv', 10, 1.5)) is not None
+    journal.close()
+
+
+def test_resume_scores_only_changed_files(tmp_path, dataFolder, monkeypatch):
+    ## the complete run to compare with
+    completeFolder = str(tmp_path / 'complete')
+    os.makedirs(completeFolder)
+    assert processData(dataFolder, completeFolder) is True
+
+    ## a run that cannot score one file keeps its journal
+    badPath = os.path.join(dataFolder, 'expA', 'subject-3.csv')
+    with open(badPath, 'rt', encoding='utf-8') as fp:
+        goodLog = fp.read()
+    writeLog(badPath, 3, ['Bogus', 'No', 'No', 'No'])
+    destinationFolder = str(tmp_path / 'results')
+    os.makedirs(destinationFolder)
+    assert processData(dataFolder, destinationFolder, continueOnError=True) is False
+
+    with open(badPath, 'wt', encoding='utf-8', newline='') as fp:
+        fp.write(goodLog)
+
+    readList = []
+    loadDataFile = questionnaireprocessor.loadDataFile
+
+    def countingLoadDataFile(pathToCsv, *args):
+        readList.append(os.path.relpath(pathToCsv, dataFolder))
+        return loadDataFile(pathToCsv, *args)
+
+    monkeypatch.setattr(questionnaireprocessor, 'loadDataFile', countingLoadDataFile)
+    assert processData(dataFolder, destinationFolder, continueOnError=True, resume=True) is True
+
+    assert readList == [os.path.join('expA', 'subject-3.csv')]
+    for fileName in ['expA_Cumulative_Score_Results.tsv', 'expB_Cumulative_Score_Results.tsv']:
+        with open(os.path.join(completeFolder, fileName), 'rb') as fp:
+            expected = fp.read()
+        with open(os.path.join(destinationFolder, fileName), 'rb') as fp:
+            assert fp.read() == expected
+    ## the journal of a complete run is removed
+    assert not os.path.exists(os.path.join(destinationFolder,
+                                           questionnaireprocessor.config['questionnaireprocessor']['journalName']))
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import pytest
+
+from conftest import writeLog, itemList
+from libopensesametoolbox import questionnaireprocessor
+from libopensesametoolbox.instrumentation import createInstrumentation
+from libopensesametoolbox.questionnaireprocessor import scoreLogFile, scoreDataFile, DataFileError
+
+## items 1 to 4 answered Yes, Maybe, No and No: scores 2, 1, 0 and 2 (item 4 is scored 2;1;0)
+responseList = ['Yes', 'Maybe', 'No', 'No']
+keyColumns = {'questionnaire_weight': ['2', '', '1', '0.5'], 'questionnaire_reverse': ['', 'yes', 'r', '1']}
+
+
+@pytest.fixture
+def keyedConfig(monkeypatch):
+    conf_default_input = questionnaireprocessor.config['default_input']
+    monkeypatch.setitem(conf_default_input, 'weightKey', 'questionnaire_weight')
+    monkeypatch.setitem(conf_default_input, 'reverseKey', 'questionnaire_reverse')
+
+
+def scoreLog(path):
+    return scoreLogFile(path, 'response', 'id', 'category', 'answer_options', 'answer_options_scores')
+
+
+def test_keys_are_off_by_default(tmp_path):
+    plainRecord = scoreLog(writeLog(str(tmp_path / 'plain' / 'subject-1.csv'), 1, responseList))
+    ## columns that happen to be called weight and reverse do not change the scores
+    keyedRecord = scoreLog(writeLog(str(tmp_path / 'keyed' / 'subject-1.csv'), 1, responseList,
+                                    extraColumns={'weight': ['3', '3', '3', '3'], 'reverse': ['1', '1', '1', '1'],
+                                                  'questionnaire_weight': keyColumns['questionnaire_weight']}))
+    assert plainRecord['scores'] == keyedRecord['scores'] == {'1': '2', '2': '1', '3': '0', '4': '2'}
+    assert plainRecord['categories'] == keyedRecord['categories']
+
+
+def test_weighted_and_reverse_keyed_scores(tmp_path, keyedConfig):
+    record = scoreLog(writeLog(str(tmp_path / 'subject-1.csv'), 1, responseList, extraColumns=keyColumns))
+
+    ## a reverse keyed score is mirrored between the lowest and highest score, then weighted
+    assert record['scores'] == {'1': '4.0', '2': '1.0', '3': '2.0', '4': '0.0'}
+    ## BIS: items 1 and 3, BAS: items 2, 3 and 4
+    assert record['categories']['BIS']['Sum'] == 6.0
+    assert record['categories']['BAS']['Sum'] == 3.0
+    assert record['categories']['BAS']['Mean'] == 1.0
+
+
+def test_invalid_weight(tmp_path, keyedConfig):
+    for column, value, kind in [['questionnaire_weight', 'heavy', 'invalid_weight'],
+                                ['questionnaire_reverse', 'maybe', 'invalid_reverse']]:
+        extraColumns = dict(keyColumns)
+        extraColumns[column] = [value] + keyColumns[column][1:]
+        path = writeLog(str(tmp_path / column / 'subject-1.csv'), 1, responseList, extraColumns=extraColumns)
+        with pytest.raises(DataFileError) as excInfo:
+            scoreLog(path)
+        assert excInfo.value.kind == kind
+        assert excInfo.value.value == '1'
+
+
+def test_custom_weight_and_reverse():
+    dataDict = {'response': responseList, 'id': [item[0] for item in itemList]}
+    customArgs = [[item[0] for item in itemList], [item[1] for item in itemList],
+                  [item[2] for item in itemList], [item[3] for item in itemList]]
+
+    def score(customWeight, customReverse):
+        return scoreDataFile(dataDict, 'response', 'id', None, None, None, *customArgs, custom=True,
+                             caseInsensitiveComparison=True, instrumentation=createInstrumentation('Test'),
+                             scoreTypeList=['Sum'], customWeight=customWeight, customReverse=customReverse)
+
+    [plainScoreDict, plainCategoryDict] = score(None, None)[:2]
+    assert plainScoreDict == {'1': '2', '2': '1', '3': '0', '4': '2'}
+    assert plainCategoryDict['BIS']['Sum'] == 2.0
+
+    [keyedScoreDict, keyedCategoryDict] = score(keyColumns['questionnaire_weight'],
+                                                keyColumns['questionnaire_reverse'])[:2]
+    assert keyedScoreDict == {'1': '4.0', '2': '1.0', '3': '2.0', '4': '0.0'}
+    assert keyedCategoryDict['BIS']['Sum'] == 6.0
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import functools
+import os
+import zipfile
+
+import pytest
+
+from libopensesametoolbox.library import (patternRename, renamePlan, removePlan, copyPlan, importPlan,
+                                          LibraryWorker)
+
+extensionList = ['.osexp', '.opensesame', '.opensesame.tar.gz']
+
+
+def test_pattern_rename_keeps_the_extension():
+    targetDict = patternRename(['bis_v1.osexp', 'bas_v1.opensesame.tar.gz', 'notes_v1.txt'], r'_v(\d)', r'_v\g<1>b',
+                               extensionList)
+    assert list(targetDict.items()) == [('bis_v1.osexp', 'bis_v1b.osexp'),
+                                        ('bas_v1.opensesame.tar.gz', 'bas_v1b.opensesame.tar.gz'),
+                                        ('notes_v1.txt', 'notes_v1b.txt')]
+
+
+@pytest.mark.parametrize('pattern, replacement', [('(', 'x'), ('a', r'\2')])
+def test_pattern_rename_invalid(pattern, replacement):
+    with pytest.raises(ValueError):
+        patternRename(['bas.osexp'], pattern, replacement, extensionList)
+
+
+def test_rename_plan():
+    operationList = renamePlan('en', {'a.osexp': 'b.osexp', 'c.osexp': 'c.osexp'}, ['a.osexp', 'c.osexp'])
+    assert [(operation.kind, operation.name, operation.target) for operation in operationList] == \
+        [('rename', 'a.osexp', 'b.osexp')]
+
+    ## names can be swapped through a free name only
+    with pytest.raises(ValueError):
+        renamePlan('en', {'a.osexp': 'c.osexp'}, ['a.osexp', 'c.osexp'])
+    with pytest.raises(ValueError):
+        renamePlan('en', {'a.osexp': 'x.osexp', 'b.osexp': 'x.osexp'}, ['a.osexp', 'b.osexp'])
+    for target in ['', '.hidden.osexp', 'sub/a.osexp']:
+        with pytest.raises(ValueError):
+            renamePlan('en', {'a.osexp': target}, ['a.osexp'])
+
+
+def test_copy_and_import_plans_skip_existing(tmp_path):
+    [operationList, skippedList] = copyPlan('en', ['a.osexp', 'b.osexp'], 'nl', ['b.osexp'])
+    assert [(operation.name, operation.target) for operation in operationList] == [('a.osexp', 'nl')]
+    assert skippedList == ['b.osexp']
+    assert [operation.kind for operation in removePlan('en', ['a.osexp'])] == ['remove']
+
+    (tmp_path / 'import' / 'sub').mkdir(parents=True)
+    for name in ['import/a.osexp', 'import/b.osexp', 'import/sub/a.osexp', 'import/readme.txt']:
+        (tmp_path / name).write_bytes(b'experiment')
+    [operationList, skippedList] = importPlan(str(tmp_path / 'import'), 'en', ['b.osexp'], extensionList)
+    assert [operation.source for operation in operationList] == [str(tmp_path / 'import' / 'a.osexp')]
+    assert sorted(skippedList) == ['a.osexp', 'b.osexp']
+
+
+def runWorker(sourceFolder, plan):
+    resultList = []
+    worker = LibraryWorker(sourceFolder, plan)
+    worker.finished.connect(lambda doneList, skippedList, errorList:
+                            resultList.extend([doneList, skippedList, errorList]))
+    worker.run()
+    return resultList
+
+
+def test_worker_runs_the_plan(tmp_path):
+    sourceFolder = tmp_path / 'library'
+    (sourceFolder / 'en').mkdir(parents=True)
+    for name in ['a.osexp', 'b.osexp', 'c.osexp']:
+        (sourceFolder / 'en' / name).write_bytes(name.encode())
+    archivePath = str(tmp_path / 'import.zip')
+    with zipfile.ZipFile(archivePath, 'w') as archive:
+        archive.writestr('battery/d.osexp', b'd.osexp')
+        archive.writestr('battery/a.osexp', b'other')
+
+    [doneList, skippedList, errorList] = runWorker(str(sourceFolder), lambda: [
+        renamePlan('en', {'a.osexp': 'e.osexp'}, ['a.osexp', 'b.osexp', 'c.osexp']) +
+        removePlan('en', ['b.osexp']) + copyPlan('en', ['c.osexp'], 'nl', [])[0], []])
+    assert len(doneList) == 3 and skippedList == [] and errorList == []
+    assert sorted(os.listdir(str(sourceFolder / 'en'))) == ['c.osexp', 'e.osexp']
+    assert (sourceFolder / 'nl' / 'c.osexp').read_bytes() == b'c.osexp'
+
+    [doneList, skippedList, errorList] = runWorker(str(sourceFolder), functools.partial(
+        importPlan, archivePath, 'en', ['c.osexp', 'e.osexp'], extensionList))
+    assert [operation.name for operation in doneList] == ['d.osexp', 'a.osexp']
+    assert (sourceFolder / 'en' / 'd.osexp').read_bytes() == b'd.osexp'
+
+    ## an experiment that exists is never overwritten, also when the plan was made on an outdated index
+    (sourceFolder / 'en' / 'x.osexp').write_bytes(b'x')
+    [doneList, skippedList, errorList] = runWorker(str(sourceFolder), lambda: [
+        renamePlan('en', {'e.osexp': 'x.osexp'}, []), []])
+    assert doneList == [] and len(errorList) == 1
+    assert (sourceFolder / 'en' / 'e.osexp').exists()
+
+
+def test_worker_reports_an_invalid_plan(tmp_path):
+    [doneList, skippedList, errorList] = runWorker(str(tmp_path), functools.partial(
+        importPlan, str(tmp_path / 'missing.zip'), 'en', [], extensionList))
+    assert doneList == [] and len(errorList) == 1
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import os
+
+import pytest
+
+from conftest import writeLog, processData
+from libopensesametoolbox.questionnaireprocessor import buildManifest
+
+
+def test_group_names(dataFolder):
+    writeLog(os.path.join(dataFolder, 'expA', 'session2', 'subject-1.csv'), 1, ['No', 'No', 'No', 'No'])
+    writeLog(os.path.join(dataFolder, '.hidden', 'subject-1.csv'), 1, ['No', 'No', 'No', 'No'])
+
+    manifest = buildManifest(dataFolder, ['csv'], maxDepth=2)
+    assert [group.name for group in manifest] == ['expA', 'expA_session2', 'expB']
+    assert manifest[1].entries[0].relativePath == 'expA/session2/subject-1.csv'
+    assert [group.name for group in buildManifest(dataFolder, ['csv'])] == ['expA', 'expB']
+
+
+def test_folders_with_the_same_group_name(tmp_path, dataFolder):
+    writeLog(os.path.join(dataFolder, 'a', 'b_c', 'subject-1.csv'), 1, ['No', 'No', 'No', 'No'])
+    writeLog(os.path.join(dataFolder, 'a_b', 'c', 'subject-1.csv'), 1, ['Yes', 'Yes', 'Yes', 'Yes'])
+
+    with pytest.raises(ValueError) as excInfo:
+        buildManifest(dataFolder, ['csv'], maxDepth=2)
+    assert 'a/b_c and a_b/c' in str(excInfo.value)
+
+    ## the run stops before anything is written, instead of one group overwriting the results of the other
+    destinationFolder = str(tmp_path / 'results')
+    os.makedirs(destinationFolder)
+    assert processData(dataFolder, destinationFolder, maxDepth=2) is None
+    assert [name for name in os.listdir(destinationFolder) if not name.startswith('.')] == []
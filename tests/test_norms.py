@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import csv
+import os
+
+import numpy as np
+import pytest
+
+from conftest import processData
+from libopensesametoolbox.norms import loadNormTable, parseAge, parseSex
+
+normRowList = [['Category', 'AgeMin', 'AgeMax', 'Sex', 'Raw', 'Percentile', 'T'],
+               ['BIS', '', '', '', '4', '90', '63'],
+               ['BIS', '', '', '', '0', '10', '37'],
+               ['BIS', '', '', '', '2', '50', '50'],
+               ['BAS', '18', '22', 'f', '0', '20', '42'],
+               ['BAS', '18', '22', 'f', '3', '80', '58'],
+               ['BAS', '18', '22', '', '0', '30', '45'],
+               ['BAS', '23', '', '', '0', '40', '47']]
+
+
+def writeNormTable(path, rowList=normRowList, delimiter=','):
+    with open(path, 'wt', newline='', encoding='utf-8') as fp:
+        csv.writer(fp, delimiter=delimiter).writerows(rowList)
+    return path
+
+
+def assertConverted(resultDict, percentileList, tList):
+    np.testing.assert_array_equal(resultDict['Percentile'], percentileList)
+    np.testing.assert_array_equal(resultDict['T'], tList)
+
+
+@pytest.mark.parametrize('delimiter', [',', ';', '\t'])
+def test_convert_ranges(tmp_path, delimiter):
+    normTable = loadNormTable(writeNormTable(str(tmp_path / 'norms.csv'), delimiter=delimiter))
+    assert normTable.statistics == ['Percentile', 'T']
+
+    ## a row applies from its raw score up to the next one, scores below the table have no norm
+    rawList = [-1, 0, 1, 2, 3.5, 4, 10, np.nan]
+    resultDict = normTable.convert(['BIS'] * len(rawList), rawList)
+    assertConverted(resultDict, [np.nan, 10, 10, 50, 50, 90, 90, np.nan], [np.nan, 37, 37, 50, 50, 63, 63, np.nan])
+
+
+def test_convert_age_and_sex(tmp_path):
+    normTable = loadNormTable(writeNormTable(str(tmp_path / 'norms.csv')))
+
+    ## the first group of the category that matches the subject is used
+    assertConverted(normTable.convert(['BIS', 'BAS'], [2, 3], 20, 'f'), [50, 80], [50, 58])
+    assertConverted(normTable.convert(['BIS', 'BAS'], [2, 3], 20, 'm'), [50, 30], [50, 45])
+    assertConverted(normTable.convert(['BAS'], [0], 30, 'm'), [40], [47])
+    ## no group for an unknown age, nor for a category without norms
+    assertConverted(normTable.convert(['BAS', 'FUN'], [0, 0]), [np.nan, np.nan], [np.nan, np.nan])
+
+
+@pytest.mark.parametrize('rowList, message', [
+    ([['Category', 'Percentile'], ['BIS', '10']], 'no Raw column'),
+    ([['Category', 'Raw'], ['BIS', '1']], 'no Percentile or T column'),
+    ([['Category', 'Raw', 'T'], ['BIS', 'high', '50']], 'is not a number'),
+    ([['Category', 'Raw', 'T'], ['BIS', '', '50']], 'has no Raw score'),
+])
+def test_invalid_norm_table(tmp_path, rowList, message):
+    with pytest.raises(ValueError) as excInfo:
+        loadNormTable(writeNormTable(str(tmp_path / 'norms.csv'), rowList))
+    assert message in str(excInfo.value)
+
+
+def test_parse_age_and_sex():
+    assert parseAge(['', 'unknown', '21', '22']) == 21.0
+    assert np.isnan(parseAge([]))
+    assert parseSex(['', ' F ']) == 'f'
+    assert parseSex([]) == ''
+
+
+def test_normed_results(tmp_path, dataFolder):
+    normPath = writeNormTable(str(tmp_path / 'norms.csv'))
+    normTable = loadNormTable(normPath)
+    destinationFolder = str(tmp_path / 'results')
+    os.makedirs(destinationFolder)
+    assert processData(dataFolder, destinationFolder, normTable=normPath) is True
+
+    with open(os.path.join(destinationFolder, 'expA_Cumulative_Score_Results.tsv'), 'rt', newline='',
+              encoding='utf-8') as fp:
+        rowList = list(csv.DictReader(fp, delimiter='\t'))
+    assert len(rowList) == 5
+
+    ## the subjects of the data folder are 20 + their number years old, odd numbers are f
+    for subjectNr, row in enumerate(rowList, 1):
+        assert row['Item'] == 'subject-' + str(subjectNr) + '.csv'
+        resultDict = normTable.convert(['BAS', 'BIS'], [float(row['BAS_Sum']), float(row['BIS_Sum'])],
+                                       20 + subjectNr, 'f' if subjectNr % 2 else 'm')
+        for statistic in ['Percentile', 'T']:
+            for index, category in enumerate(['BAS', 'BIS']):
+                expected = resultDict[statistic][index]
+                value = row[category + '_' + statistic]
+                if np.isnan(expected):
+                    assert value == ''
+                else:
+                    assert float(value) == expected
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import logging
+import os
+
+import pytest
+
+from conftest import writeLog
+from libopensesametoolbox import postrun
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    conf_experimentmanager = postrun.config['experimentmanager']
+    monkeypatch.setitem(conf_experimentmanager, 'scoreLogs', 'True')
+    monkeypatch.setitem(conf_experimentmanager, 'compressLogs', 'True')
+    monkeypatch.setitem(conf_experimentmanager, 'compression', 'gzip')
+    monkeypatch.setitem(conf_experimentmanager, 'integrityManifest', 'False')
+    return postrun.createPostRunPipeline()
+
+
+def readRows(path):
+    with open(path, 'rt', encoding='utf-8') as fp:
+        return [line.split('\t') for line in fp.read().splitlines()]
+
+
+def test_session_scores(tmp_path, pipeline, caplog):
+    folder = str(tmp_path / 'session')
+    pathList = [writeLog(os.path.join(folder, 'subject-' + str(subjectNr) + '.csv'), subjectNr,
+                         ['No', 'Maybe', 'Yes', 'No']) for subjectNr in [1, 2, 3, 4]]
+
+    ## subject 2 stopped after two items, the log of subject 3 cannot be scored
+    with open(pathList[1], 'rt', encoding='utf-8') as fp:
+        lineList = fp.readlines()
+    with open(pathList[1], 'wt', encoding='utf-8') as fp:
+        fp.writelines(lineList[:3])
+    writeLog(pathList[2], 3, ['Bogus', 'No', 'No', 'No'])
+
+    with caplog.at_level(logging.ERROR):
+        for path in pathList:
+            pipeline.submit(path)
+        pipeline.close()
+
+    ## every log is compressed, also those that could not be added to the session scores
+    assert sorted(os.listdir(folder)) == ['.Results.lock', 'Session_Score_Results.tsv',
+                                          'Session_Score_Results_subject-2.tsv'] + \
+        ['subject-' + str(subjectNr) + '.csv.gz' for subjectNr in [1, 2, 3, 4]]
+
+    rowList = readRows(os.path.join(folder, 'Session_Score_Results.tsv'))
+    assert rowList[0][-4:] == ['1', '2', '3', '4']
+    assert [row[0] for row in rowList[1:]] == ['subject-1.csv', 'subject-4.csv']
+    rowList = readRows(os.path.join(folder, 'Session_Score_Results_subject-2.tsv'))
+    assert rowList[0][-2:] == ['1', '2']
+    assert [row[0] for row in rowList[1:]] == ['subject-2.csv']
+
+    messageList = [record.getMessage() for record in caplog.records]
+    assert any('Session_Score_Results_subject-2.tsv' in message for message in messageList)
+    assert any(message.startswith('Cannot score ' + pathList[2]) for message in messageList)
+
+
+def test_unexpected_error_does_not_stop_compression(tmp_path, pipeline, monkeypatch):
+    path = writeLog(str(tmp_path / 'subject-1.csv'), 1, ['No', 'Maybe', 'Yes', 'No'])
+
+    def failingScoreLogFile(*args, **kwargs):
+        raise RuntimeError('unexpected')
+
+    monkeypatch.setattr(postrun, 'scoreLogFile', failingScoreLogFile)
+    pipeline.submit(path)
+    pipeline.close()
+    assert os.listdir(str(tmp_path)) == ['subject-1.csv.gz']
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import csv
+
+import numpy as np
+import pytest
+
+from libopensesametoolbox.psychometrics import ItemAccumulator, ItemStatistics, reportHeader
+
+itemIdList = ['1', '2', '3', '4']
+
+
+def makeRecord(scoreList, categoryList=None):
+    categoryList = categoryList or ['BIS'] * len(scoreList)
+    return {'scores': dict(zip(itemIdList, scoreList)),
+            'items': dict((identity, ['answer', [category]]) for identity, category in zip(itemIdList, categoryList))}
+
+
+def cronbachAlpha(scoreArray):
+    nrItems = scoreArray.shape[1]
+    return nrItems / (nrItems - 1) * (1 - scoreArray.var(axis=0, ddof=1).sum() / scoreArray.sum(axis=1).var(ddof=1))
+
+
+def test_accumulator_covariance():
+    scoreArray = np.random.RandomState(1).randint(0, 5, size=(30, 4)).astype('d')
+    accumulator = ItemAccumulator(itemIdList)
+    assert accumulator.covariance() is None
+    for scores in scoreArray:
+        accumulator.add(scores)
+    np.testing.assert_allclose(accumulator.mean, scoreArray.mean(axis=0))
+    np.testing.assert_allclose(accumulator.covariance(), np.cov(scoreArray, rowvar=False))
+
+
+def test_item_statistics_match_numpy():
+    scoreArray = np.random.RandomState(2).randint(0, 3, size=(25, 4)).astype('d')
+    ## correlated items, so alpha is positive
+    scoreArray += scoreArray[:, :1]
+
+    statistics = ItemStatistics()
+    for scores in scoreArray:
+        statistics.addRecord(makeRecord([str(score) for score in scores]))
+    ## a subject with a missing item is skipped
+    statistics.addRecord(makeRecord(['1', '', '2', '0']))
+
+    rowList = statistics.rows()
+    assert len(rowList) == 5
+    [category, item, n, skipped, totalMean, totalVariance, correlation, alphaIfDeleted, alpha] = rowList[0]
+    assert [category, item, n, skipped] == ['BIS', '', 25, 1]
+    assert totalMean == pytest.approx(scoreArray.sum(axis=1).mean())
+    assert totalVariance == pytest.approx(scoreArray.sum(axis=1).var(ddof=1))
+    assert alpha == pytest.approx(cronbachAlpha(scoreArray))
+
+    for index, row in enumerate(rowList[1:]):
+        restArray = np.delete(scoreArray, index, axis=1)
+        assert row[1] == itemIdList[index]
+        assert row[4] == pytest.approx(scoreArray[:, index].mean())
+        assert row[5] == pytest.approx(scoreArray[:, index].var(ddof=1))
+        assert row[6] == pytest.approx(np.corrcoef(scoreArray[:, index], restArray.sum(axis=1))[0, 1])
+        assert row[7] == pytest.approx(cronbachAlpha(restArray))
+
+
+def test_item_statistics_per_category(tmp_path):
+    statistics = ItemStatistics()
+    statistics.addRecord(makeRecord(['1', '2', '0', '1'], ['BIS', 'BIS', 'BAS', 'BAS']))
+    statistics.addRecord(makeRecord(['2', '2', '1', '0'], ['BIS', 'BIS', 'BAS', 'BAS']))
+    statistics.addRecord({'scores': {}})
+
+    rowList = statistics.rows()
+    assert [row[:2] for row in rowList] == [['BAS', ''], ['BAS', '3'], ['BAS', '4'],
+                                            ['BIS', ''], ['BIS', '1'], ['BIS', '2']]
+    ## an item without variance gives no correlation, written as an empty field
+    assert np.isnan(rowList[5][6])
+
+    path = str(tmp_path / 'Item_Statistics.tsv')
+    statistics.write(path, '\t')
+    with open(path, 'rt', newline='', encoding='utf-8') as fp:
+        writtenList = list(csv.reader(fp, delimiter='\t'))
+    assert writtenList[0] == reportHeader
+    assert len(writtenList) == 7
+    assert writtenList[6][6] == ''
+
+
+def test_item_statistics_too_few_subjects():
+    statistics = ItemStatistics()
+    statistics.addRecord(makeRecord(['1', '2', '0', '1']))
+    assert statistics.rows() == [['BIS', '', 1, 0, '', '', '', '', '']]
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import hashlib
+import os
+
+import pytest
+
+from conftest import writeLog, processData
+from libopensesametoolbox.publish import (atomicOpen, DestinationLock, Publication, readGeneration,
+                                          writeGeneration)
+
+
+def listFolder(folder):
+    return sorted(os.listdir(folder))
+
+
+def generationFiles(folder):
+    return dict((item['name'], [item['group'], item['generation']]) for item in readGeneration(folder)['files'])
+
+
+def test_atomicOpen(tmp_path):
+    path = str(tmp_path / 'results.tsv')
+    with atomicOpen(path, 'wt', encoding='utf-8') as fp:
+        fp.write('old')
+
+    with pytest.raises(RuntimeError):
+        with atomicOpen(path, 'wt', encoding='utf-8') as fp:
+            fp.write('new')
+            raise RuntimeError('stopped while writing')
+
+    ## the old file stays and the temporary file is removed
+    with open(path, 'rt', encoding='utf-8') as fp:
+        assert fp.read() == 'old'
+    assert listFolder(str(tmp_path)) == ['results.tsv']
+
+
+def test_lock_is_exclusive(tmp_path):
+    with DestinationLock(str(tmp_path)):
+        otherLock = DestinationLock(str(tmp_path), shared=True)
+        otherLock.fp = open(otherLock.path, 'a+b')
+        try:
+            assert not otherLock._lock(blocking=False)
+        finally:
+            otherLock.fp.close()
+    with DestinationLock(str(tmp_path), shared=True):
+        with DestinationLock(str(tmp_path), shared=True):
+            pass
+
+
+def writeFile(path, data):
+    with open(path, 'wb') as fp:
+        fp.write(data)
+    return path
+
+
+def test_generation_lists_the_published_files(tmp_path):
+    folder = str(tmp_path)
+    aPath = writeFile(os.path.join(folder, 'expA_Results.tsv'), b'a')
+    bPath = writeFile(os.path.join(folder, 'expB_Results.tsv'), b'b')
+    reportPath = writeFile(os.path.join(folder, 'Error_Report.tsv'), b'error')
+
+    publication = Publication(folder)
+    publication.add([aPath], 'expA')
+    publication.add([bPath], 'expB')
+    publication.add([reportPath])
+    publication.close()
+
+    generation = readGeneration(folder)
+    assert generation['generation'] == 1
+    assert generation['files'][0] == {'name': 'Error_Report.tsv', 'group': None, 'size': 5,
+                                      'sha256': hashlib.sha256(b'error').hexdigest(), 'generation': 1}
+
+    ## a run on expB keeps expA, an unchanged file keeps its generation; the error report is gone
+    writeFile(bPath, b'b2')
+    publication = Publication(folder)
+    publication.keep(['expA'])
+    publication.add([bPath], 'expB')
+    publication.close()
+    assert generationFiles(folder) == {'expA_Results.tsv': ['expA', 1], 'expB_Results.tsv': ['expB', 2]}
+
+    ## a file of a kept group that was changed is listed with the new generation
+    writeFile(aPath, b'a2')
+    publication = Publication(folder)
+    publication.keep(['expA'])
+    publication.close()
+    assert generationFiles(folder) == {'expA_Results.tsv': ['expA', 3]}
+
+
+def test_abort_keeps_the_previous_generation(tmp_path):
+    folder = str(tmp_path)
+    publication = Publication(folder)
+    publication.add([writeFile(os.path.join(folder, 'expA_Results.tsv'), b'a')], 'expA')
+    publication.close()
+
+    publication = Publication(folder)
+    publication.add([writeFile(os.path.join(folder, 'expB_Results.tsv'), b'b')], 'expB')
+    publication.abort()
+    assert readGeneration(folder)['generation'] == 1
+    assert list(generationFiles(folder)) == ['expA_Results.tsv']
+
+    ## the lock was released
+    with DestinationLock(folder):
+        pass
+
+
+def test_partial_publication_writes_no_generation(tmp_path):
+    folder = str(tmp_path)
+    publication = Publication(folder, '.shard-1-of-2')
+    publication.add([writeFile(os.path.join(folder, 'Partial.jsonl'), b'{}')])
+    publication.close()
+    assert readGeneration(folder) is None
+    assert writeGeneration(folder, []) == 1
+
+
+def test_processor_publishes_generations(tmp_path, dataFolder):
+    destinationFolder = str(tmp_path / 'results')
+    os.makedirs(destinationFolder)
+    assert processData(dataFolder, destinationFolder) is True
+    assert generationFiles(destinationFolder) == {'expA_Cumulative_Score_Results.tsv': ['expA', 1],
+                                                  'expB_Cumulative_Score_Results.tsv': ['expB', 1]}
+
+    ## a run that stops on an error publishes no generation and leaves no temporary files, only its journal
+    fileList = listFolder(destinationFolder)
+    writeLog(os.path.join(dataFolder, 'expB', 'subject-3.csv'), 3, ['Bogus', 'No', 'No', 'No'])
+    assert processData(dataFolder, destinationFolder, continueOnError=False) is None
+    assert readGeneration(destinationFolder)['generation'] == 1
+    assert listFolder(destinationFolder) == sorted(fileList + ['.Score_Journal.jsonl'])
+
+    ## the error is reported with the results, and removed again once it is fixed
+    assert processData(dataFolder, destinationFolder, continueOnError=True) is False
+    assert generationFiles(destinationFolder) == {'Error_Report.tsv': [None, 2],
+                                                  'expA_Cumulative_Score_Results.tsv': ['expA', 2],
+                                                  'expB_Cumulative_Score_Results.tsv': ['expB', 2]}
+    writeLog(os.path.join(dataFolder, 'expB', 'subject-3.csv'), 3, ['No', 'No', 'No', 'No'])
+    assert processData(dataFolder, destinationFolder, groupList=['expB'], continueOnError=True) is True
+    assert generationFiles(destinationFolder) == {'expA_Cumulative_Score_Results.tsv': ['expA', 2],
+                                                  'expB_Cumulative_Score_Results.tsv': ['expB', 3]}
+    assert 'Error_Report.tsv' not in listFolder(destinationFolder)
+
+
+def test_lock_file_of_another_user(tmp_path):
+    folder = str(tmp_path)
+    with DestinationLock(folder) as lock:
+        lockPath = lock.path
+    ## e.g. created by another user with the default umask
+    os.chmod(lockPath, 0o444)
+
+    ## the lock file is only read, so a user that cannot write it can still lock it
+    with DestinationLock(folder) as lock:
+        assert not lock.fp.writable()
+        otherLock = DestinationLock(folder, shared=True)
+        otherLock.fp = open(lockPath, 'rb')
+        try:
+            assert not otherLock._lock(blocking=False)
+        finally:
+            otherLock.fp.close()
+
+
+def test_read_only_folder_without_lock_file(tmp_path, monkeypatch):
+    folder = str(tmp_path)
+
+    def noCreateOpen(path, flags, *args):
+        if flags & os.O_CREAT:
+            raise PermissionError(13, 'Permission denied', path)
+        raise FileNotFoundError(2, 'No such file or directory', path)
+
+    monkeypatch.setattr(os, 'open', noCreateOpen)
+    ## a reader has nothing to wait for, a writer cannot publish
+    assert readGeneration(folder) is None
+    with pytest.raises(OSError):
+        Publication(folder)
+    assert processData(folder, folder) is None
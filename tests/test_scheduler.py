@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import collections
+import os
+import time
+
+import pytest
+
+from libopensesametoolbox.scheduler import latinSquareRow, loadRoster, RosterScheduler
+
+rosterText = ('subject,language,session,battery,order\n'
+              '1,en,1,a;b;c;d,\n'
+              '2,en,1,a;b;c;d,latin\n'
+              '2,en,2,a;b;c;d,random\n'
+              '3,nl,,a;b;c;d,fixed\n')
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 4, 5, 6])
+def test_latin_square_is_balanced(size):
+    nrRows = size if size % 2 == 0 else 2 * size
+    rowList = [latinSquareRow(size, rowNr) for rowNr in range(nrRows)]
+
+    for row in rowList:
+        assert sorted(row) == list(range(size))
+    for position in range(size):
+        assert collections.Counter(row[position] for row in rowList) == collections.Counter(
+            dict((index, nrRows // size) for index in range(size)))
+
+    ## every experiment follows every other experiment equally often
+    pairCounter = collections.Counter((row[index], row[index + 1]) for row in rowList for index in range(size - 1))
+    assert len(pairCounter) == size * (size - 1)
+    assert len(set(pairCounter.values())) <= 1
+
+    assert latinSquareRow(size, nrRows) == rowList[0]
+    assert latinSquareRow(0, 3) == []
+
+
+def writeRoster(tmp_path, text=rosterText):
+    path = tmp_path / 'roster.csv'
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_load_roster(tmp_path):
+    jobList = loadRoster(writeRoster(tmp_path), order='fixed', seed=1)
+    assert [job.jobId for job in jobList] == ['1-1', '2-1', '2-2', '3']
+    assert jobList[0].experiments == ['a', 'b', 'c', 'd']
+    ## the second subject of the roster gets the second row of the Latin square
+    assert jobList[1].experiments == [['a', 'b', 'c', 'd'][index] for index in latinSquareRow(4, 1)]
+    assert sorted(jobList[2].experiments) == ['a', 'b', 'c', 'd']
+    assert loadRoster(writeRoster(tmp_path), order='fixed', seed=1)[2].experiments == jobList[2].experiments
+    assert jobList[3].language == 'nl'
+
+
+@pytest.mark.parametrize('text, message', [
+    ('subject,language,battery\n1,en,\n', 'has no battery'),
+    ('subject,language,battery\nS1,en,a\n', 'is not an integer'),
+    ('subject,language,battery\n1,en,a\n1,en,b\n', 'already in the roster'),
+    ('subject,language,battery,order\n1,en,a,sorted\n', 'unknown order'),
+])
+def test_invalid_roster(tmp_path, text, message):
+    with pytest.raises(ValueError) as excInfo:
+        loadRoster(writeRoster(tmp_path, text))
+    assert message in str(excInfo.value)
+
+
+def test_stations_share_the_roster(tmp_path):
+    rosterPath = writeRoster(tmp_path)
+    firstScheduler = RosterScheduler(rosterPath, 'station-1', claimTimeout=0)
+    secondScheduler = RosterScheduler(rosterPath, 'station-2', claimTimeout=0)
+
+    firstJob = firstScheduler.nextJob()
+    secondJob = secondScheduler.nextJob()
+    assert [firstJob.jobId, secondJob.jobId] == ['1-1', '2-1']
+    ## a station gets its own claim back, e.g. after a restart
+    assert RosterScheduler(rosterPath, 'station-1', claimTimeout=0).nextJob().jobId == '1-1'
+
+    firstScheduler.finishJob(firstJob, True)
+    secondScheduler.finishJob(secondJob, False)
+    assert firstScheduler.progress() == [1, 4]
+    ## a failed job is released for another try
+    assert firstScheduler.nextJob().jobId == '2-1'
+
+
+def test_stale_claim_is_taken_over(tmp_path):
+    rosterPath = writeRoster(tmp_path)
+    crashedScheduler = RosterScheduler(rosterPath, 'station-1', claimTimeout=60)
+    job = crashedScheduler.nextJob()
+    ## the station crashes: its claim is not touched anymore
+    crashedScheduler._stopHeartbeat()
+
+    otherScheduler = RosterScheduler(rosterPath, 'station-2', claimTimeout=60)
+    assert otherScheduler.nextJob().jobId == '2-1'
+    otherScheduler._stopHeartbeat()
+
+    claimPath = os.path.join(rosterPath + '.state', 'job-' + job.jobId + '.claim')
+    staleTime = time.time() - 120
+    os.utime(claimPath, (staleTime, staleTime))
+    takeOverScheduler = RosterScheduler(rosterPath, 'station-3', claimTimeout=60)
+    assert takeOverScheduler.nextJob().jobId == job.jobId
+    assert takeOverScheduler._claimStation(claimPath) == 'station-3'
+    takeOverScheduler.finishJob(job, True)
+
+    ## the renamed claim of the crashed station is gone
+    assert sorted(os.listdir(rosterPath + '.state')) == ['job-1-1.claim', 'job-1-1.done', 'job-2-1.claim']
+
+
+def test_claims_without_timeout_are_kept(tmp_path):
+    rosterPath = writeRoster(tmp_path)
+    job = RosterScheduler(rosterPath, 'station-1', claimTimeout=0).nextJob()
+    claimPath = os.path.join(rosterPath + '.state', 'job-' + job.jobId + '.claim')
+    os.utime(claimPath, (0, 0))
+    assert RosterScheduler(rosterPath, 'station-2', claimTimeout=0).nextJob().jobId == '2-1'
+
+
+def test_heartbeat_keeps_the_claim(tmp_path):
+    rosterPath = writeRoster(tmp_path)
+    scheduler = RosterScheduler(rosterPath, 'station-1', claimTimeout=1.5)
+    job = scheduler.nextJob()
+    try:
+        time.sleep(2)
+        assert RosterScheduler(rosterPath, 'station-2', claimTimeout=1.5).nextJob().jobId != job.jobId
+    finally:
+        scheduler.finishJob(job, True)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import glob
+import os
+
+import pytest
+
+from conftest import processData
+from libopensesametoolbox.questionnaireprocessor import (shardOf, selectShard, buildManifest, mergePartialResults,
+                                                         checkShardNumbers)
+
+pathList = ['expA/subject-' + str(subjectNr) + '.csv' for subjectNr in range(1, 201)]
+
+
+def test_shardOf_is_deterministic():
+    assert [shardOf(path, 4) for path in pathList] == [shardOf(path, 4) for path in pathList]
+    assert set(shardOf(path, 4) for path in pathList) == {1, 2, 3, 4}
+    assert set(shardOf(path, 1) for path in pathList) == {1}
+
+
+def test_selectShard_partitions_manifest(dataFolder):
+    manifest = buildManifest(dataFolder, ['csv'])
+    allPathList = sorted(entry.relativePath for group in manifest for entry in group.entries)
+
+    shardPathList = []
+    for shardNr in [1, 2, 3]:
+        for group in selectShard(manifest, shardNr, 3):
+            assert group.entries
+            shardPathList += [entry.relativePath for entry in group.entries]
+    assert sorted(shardPathList) == allPathList
+
+
+@pytest.mark.parametrize('shardNrList, shardCount, problem', [
+    ([1, 2, 3], 3, None),
+    ([3, 1, 2], 3, None),
+    ([1, 1, 2, 3], 3, 'more than once'),
+    ([1, 3], 3, 'missing'),
+    ([1, 2, 4], 3, 'not shards of'),
+    ([1], 0, 'Invalid number'),
+    ([1], '1', 'Invalid number'),
+])
+def test_checkShardNumbers(shardNrList, shardCount, problem):
+    message = checkShardNumbers(shardNrList, shardCount)
+    if problem is None:
+        assert message is None
+    else:
+        assert problem in message
+
+
+def readResults(folder):
+    resultDict = {}
+    for path in sorted(glob.glob(os.path.join(folder, '*_Cumulative_Score_Results.tsv'))):
+        with open(path, 'rb') as fp:
+            resultDict[os.path.basename(path)] = fp.read()
+    return resultDict
+
+
+def test_merge_equals_unsharded_run(tmp_path, dataFolder):
+    completeFolder = str(tmp_path / 'complete')
+    shardFolder = str(tmp_path / 'shards')
+    mergeFolder = str(tmp_path / 'merged')
+    for folder in [completeFolder, shardFolder, mergeFolder]:
+        os.makedirs(folder)
+
+    assert processData(dataFolder, completeFolder) is True
+    for shardNr in [1, 2, 3]:
+        assert processData(dataFolder, shardFolder, shard=[shardNr, 3]) is True
+    partialPathList = sorted(glob.glob(os.path.join(shardFolder, '*.jsonl')))
+    assert len(partialPathList) == 3
+
+    assert mergePartialResults(partialPathList, mergeFolder) is True
+    assert readResults(mergeFolder) == readResults(completeFolder)
+    assert len(readResults(mergeFolder)) == 2
+
+
+def test_merge_rejects_incomplete_shards(tmp_path, dataFolder):
+    shardFolder = str(tmp_path / 'shards')
+    mergeFolder = str(tmp_path / 'merged')
+    os.makedirs(shardFolder)
+    os.makedirs(mergeFolder)
+    for shardNr in [1, 2]:
+        assert processData(dataFolder, shardFolder, shard=[shardNr, 2]) is True
+    [firstPath, secondPath] = sorted(glob.glob(os.path.join(shardFolder, '*.jsonl')))
+
+    assert mergePartialResults([firstPath], mergeFolder) is None
+    assert mergePartialResults([firstPath, firstPath], mergeFolder) is None
+    assert mergePartialResults([firstPath, secondPath, secondPath], mergeFolder) is None
+    assert readResults(mergeFolder) == {}
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of OpenSesame Toolbox
+
+OpenSesame Toolbox is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenSesame Experiment Manager is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Refer to <http://www.gnu.org/licenses/> for a copy of the GNU General Public License.
+
+@author Bob Rosbag
+"""
+
+import os
+import shutil
+
+import pytest
+from PyQt5 import QtCore
+
+from conftest import processData
+from libopensesametoolbox.integrity import recordFile, manifestPath
+from libopensesametoolbox.questionnaireprocessor import readErrorReport
+from libopensesametoolbox.watcher import ScoreWatcher
+
+
+@pytest.fixture(scope='module')
+def application():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+@pytest.fixture
+def watchedFolder(tmp_path, dataFolder, application):
+    """
+    The data folder with a watcher that scores into a results folder; the
+    group lists the watcher scored are in callList
+    """
+    destinationFolder = str(tmp_path / 'results')
+    os.makedirs(destinationFolder)
+    callList = []
+
+    def scoreGroups(manifest, groupList):
+        callList.append(groupList)
+        processData(dataFolder, destinationFolder, continueOnError=True, resume=groupList is not None,
+                    groupList=groupList, keepJournal=True, manifest=manifest)
+
+    watcher = ScoreWatcher(dataFolder, scoreGroups)
+    return [watcher, destinationFolder, callList]
+
+
+def scoredFiles(destinationFolder, groupName):
+    with open(os.path.join(destinationFolder, groupName + '_Cumulative_Score_Results.tsv'), 'rt',
+              encoding='utf-8') as fp:
+        return [line.split('\t')[0] for line in fp.read().splitlines()[1:]]
+
+
+def test_running_experiment_is_not_scored_on_start(dataFolder, watchedFolder):
+    [watcher, destinationFolder, callList] = watchedFolder
+    groupFolder = os.path.join(dataFolder, 'expA')
+    for fileName in os.listdir(groupFolder):
+        recordFile(os.path.join(groupFolder, fileName))
+
+    ## an experiment that is still running has half a log, newer than the manifest
+    runningPath = os.path.join(groupFolder, 'subject-6.csv')
+    with open(os.path.join(groupFolder, 'subject-1.csv'), 'rt', encoding='utf-8') as fp:
+        log = fp.read()
+    with open(runningPath, 'wt', encoding='utf-8') as fp:
+        fp.write(log[:len(log) // 2])
+    manifestTime = os.path.getmtime(manifestPath(groupFolder))
+    os.utime(runningPath, (manifestTime + 10, manifestTime + 10))
+
+    watcher.start()
+    assert callList == [None]
+    assert scoredFiles(destinationFolder, 'expA') == ['subject-' + str(subjectNr) + '.csv' for subjectNr in range(1, 6)]
+    assert readErrorReport(destinationFolder) == []
+
+    ## the log is scored once the experiment has finished and recorded it
+    with open(runningPath, 'wt', encoding='utf-8') as fp:
+        fp.write(log)
+    recordFile(runningPath)
+    watcher.check()
+    watcher.check()
+    assert callList == [None, ['expA']]
+    assert scoredFiles(destinationFolder, 'expA')[-1] == 'subject-6.csv'
+
+
+def test_changed_group_is_scored_when_stable(dataFolder, watchedFolder):
+    [watcher, destinationFolder, callList] = watchedFolder
+    watcher.start()
+    shutil.copy(os.path.join(dataFolder, 'expB', 'subject-1.csv'), os.path.join(dataFolder, 'expB', 'subject-6.csv'))
+
+    ## the new file is still changing at the first check
+    watcher.check()
+    assert callList == [None]
+    watcher.check()
+    assert callList == [None, ['expB']]
+    assert len(scoredFiles(destinationFolder, 'expB')) == 6
+    watcher.check()
+    assert callList == [None, ['expB']]